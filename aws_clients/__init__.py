@@ -1,7 +1,9 @@
-from .s3 import s3, create_bucket, upload_file
+from .clients import get_client, get_resource, register_client
 
-from .comprehend import upload_file_to_s3, detect_bad_content
+from .s3 import create_bucket, upload_file
 
-from .rekognition import moderate_image, moderate_video
+from .comprehend import upload_file_to_s3, upload_text_to_s3, detect_bad_content
 
+from .rekognition import moderate_image, moderate_video
 
+from .executor import run_blocking, run_long_job
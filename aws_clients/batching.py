@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class BatchItemError(Exception):
+    """Raised for a single item that failed inside an otherwise successful batch."""
+
+
+class MicroBatcher:
+    """Collect concurrent single-item requests into batched API calls.
+
+    Items submitted from any thread are queued. A background thread flushes
+    the queue when it reaches ``max_batch_size`` items or when the oldest
+    queued item has waited ``window_ms`` milliseconds, whichever comes first.
+    Each flush calls ``send_batch(items)`` once; it must return a list with
+    one entry per item, holding either the item's result or an Exception
+    instance for that item alone. If the whole batch call raises, every item
+    is retried on its own through ``send_one`` so one bad item cannot fail
+    its neighbours, unless ``retry_items(error)`` returns False (e.g. for
+    throttling, where more calls only make things worse); then every item
+    fails with the batch's error.
+    """
+
+    def __init__(self, name, send_batch, send_one, max_batch_size, window_ms, max_workers=4,
+                 retry_items=lambda error: True):
+        self.name = name
+        self._send_batch = send_batch
+        self._send_one = send_one
+        self._retry_items = retry_items
+        self.max_batch_size = max_batch_size
+        self.window = window_ms / 1000.0
+        self._pending = []  # (enqueued_at, item, future)
+        self._cond = threading.Condition()
+        self._sender = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"batch-{name}")
+        self._thread = None
+        self._batches = 0
+        self._items = 0
+        self._item_errors = 0
+        self._batch_failures = 0
+
+    def submit(self, item) -> Future:
+        """Queue one item and return a Future for its individual result."""
+        future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._thread.start()
+            self._pending.append((time.monotonic(), item, future))
+            self._cond.notify()
+        return future
+
+    def stats(self) -> dict:
+        """Return counters describing how well batches are being filled."""
+        with self._cond:
+            batches, items = self._batches, self._items
+            return {
+                "batches": batches,
+                "items": items,
+                "item_errors": self._item_errors,
+                "batch_failures": self._batch_failures,
+                "avg_batch_size": items / batches if batches else 0.0,
+                "fill_rate": items / (batches * self.max_batch_size) if batches else 0.0,
+            }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0][0] + self.window
+                while len(self._pending) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                self._batches += 1
+                self._items += len(batch)
+            self._sender.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        items = [item for _, item, _ in batch]
+        futures = [future for _, _, future in batch]
+        try:
+            results = self._send_batch(items)
+        except Exception as e:
+            with self._cond:
+                self._batch_failures += 1
+            if not self._retry_items(e):
+                logging.warning(f"{self.name} batch of {len(items)} failed ({e})")
+                results = [e] * len(items)
+            else:
+                logging.warning(f"{self.name} batch of {len(items)} failed ({e}); retrying items individually")
+                results = self._send_each(items)
+
+        for future, result in zip(futures, results):
+            if isinstance(result, Exception):
+                with self._cond:
+                    self._item_errors += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _send_each(self, items):
+        results = []
+        for item in items:
+            try:
+                results.append(self._send_one(item))
+            except Exception as item_error:
+                results.append(item_error)
+        return results
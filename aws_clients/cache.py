@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from utils import VERDICT_CACHE_MAX_ENTRIES, VERDICT_CACHE_TTL_SECONDS, VERDICT_CACHE_SQLITE_PATH
+
+
+def content_digest(data) -> str:
+    """Return the SHA-256 hex digest of ``data`` (str is UTF-8 encoded)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class VerdictCache:
+    """Cache moderation verdicts by content hash and policy parameters.
+
+    Lookups go to an in-process LRU with a TTL first, then to an optional
+    SQLite file that every worker process on the host can share. Concurrent
+    requests for the same key are coalesced: only the first one calls
+    ``compute`` and the rest wait for its result. Errors are never cached.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, sqlite_path: str = None):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self._entries = OrderedDict()  # key -> (expires_at, verdict)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0}
+        if sqlite_path:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS verdicts "
+                "(key TEXT PRIMARY KEY, verdict INTEGER NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def make_key(namespace: str, digest: str, params: dict) -> str:
+        return f"{namespace}:{digest}:{json.dumps(params, sort_keys=True)}"
+
+    def get_or_compute(self, namespace: str, digest: str, params: dict, compute):
+        """Return the cached verdict for this content, computing it on a miss.
+
+        :param namespace: Kind of content, e.g. "text" or "image"
+        :param digest: Content hash, see content_digest()
+        :param params: Policy parameters that affect the verdict
+        :param compute: Zero-argument callable producing the verdict
+        :return: The verdict
+        """
+        key = self.make_key(namespace, digest, params)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[1]
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                owner = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        try:
+            verdict = self._disk_get(key)
+            if verdict is not None:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+            else:
+                with self._lock:
+                    self._counters["misses"] += 1
+                verdict = compute()
+                self._disk_put(key, verdict)
+            self._memory_put(key, verdict)
+            future.set_result(verdict)
+            return verdict
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the current in-memory size."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"] + stats["misses"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop every in-memory entry (the shared SQLite tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _memory_put(self, key, verdict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, verdict)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.sqlite_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key):
+        if not self.sqlite_path:
+            return None
+        try:
+            row = self._connection().execute(
+                "SELECT verdict FROM verdicts WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logging.warning(f"Verdict cache read failed: {e}")
+            return None
+        return None if row is None else bool(row[0])
+
+    def _disk_put(self, key, verdict):
+        if not self.sqlite_path:
+            return
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, expires_at) VALUES (?, ?, ?)",
+                (key, int(verdict), time.time() + self.ttl),
+            )
+        except sqlite3.Error as e:
+            logging.warning(f"Verdict cache write failed: {e}")
+
+
+verdict_cache = VerdictCache(
+    max_entries=VERDICT_CACHE_MAX_ENTRIES,
+    ttl_seconds=VERDICT_CACHE_TTL_SECONDS,
+    sqlite_path=VERDICT_CACHE_SQLITE_PATH,
+)
@@ -0,0 +1,121 @@
+import logging
+import threading
+
+from aws_clients.limits import install_rate_limits
+from utils.metrics import install_botocore_hooks
+from utils import (
+    AWS_REGION, AWS_MAX_POOL_CONNECTIONS, AWS_CONNECT_TIMEOUT, AWS_READ_TIMEOUT,
+    AWS_RETRY_MODE, AWS_MAX_ATTEMPTS, AWS_TCP_KEEPALIVE, AWS_ENDPOINT_URLS,
+)
+
+# One registry of boto3 clients shared by every module in aws_clients.
+# boto3 clients are thread-safe once built, but boto3 sessions are not, so
+# construction happens under a lock and every later lookup is a dict read.
+
+_session = None
+_clients = {}
+_resources = {}
+_lock = threading.RLock()
+
+
+def client_config():
+    """Return the botocore Config applied to every client."""
+    from botocore.config import Config
+
+    return Config(
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=AWS_READ_TIMEOUT,
+        retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS},
+        tcp_keepalive=AWS_TCP_KEEPALIVE,
+    )
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        # boto3 is imported here rather than at module level: it is the
+        # slowest import in the app and most cold starts can defer it
+        import boto3
+
+        _session = boto3.session.Session()
+        # Every client built from the session is rate limited per operation
+        # and reports per-operation metrics. Limits go first so time spent
+        # waiting for a token is not counted as AWS latency.
+        install_rate_limits(_session.events)
+        install_botocore_hooks(_session.events)
+    return _session
+
+
+def get_client(service: str, region_name: str = None):
+    """Return the shared client for ``service``, creating it on first use.
+
+    :param service: AWS service name, e.g. 's3' or 'comprehend'
+    :param region_name: Region override, defaults to AWS_REGION
+    :return: A pooled boto3 client
+    """
+    key = (service, region_name or AWS_REGION)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _get_session().client(
+                    service,
+                    region_name=key[1],
+                    endpoint_url=AWS_ENDPOINT_URLS.get(service),
+                    config=client_config(),
+                )
+                _clients[key] = client
+    return client
+
+
+def get_resource(service: str, region_name: str = None):
+    """Return the shared boto3 resource for ``service``, creating it on first use."""
+    key = (service, region_name or AWS_REGION)
+    resource = _resources.get(key)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(key)
+            if resource is None:
+                resource = _get_session().resource(
+                    service,
+                    region_name=key[1],
+                    endpoint_url=AWS_ENDPOINT_URLS.get(service),
+                    config=client_config(),
+                )
+                _resources[key] = resource
+    return resource
+
+
+def register_client(service: str, client, region_name: str = None):
+    """Install ``client`` as the shared client for ``service``.
+
+    Used to point the whole package at local stand-ins or stubs.
+    """
+    with _lock:
+        _clients[(service, region_name or AWS_REGION)] = client
+
+
+def prewarm_clients(services):
+    """Build the clients for ``services`` and resolve credentials ahead of
+    the first request. Errors are logged, not raised: a cold client is
+    still built on first use."""
+    for service in services:
+        try:
+            get_client(service)
+        except Exception as e:
+            logging.warning(f"Could not prewarm the {service} client: {e}")
+    try:
+        _get_session().get_credentials()
+    except Exception as e:
+        logging.warning(f"Could not resolve AWS credentials: {e}")
+
+
+def reset_clients():
+    """Forget every client and resource so they are rebuilt on next use."""
+    global _session
+    with _lock:
+        _clients.clear()
+        _resources.clear()
+        _session = None
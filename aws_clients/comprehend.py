@@ -1,9 +1,19 @@
-import boto3
+import logging
+from botocore.exceptions import ClientError
 from aws_clients import upload_file
-from utils import AWS_REGION, S3_BUCKET
-
-comprehend = boto3.client("comprehend", region_name=AWS_REGION)
-
+from aws_clients.clients import get_client
+from aws_clients.s3 import put_bytes
+from aws_clients.batching import MicroBatcher, BatchItemError
+from aws_clients.cache import verdict_cache, content_digest
+from aws_clients.executor import any_check_blocks
+from aws_clients.limits import is_overload_error
+from utils import (
+    AWS_REGION, S3_BUCKET, AWS_FANOUT_MAX_IN_FLIGHT, COMPREHEND_BATCHING_ENABLED, COMPREHEND_BATCH_WINDOW_MS,
+    COMPREHEND_SENTIMENT_BATCH_SIZE, COMPREHEND_TOXIC_BATCH_SIZE,
+    COMPREHEND_PII_MAX_BYTES, COMPREHEND_SENTIMENT_MAX_BYTES, COMPREHEND_TOXIC_MAX_BYTES,
+    COMPREHEND_TOXICITY_REGIONS, split_text,
+)
+from utils.policy import get_policy
 
 
 def upload_file_to_s3(local_path: str, s3_key: str) -> str:
@@ -12,42 +22,177 @@ def upload_file_to_s3(local_path: str, s3_key: str) -> str:
     return f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
 
 
+def upload_text_to_s3(text: str, s3_key: str) -> str:
+    """Upload text from memory to S3 and return its URI"""
+    if not put_bytes(text.encode("utf-8"), S3_BUCKET, s3_key, content_type="text/plain; charset=utf-8"):
+        raise RuntimeError("Upload to S3 failed")
+    return f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+
+
+
+def _has_pii(text: str) -> bool:
+    """Detect PII (Personally Identifiable Information)."""
+    pii_resp = get_client("comprehend").detect_pii_entities(Text=text, LanguageCode="en")
+    return bool(pii_resp.get("Entities"))
+
+
+# ---------- Batched calls ----------
+# Concurrent requests are grouped into BatchDetectSentiment calls and
+# multi-segment DetectToxicContent calls. Both return one result per
+# input, so each caller gets back only its own result.
+
+def _detect_sentiment_one(text: str) -> str:
+    sentiment_resp = get_client("comprehend").detect_sentiment(Text=text, LanguageCode="en")
+    return sentiment_resp.get("Sentiment", "NEUTRAL")
+
+
+def _detect_sentiment_batch(texts: list) -> list:
+    resp = get_client("comprehend").batch_detect_sentiment(TextList=texts, LanguageCode="en")
+    results = [BatchItemError("No result returned for item")] * len(texts)
+    for item in resp.get("ResultList", []):
+        results[item["Index"]] = item.get("Sentiment", "NEUTRAL")
+    for error in resp.get("ErrorList", []):
+        results[error["Index"]] = BatchItemError(f"{error.get('ErrorCode')}: {error.get('ErrorMessage')}")
+    return results
+
+
+def _detect_toxic_labels_one(text: str) -> list:
+    toxic_resp = get_client("comprehend").detect_toxic_content(TextSegments=[{"Text": text}], LanguageCode="en")
+    return toxic_resp["ResultList"][0].get("Labels", [])
+
+
+def _detect_toxic_labels_batch(texts: list) -> list:
+    toxic_resp = get_client("comprehend").detect_toxic_content(
+        TextSegments=[{"Text": text} for text in texts], LanguageCode="en"
+    )
+    return [result.get("Labels", []) for result in toxic_resp["ResultList"]]
+
+
+_sentiment_batcher = MicroBatcher(
+    "detect_sentiment",
+    _detect_sentiment_batch,
+    _detect_sentiment_one,
+    max_batch_size=COMPREHEND_SENTIMENT_BATCH_SIZE,
+    window_ms=COMPREHEND_BATCH_WINDOW_MS,
+    retry_items=lambda error: not is_overload_error(error),
+)
+_toxic_batcher = MicroBatcher(
+    "detect_toxic_content",
+    _detect_toxic_labels_batch,
+    _detect_toxic_labels_one,
+    max_batch_size=COMPREHEND_TOXIC_BATCH_SIZE,
+    window_ms=COMPREHEND_BATCH_WINDOW_MS,
+    retry_items=lambda error: not is_overload_error(error),
+)
+
+
+def batch_stats() -> dict:
+    """Return fill-rate counters for the Comprehend micro-batchers."""
+    return {
+        "detect_sentiment": _sentiment_batcher.stats(),
+        "detect_toxic_content": _toxic_batcher.stats(),
+    }
+
+
+def _is_negative(text: str, policy) -> bool:
+    """Detect a sentiment the text policy blocks (negative by default)."""
+    if COMPREHEND_BATCHING_ENABLED:
+        sentiment = _sentiment_batcher.submit(text).result()
+    else:
+        sentiment = _detect_sentiment_one(text)
+    return policy.sentiment_blocks(sentiment)
+
+
+# Set once AWS reports that DetectToxicContent does not exist in AWS_REGION
+# although COMPREHEND_TOXICITY_REGIONS lists it
+_toxicity_unavailable = False
+
+
+def _toxicity_available() -> bool:
+    return AWS_REGION in COMPREHEND_TOXICITY_REGIONS and not _toxicity_unavailable
+
+
+def _toxicity_api_missing(error: Exception) -> bool:
+    """True if ``error`` means DetectToxicContent is not offered in this region.
+
+    Connection errors do not count: they are usually transient and must
+    fail the check rather than pass every later text unchecked.
+    """
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in (
+        "UnknownOperationException", "UnsupportedOperationException",
+    )
+
+
+def _is_toxic(text: str, policy) -> bool:
+    """Detect toxicity with DetectToxicContent.
+
+    Only an explicit "unknown operation" answer from AWS is treated as "not
+    toxic" (and stops further calls). Throttling, connection failures and
+    every other error propagate, so an unchecked text is never passed.
+    """
+    global _toxicity_unavailable
+    if _toxicity_unavailable:
+        return False
+    try:
+        if COMPREHEND_BATCHING_ENABLED:
+            toxic_labels = _toxic_batcher.submit(text).result()
+        else:
+            toxic_labels = _detect_toxic_labels_one(text)
+    except Exception as e:
+        if not _toxicity_api_missing(e):
+            raise
+        logging.error(f"DetectToxicContent is not available in {AWS_REGION}, skipping toxicity checks: {e}")
+        _toxicity_unavailable = True
+        return False
+    return policy.toxicity_blocks(toxic_labels)
+
 
 def detect_bad_content(text: str, allow_pii: bool = False) -> bool:
     """
     Use Amazon Comprehend to detect PII, toxic, or negative content.
     Return True if content is bad (should be blocked).
 
+    Only the checks the text policy plans for this request are called (see
+    utils/policy.py), toxicity only in COMPREHEND_TOXICITY_REGIONS; with
+    none planned the text passes without a call.
+
+    Long text is split on sentence boundaries into chunks that fit each
+    API's size limit. The Comprehend calls for all chunks run concurrently
+    and the first one that blocks the content settles the verdict; the
+    others are cancelled or ignored. Verdicts are cached by text hash, so
+    re-posted text skips Comprehend.
+
     :param text: The text to analyze.
     :param allow_pii: If True, PII will not cause rejection.
                       If False, PII will trigger content rejection.
     """
-
-    # Detect PII (Personally Identifiable Information)
-    pii_resp = comprehend.detect_pii_entities(Text=text, LanguageCode="en")
-    has_pii = bool(pii_resp.get("Entities"))
-
-    # Detect Sentiment
-    sentiment_resp = comprehend.detect_sentiment(Text=text, LanguageCode="en")
-    sentiment = sentiment_resp.get("Sentiment", "NEUTRAL")
-
-    # Optionally detect toxicity (if available in the region)
-    try:
-        toxic_resp = comprehend.detect_toxic_content(TextSegments=[{"Text": text}])
-        toxic_labels = toxic_resp["ResultList"][0].get("Labels", [])
-        toxic_confidence = any(l["Score"] > 0.7 for l in toxic_labels)
-    except Exception:
-        toxic_confidence = False  # fallback for regions without this API
-
+    policy = get_policy().text
+    plan = policy.plan(allow_pii)
+    if not _toxicity_available():
+        plan = tuple(check for check in plan if check != "toxicity")
+    if not plan:
+        return False
+    return verdict_cache.get_or_compute(
+        "text",
+        content_digest(text),
+        {"checks": plan, "policy": policy.version},
+        lambda: _detect_bad_content_uncached(text, plan, policy),
+    )
+
+
+def _detect_bad_content_uncached(text: str, plan: tuple, policy) -> bool:
     # --- Moderation Logic ---
-    if allow_pii:
-        # Ignore PII, only check for toxicity or negative sentiment
-        is_bad = sentiment == "NEGATIVE" or toxic_confidence
-    else:
-        # Block if PII, negative sentiment, or toxic content
-        is_bad = has_pii or sentiment == "NEGATIVE" or toxic_confidence
-
-    return is_bad
+    # Block if any planned check blocks any chunk
+    checks = []
+    if "pii" in plan:
+        checks += [lambda c=chunk: _has_pii(c) for chunk in split_text(text, COMPREHEND_PII_MAX_BYTES)]
+    if "sentiment" in plan:
+        checks += [lambda c=chunk: _is_negative(c, policy) for chunk in split_text(text, COMPREHEND_SENTIMENT_MAX_BYTES)]
+    if "toxicity" in plan:
+        checks += [lambda c=chunk: _is_toxic(c, policy) for chunk in split_text(text, COMPREHEND_TOXIC_MAX_BYTES)]
+
+    # Bounded, so a long text can't take over the fan-out pool or the rate limits
+    return any_check_blocks(checks, AWS_FANOUT_MAX_IN_FLIGHT)
 
 
 
@@ -0,0 +1,359 @@
+import contextlib
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from aws_clients.clients import get_client
+from utils import (
+    S3_BUCKET, TRANSCRIBE_OUTPUT_PREFIX, TRANSCRIBE_SEGMENT_PREFIX, DELETE_BATCH_SIZE, DELETE_FLUSH_INTERVAL,
+    DELETE_MAX_ATTEMPTS, DELETE_RETRY_MAX_DELAY, DELETE_JOURNAL_PATH, DELETE_JOURNAL_COMPACT_RECORDS,
+    ORPHAN_SWEEP_INTERVAL, ORPHAN_MAX_AGE_SECONDS,
+)
+
+
+class DeletionQueue:
+    """Delete S3 objects in the background, many keys per request.
+
+    ``enqueue`` returns immediately; a worker thread groups pending keys by
+    bucket into DeleteObjects calls of up to ``batch_size`` keys, waiting up
+    to ``flush_interval`` seconds for a batch to fill. Failed calls are
+    retried with exponential backoff, keys S3 reports as failed up to
+    ``max_attempts`` times. With a ``journal_path`` every pending key is
+    recorded on disk first, so deletes survive a crash.
+
+    Each process keeps its own journal, ``<journal_path>.<pid>``, and holds
+    a lock on it while running. When the queue is created it takes over
+    the journals no process holds a lock on, i.e. those left behind by
+    stopped or crashed workers, and replays their pending keys.
+    """
+
+    def __init__(self, journal_path: str = DELETE_JOURNAL_PATH, batch_size: int = DELETE_BATCH_SIZE,
+                 flush_interval: float = DELETE_FLUSH_INTERVAL, max_attempts: int = DELETE_MAX_ATTEMPTS):
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._pending = OrderedDict()  # (bucket, key) -> failed attempts so far
+        self._in_flight = set()  # (bucket, key) in a DeleteObjects call right now
+        self._failures = 0
+        self._not_before = 0.0
+        self._cond = threading.Condition()
+        self._journal_lock = threading.Lock()
+        self._thread = None
+        self._journal = None
+        self._journal_file = f"{journal_path}.{os.getpid()}" if journal_path else None
+        self._journal_records = 0  # lines in the journal file
+        self._counters = {"enqueued": 0, "deleted": 0, "requests": 0, "retries": 0, "failed": 0}
+        if journal_path:
+            self._replay()
+
+    def enqueue(self, bucket: str, key: str):
+        """Schedule ``key`` in ``bucket`` for deletion.
+
+        The key is synced to the journal before this returns, so async
+        code should call it through run_blocking.
+        """
+        with self._cond:
+            if (bucket, key) in self._pending:
+                return
+        # Journaled and queued under the journal lock, so a compaction can't
+        # snapshot the queue in between and leave the key out of the journal.
+        # The worker's lock is never held across the sync.
+        with self._journal_lock:
+            with self._cond:
+                if (bucket, key) in self._pending:
+                    return
+            self._append({"op": "add", "bucket": bucket, "key": key}, sync=True)
+            with self._cond:
+                self._pending[(bucket, key)] = 0
+                self._counters["enqueued"] += 1
+                self._ensure_started()
+                self._cond.notify_all()
+
+    def start(self):
+        """Start the worker now, e.g. to work off deletes replayed from the journal."""
+        with self._cond:
+            self._ensure_started()
+        return self
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every pending key has been handled; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._counters)
+            stats["pending"] = len(self._pending) + len(self._in_flight)
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="s3-deletions", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    if now < self._not_before:
+                        self._cond.wait(self._not_before - now)
+                        continue
+                    break
+                # Give a partial batch a moment to fill up
+                deadline = now + self.flush_interval
+                while len(self._pending) < self.batch_size and time.monotonic() < deadline:
+                    self._cond.wait(deadline - time.monotonic())
+                bucket = next(iter(self._pending))[0]
+                batch = {}
+                for pending_bucket, key in list(self._pending):
+                    if pending_bucket == bucket:
+                        batch[key] = self._pending.pop((bucket, key))
+                        if len(batch) == self.batch_size:
+                            break
+                self._in_flight.update((bucket, key) for key in batch)
+            try:
+                self._delete_batch(bucket, batch)
+            except Exception as e:
+                # Keep the worker alive; keys not journaled as done are replayed on the next start
+                logging.error(f"Deletion worker failed on {len(batch)} objects from {bucket}: {e}")
+
+    def _delete_batch(self, bucket: str, batch: dict):
+        try:
+            response = get_client("s3").delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+            )
+        except Exception as e:
+            logging.error(f"Deleting {len(batch)} objects from {bucket} failed: {e}")
+            with self._cond:
+                self._counters["requests"] += 1
+                self._counters["retries"] += len(batch)
+                self._failures += 1
+                self._not_before = time.monotonic() + min(2 ** self._failures, DELETE_RETRY_MAX_DELAY)
+                for key, attempts in batch.items():
+                    self._pending[(bucket, key)] = attempts
+                self._in_flight.difference_update((bucket, key) for key in batch)
+                self._cond.notify_all()
+            return
+
+        errors = {error["Key"]: error for error in response.get("Errors", [])}
+        done = []
+        with self._cond:
+            try:
+                self._counters["requests"] += 1
+                self._failures = 0
+                for key, attempts in batch.items():
+                    error = errors.get(key)
+                    if error is None:
+                        self._counters["deleted"] += 1
+                    elif attempts + 1 < self.max_attempts:
+                        self._counters["retries"] += 1
+                        self._pending[(bucket, key)] = attempts + 1
+                        continue
+                    else:
+                        self._counters["failed"] += 1
+                        logging.error(
+                            f"Giving up deleting {key} from {bucket}: {error.get('Code')} {error.get('Message')}"
+                        )
+                    done.append(key)
+            finally:
+                # Even if something fails, so that flush() does not wait for these forever
+                self._in_flight.difference_update((bucket, key) for key in batch)
+                self._cond.notify_all()
+        self._journal_done(bucket, done)
+        logging.info(f"Deleted {len(batch) - len(errors)} objects from {bucket}")
+
+    # -- journal -------------------------------------------------------------
+
+    def _replay(self):
+        """Take over the journals of processes that are no longer running."""
+        adopted = []
+        try:
+            candidates = [self.journal_path] + sorted(glob.glob(glob.escape(self.journal_path) + ".*"))
+            for path in candidates:
+                if path.endswith(".tmp"):
+                    continue
+                journal = self._claim_journal(path)
+                if journal is None:
+                    continue
+                adopted.append(journal)
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # torn last line after a crash
+                        continue
+                    item = (entry["bucket"], entry["key"])
+                    if entry["op"] == "add":
+                        self._pending[item] = 0
+                    else:
+                        self._pending.pop(item, None)
+            # Our own journal holds every adopted key before the old ones go
+            self._compact()
+            for journal in adopted:
+                if journal.name != self._journal_file:
+                    os.unlink(journal.name)
+                    with contextlib.suppress(FileNotFoundError):
+                        os.unlink(f"{journal.name}.tmp")
+        finally:
+            for journal in adopted:
+                journal.close()
+        if self._pending:
+            logging.info(f"Replayed {len(self._pending)} pending deletes from {len(adopted)} journals")
+
+    @staticmethod
+    def _claim_journal(path: str):
+        """Open and lock a journal no running process owns, or return None."""
+        try:
+            journal = open(path, encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        try:
+            fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            # Still the file at ``path``, not one its owner has since compacted away
+            if os.fstat(journal.fileno()).st_ino == os.stat(path).st_ino:
+                return journal
+        except (BlockingIOError, FileNotFoundError):
+            pass  # owned by a running process, or taken over by another one
+        journal.close()
+        return None
+
+    def _journal_done(self, bucket: str, keys: list):
+        """Journal ``keys`` as handled, compacting the journal once it is idle
+        or mostly made of finished keys."""
+        if not self.journal_path:
+            return
+        with self._journal_lock:
+            with self._cond:
+                # A key enqueued again meanwhile has to stay in the journal
+                keys = [key for key in keys if (bucket, key) not in self._pending]
+                live = len(self._pending) + len(self._in_flight)
+            for key in keys:
+                self._append({"op": "done", "bucket": bucket, "key": key})
+        if live == 0 or (self._journal_records >= DELETE_JOURNAL_COMPACT_RECORDS and self._journal_records > 2 * live):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite this process's journal with only the keys still pending or in flight."""
+        if not self.journal_path:
+            return
+        tmp_path = f"{self._journal_file}.tmp"
+        with self._journal_lock:
+            # Enqueues wait for the rewrite; the worker's lock is only held for the snapshot
+            with self._cond:
+                items = list(self._pending) + list(self._in_flight)
+            journal = open(tmp_path, "w", encoding="utf-8")
+            try:
+                # Locked before it replaces the journal, so no other process can take it over
+                fcntl.flock(journal, fcntl.LOCK_EX)
+                for bucket, key in items:
+                    journal.write(json.dumps({"op": "add", "bucket": bucket, "key": key}) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+                os.replace(tmp_path, self._journal_file)
+            except BaseException:
+                journal.close()
+                raise
+            if self._journal is not None:
+                self._journal.close()
+            self._journal = journal
+            self._journal_records = len(items)
+
+    def _append(self, entry: dict, sync: bool = False):
+        """Append ``entry`` to the journal; the caller holds ``_journal_lock``."""
+        if self._journal is None:
+            return
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._journal_records += 1
+        if sync:
+            os.fsync(self._journal.fileno())
+
+
+class OrphanSweeper:
+    """Periodically clean up what failed or crashed requests leave behind.
+
+    Aborts multipart uploads that were never completed or aborted, and
+    deletes transcript outputs that were never read back and audio segments
+    that were never cleaned up, once they are older than ``max_age`` seconds.
+    """
+
+    def __init__(self, deletions: DeletionQueue, bucket: str = S3_BUCKET,
+                 max_age: float = ORPHAN_MAX_AGE_SECONDS, interval: float = ORPHAN_SWEEP_INTERVAL,
+                 prefixes=(TRANSCRIBE_OUTPUT_PREFIX, TRANSCRIBE_SEGMENT_PREFIX)):
+        self.deletions = deletions
+        self.bucket = bucket
+        self.max_age = max_age
+        self.interval = interval
+        self.prefixes = prefixes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="orphan-sweeper", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def sweep_once(self) -> dict:
+        """Run one sweep; return how many uploads were aborted and objects queued."""
+        s3_client = get_client("s3")
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.max_age)
+        aborted = queued = 0
+
+        for page in s3_client.get_paginator("list_multipart_uploads").paginate(Bucket=self.bucket):
+            for upload in page.get("Uploads", []):
+                if upload["Initiated"] < cutoff:
+                    s3_client.abort_multipart_upload(
+                        Bucket=self.bucket, Key=upload["Key"], UploadId=upload["UploadId"]
+                    )
+                    aborted += 1
+
+        for prefix in self.prefixes:
+            for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    if obj["LastModified"] < cutoff:
+                        self.deletions.enqueue(self.bucket, obj["Key"])
+                        queued += 1
+
+        logging.info(f"Orphan sweep of {self.bucket}: aborted {aborted} uploads, queued {queued} deletes")
+        return {"aborted_uploads": aborted, "queued_deletes": queued}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep_once()
+            except Exception as e:
+                logging.error(f"Orphan sweep failed: {e}")
+
+
+_deletions = None
+_lock = threading.Lock()
+
+
+def get_deletion_queue() -> DeletionQueue:
+    """Return the process-wide deletion queue, replaying its journal on first use."""
+    global _deletions
+    if _deletions is None:
+        with _lock:
+            if _deletions is None:
+                _deletions = DeletionQueue()
+    return _deletions
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils import AWS_EXECUTOR_MAX_WORKERS, AWS_JOB_EXECUTOR_MAX_WORKERS, AWS_FANOUT_MAX_WORKERS
+
+# boto3 is synchronous, so every AWS call made from an ``async def`` route has
+# to leave the event loop. Short request/response calls (Comprehend, image
+# moderation, S3 puts) share one pool; long-running jobs that wait on video or
+# transcription results get their own pool so they can never starve the
+# short calls. A third pool runs the parallel sub-calls that a single
+# moderation fans out into; those tasks never submit further work, so the
+# pool cannot deadlock on itself.
+
+_executors = {}
+_lock = threading.Lock()
+
+_POOL_SIZES = {
+    "default": AWS_EXECUTOR_MAX_WORKERS,
+    "jobs": AWS_JOB_EXECUTOR_MAX_WORKERS,
+    "fanout": AWS_FANOUT_MAX_WORKERS,
+}
+
+
+def get_executor(name: str = "default") -> ThreadPoolExecutor:
+    """Return the shared executor called ``name``, creating it on first use.
+
+    :param name: "default" (short AWS calls), "jobs" (long-running
+                 moderation/transcription jobs) or "fanout" (parallel
+                 sub-calls of a single moderation)
+    :return: A bounded ThreadPoolExecutor
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=_POOL_SIZES[name],
+                    thread_name_prefix=f"aws-{name}",
+                )
+                _executors[name] = executor
+                logging.info(f"Started '{name}' AWS executor with {_POOL_SIZES[name]} workers")
+    return executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking AWS call in the default executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor("default"), functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_long_job(func, *args, **kwargs):
+    """Run a long-running blocking job (video moderation, transcription)
+    in the dedicated jobs executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor("jobs"), functools.partial(func, *args, **kwargs)
+    )
+
+
+def any_check_blocks(checks, max_in_flight: int = None) -> bool:
+    """Run moderation checks concurrently and stop at the first blocking one.
+
+    Each check is a zero-argument callable returning True if the content
+    should be blocked. As soon as one returns True the checks that have not
+    started yet are cancelled and the ones still running are ignored.
+    A failed check does not stop the others, since a later one may still
+    block; if none blocks, the first failure is raised rather than the
+    content being passed unchecked.
+
+    :param checks: Iterable of zero-argument callables returning bool
+    :param max_in_flight: Most checks submitted at a time, so one large
+                          input can't fill the shared pool; None for no limit
+    :return: True if any check blocks the content, else False
+    """
+    executor = get_executor("fanout")
+    checks = iter(checks)
+    limit = max_in_flight or float("inf")
+    running = set()
+    error = None
+    try:
+        while True:
+            while len(running) < limit:
+                check = next(checks, None)
+                if check is None:
+                    break
+                running.add(executor.submit(check))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    if future.result():
+                        return True
+                except Exception as e:
+                    error = error or e
+        if error is not None:
+            raise error
+        return False
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def shutdown_executors(wait: bool = True):
+    """Shut down every executor created so far."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from utils import (
+    AWS_RATE_LIMITS, AWS_RATE_LIMIT_MAX_WAIT, JOB_CONCURRENCY_LIMITS, JOB_SLOT_MAX_WAITERS, JOB_SLOT_MAX_WAIT,
+    AWS_THROTTLE_RETRY_AFTER,
+)
+
+# Error codes AWS uses when a request was rejected for rate or quota reasons
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException", "Throttling", "TooManyRequestsException", "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded", "SlowDown", "LimitExceededException",
+}
+
+
+class Overloaded(Exception):
+    """Raised instead of making an AWS call when its limit's queue is full.
+
+    The API answers it with 429 and a Retry-After of ``retry_after`` seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float = AWS_THROTTLE_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for an AWS throttling/quota error that a client should retry later."""
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+
+
+def is_overload_error(error: Exception) -> bool:
+    """True if ``error`` means "too busy": shed locally or throttled by AWS."""
+    return isinstance(error, Overloaded) or is_throttling_error(error)
+
+
+def raise_if_overloaded(error: Exception):
+    """Re-raise ``error`` if it is an overload error, so it becomes a 429
+    rather than being wrapped into a 500."""
+    if is_overload_error(error):
+        raise error
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second, up to ``burst``.
+
+    Callers reserve a token even when none is left (the balance goes
+    negative) and sleep until it is theirs, so waiters are served in order.
+    A caller that would wait longer than ``max_wait`` is refused instead.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float, max_wait: float = AWS_RATE_LIMIT_MAX_WAIT):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._counters = {"acquired": 0, "waited": 0, "shed": 0}
+
+    def acquire(self):
+        """Take one token, sleeping for it if needed; raise Overloaded if the wait is too long."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if wait > self.max_wait:
+                self._counters["shed"] += 1
+                raise Overloaded(f"Rate limit for {self.name} exceeded", retry_after=wait)
+            self._tokens -= 1
+            self._counters["acquired"] += 1
+            if wait:
+                self._counters["waited"] += 1
+        if wait:
+            time.sleep(wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+
+class ConcurrencyLimit:
+    """At most ``limit`` holders at once; at most ``max_waiters`` waiting up to ``max_wait`` seconds."""
+
+    def __init__(self, name: str, limit: int, max_waiters: int = JOB_SLOT_MAX_WAITERS,
+                 max_wait: float = JOB_SLOT_MAX_WAIT):
+        self.name = name
+        self.limit = limit
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._counters = {"acquired": 0, "shed": 0}
+
+    def acquire(self):
+        with self._cond:
+            if self._active >= self.limit:
+                if self._waiting >= self.max_waiters:
+                    self._counters["shed"] += 1
+                    raise Overloaded(f"Too many {self.name} jobs queued", retry_after=self.max_wait)
+                self._waiting += 1
+                try:
+                    if not self._cond.wait_for(lambda: self._active < self.limit, self.max_wait):
+                        self._counters["shed"] += 1
+                        raise Overloaded(f"Timed out waiting for a {self.name} job slot", retry_after=self.max_wait)
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+            self._counters["acquired"] += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update(active=self._active, waiting=self._waiting)
+        return stats
+
+
+_rate_limits = {
+    operation: TokenBucket(operation, rate, burst) for operation, (rate, burst) in AWS_RATE_LIMITS.items()
+}
+_job_limits = {job_type: ConcurrencyLimit(job_type, limit) for job_type, limit in JOB_CONCURRENCY_LIMITS.items()}
+
+
+def acquire_job_slot(job_type: str):
+    """Wait for a slot for one more running job of ``job_type``.
+
+    Call ``release_job_slot`` once the job has finished, failed or could not
+    be started.
+    """
+    limit = _job_limits.get(job_type)
+    if limit is not None:
+        limit.acquire()
+
+
+def release_job_slot(job_type: str):
+    limit = _job_limits.get(job_type)
+    if limit is not None:
+        limit.release()
+
+
+def limits_stats() -> dict:
+    stats = {operation: bucket.stats() for operation, bucket in _rate_limits.items()}
+    stats.update({f"jobs.{job_type}": limit.stats() for job_type, limit in _job_limits.items()})
+    return stats
+
+
+def _before_call(event_name, **kwargs):
+    _, service, operation = event_name.split(".", 2)
+    bucket = _rate_limits.get(f"{service}.{operation}")
+    if bucket is not None:
+        bucket.acquire()
+
+
+def install_rate_limits(events):
+    """Apply AWS_RATE_LIMITS to every client built from a session (session.events)."""
+    events.register("before-call", _before_call, unique_id="moderation-rate-limits")
+    logging.info(f"Rate limiting {len(_rate_limits)} AWS operations")
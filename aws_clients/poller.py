@@ -0,0 +1,289 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+from aws_clients.limits import is_overload_error
+from aws_clients.queues import LocalQueue, SQSQueue, unwrap_sns
+from utils import (
+    POLLER_POLLS_PER_SECOND, POLLER_MIN_INTERVAL, POLLER_MAX_INTERVAL, POLLER_AGE_FACTOR,
+    POLLER_MAX_WORKERS, JOB_NOTIFICATIONS_ENABLED, JOB_NOTIFICATION_QUEUE_URL,
+    POLLER_NOTIFIED_FALLBACK_INTERVAL, POLLER_RECENT_JOBS,
+)
+
+
+class _WatchedJob:
+    __slots__ = ("job_id", "check", "on_complete", "future", "started", "expected", "polls", "seq")
+
+    def __init__(self, job_id, check, on_complete, expected):
+        self.job_id = job_id
+        self.check = check
+        self.on_complete = on_complete
+        self.future = Future()
+        self.started = time.monotonic()
+        self.expected = expected
+        self.polls = 0
+        self.seq = 0
+
+
+class JobPoller:
+    """One background poller for every in-flight Rekognition/Transcribe job.
+
+    Jobs are kept in a heap ordered by their next poll time. Each job is
+    polled less often as it ages (and not before it could plausibly be done,
+    when its expected duration is known), and all jobs together never exceed
+    ``polls_per_second``. A completion notification for a job makes it due
+    immediately; with notifications enabled the regular polls only serve as
+    a slow safety net.
+    """
+
+    def __init__(
+        self,
+        polls_per_second: float = POLLER_POLLS_PER_SECOND,
+        min_interval: float = POLLER_MIN_INTERVAL,
+        max_interval: float = POLLER_MAX_INTERVAL,
+        age_factor: float = POLLER_AGE_FACTOR,
+        max_workers: int = POLLER_MAX_WORKERS,
+    ):
+        self.polls_per_second = polls_per_second
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.age_factor = age_factor
+        self._jobs = {}
+        self._recent = OrderedDict()  # ids of jobs that finished here lately
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="poller")
+        self._thread = None
+        self._next_poll_slot = 0.0
+        self._counters = {"polls": 0, "notifications": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    def watch(self, job_id: str, check, on_complete=None, expected_seconds: float = None) -> Future:
+        """Track an AWS job until it finishes.
+
+        :param job_id: Job id (Rekognition JobId or Transcribe job name)
+        :param check: Callable polling the job once. Returns the final
+                      response when the job is done, None while it is still
+                      running, and raises if the job failed.
+        :param on_complete: Optional callable applied to the final response,
+                            run on a poller worker thread
+        :param expected_seconds: Rough expected job duration, if known
+        :return: Future resolving to ``on_complete(response)`` (or the
+                 response itself)
+        """
+        job = _WatchedJob(job_id, check, on_complete, expected_seconds)
+        with self._cond:
+            self._ensure_started()
+            self._jobs[job_id] = job
+            self._schedule(job, time.monotonic() + self._next_interval(job))
+            self._cond.notify()
+        return job.future
+
+    def notify(self, job_id: str) -> bool:
+        """Mark ``job_id`` as finished on the AWS side so it is polled right away."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            self._counters["notifications"] += 1
+            self._schedule(job, 0.0)
+            self._cond.notify()
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop tracking ``job_id`` and cancel its Future, e.g. once its
+        result is no longer needed. The AWS job itself keeps running."""
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            self._remember(job_id)
+            self._counters["cancelled"] += 1
+        return job.future.cancel()
+
+    def handle_notification(self, body: dict) -> bool:
+        """Handle a job completion event.
+
+        Accepts a Rekognition SNS message (``JobId``/``Status``), an
+        EventBridge "Transcribe Job State Change" event, or either of them
+        wrapped in an SNS envelope.
+
+        Returns False if the job is not one of this process's, so the
+        notification can be left for the worker that started it. Jobs that
+        already finished here and unrecognised messages count as handled.
+        """
+        body = unwrap_sns(body)
+        job_id = body.get("JobId")
+        if job_id is None:
+            job_id = body.get("detail", {}).get("TranscriptionJobName")
+        if job_id is None:
+            logging.warning(f"Ignoring unrecognised job notification: {body}")
+            return True
+        if self.notify(job_id):
+            return True
+        with self._cond:
+            return job_id in self._recent
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._counters)
+            stats["in_flight"] = len(self._jobs)
+        return stats
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="job-poller", daemon=True)
+            self._thread.start()
+
+    def _schedule(self, job, due):
+        job.seq = next(self._seq)
+        heapq.heappush(self._heap, (due, job.seq, job.job_id))
+
+    def _next_interval(self, job) -> float:
+        age = time.monotonic() - job.started
+        if JOB_NOTIFICATIONS_ENABLED:
+            return POLLER_NOTIFIED_FALLBACK_INTERVAL
+        interval = max(self.min_interval, age * self.age_factor)
+        if job.expected is not None and job.expected - age > interval:
+            # Don't bother polling long before the job could be done
+            interval = (job.expected - age) * 0.5 + interval
+        return min(interval, self.max_interval)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    # Drop stale heap entries left behind by rescheduling
+                    while self._heap and (
+                        self._heap[0][2] not in self._jobs
+                        or self._jobs[self._heap[0][2]].seq != self._heap[0][1]
+                    ):
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due = max(self._heap[0][0], self._next_poll_slot)
+                    if due <= now:
+                        break
+                    self._cond.wait(due - now)
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs[job_id]
+                job.seq = -1  # in progress; a notification reschedules it
+                self._next_poll_slot = max(now, self._next_poll_slot) + 1.0 / self.polls_per_second
+                self._counters["polls"] += 1
+            self._workers.submit(self._poll, job)
+
+    def _poll(self, job):
+        job.polls += 1
+        try:
+            response = job.check()
+        except Exception as e:
+            if is_overload_error(e):
+                # A shed or throttled poll says nothing about the job; try again later
+                response = None
+            else:
+                self._finish(job)
+                with self._cond:
+                    self._counters["failed"] += 1
+                self._resolve(job.future.set_exception, e)
+                return
+
+        if response is None:
+            with self._cond:
+                if job.seq == -1:
+                    self._schedule(job, time.monotonic() + self._next_interval(job))
+                    self._cond.notify()
+            return
+
+        self._finish(job)
+        try:
+            result = job.on_complete(response) if job.on_complete else response
+        except Exception as e:
+            self._resolve(job.future.set_exception, e)
+            return
+        with self._cond:
+            self._counters["completed"] += 1
+        self._resolve(job.future.set_result, result)
+
+    def _finish(self, job):
+        with self._cond:
+            self._jobs.pop(job.job_id, None)
+            self._remember(job.job_id)
+
+    def _remember(self, job_id: str):
+        self._recent[job_id] = None
+        while len(self._recent) > POLLER_RECENT_JOBS:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    def _resolve(setter, value):
+        try:
+            setter(value)
+        except InvalidStateError:
+            pass  # cancelled while it was being polled
+
+
+class NotificationListener:
+    """Feed job completion events from a queue into the poller.
+
+    A message is acked only once the poller has handled it; notifications
+    for other workers' jobs are left to become visible again for them.
+    """
+
+    def __init__(self, source, poller: JobPoller):
+        self.source = source
+        self.poller = poller
+        self._thread = threading.Thread(target=self._run, name="job-notifications", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                messages = self.source.receive()
+            except Exception as e:
+                logging.error(f"Receiving job notifications failed: {e}")
+                time.sleep(5)
+                continue
+            for message in messages:
+                try:
+                    if self.poller.handle_notification(message.body):
+                        message.ack()
+                except Exception as e:
+                    logging.error(f"Handling job notification failed: {e}")
+
+
+_poller = None
+_notifications = None
+_lock = threading.Lock()
+
+
+def get_poller() -> JobPoller:
+    """Return the process-wide poller, starting the notification listener
+    on first use when JOB_NOTIFICATIONS_ENABLED is set."""
+    global _poller, _notifications
+    if _poller is None:
+        with _lock:
+            if _poller is None:
+                _poller = JobPoller()
+                if JOB_NOTIFICATIONS_ENABLED:
+                    _notifications = SQSQueue(JOB_NOTIFICATION_QUEUE_URL) if JOB_NOTIFICATION_QUEUE_URL else LocalQueue()
+                    NotificationListener(_notifications, _poller).start()
+    return _poller
+
+
+def get_notification_queue():
+    """Return the queue job notifications are read from (None if disabled).
+
+    With no JOB_NOTIFICATION_QUEUE_URL configured this is a LocalQueue that
+    local stand-ins can ``send()`` completion events to.
+    """
+    get_poller()
+    return _notifications
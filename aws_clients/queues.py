@@ -0,0 +1,100 @@
+import json
+import logging
+import queue
+from typing import List
+
+from aws_clients.clients import get_client
+
+
+class Message:
+    """A received queue message. Call ``ack()`` once it has been handled,
+    and ``extend()`` to keep it hidden from other consumers meanwhile."""
+
+    def __init__(self, body: dict, ack=None, extend=None):
+        self.body = body
+        self._ack = ack
+        self._extend = extend
+
+    def ack(self):
+        if self._ack is not None:
+            self._ack()
+
+    def extend(self, seconds: int):
+        """Keep the message invisible for another ``seconds`` from now."""
+        if self._extend is not None:
+            self._extend(seconds)
+
+
+class LocalQueue:
+    """In-process stand-in for an SQS queue, used for local runs and tests."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def send(self, body: dict):
+        self._queue.put(body)
+
+    def receive(self, max_messages: int = 10, wait_seconds: float = 1.0,
+                visibility_timeout: int = None) -> List[Message]:
+        try:
+            messages = [Message(self._queue.get(timeout=wait_seconds))]
+        except queue.Empty:
+            return []
+        while len(messages) < max_messages:
+            try:
+                messages.append(Message(self._queue.get_nowait()))
+            except queue.Empty:
+                break
+        return messages
+
+
+class SQSQueue:
+    """SQS queue with long polling. Message bodies are decoded from JSON."""
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+
+    def send(self, body: dict):
+        get_client("sqs").send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(body))
+
+    def receive(self, max_messages: int = 10, wait_seconds: float = 20,
+                visibility_timeout: int = None) -> List[Message]:
+        """Receive up to ``max_messages``, hidden for ``visibility_timeout``
+        seconds (the queue's default if None)."""
+        sqs = get_client("sqs")
+        params = {}
+        if visibility_timeout is not None:
+            params["VisibilityTimeout"] = int(visibility_timeout)
+        resp = sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            WaitTimeSeconds=int(wait_seconds),
+            **params,
+        )
+        messages = []
+        for raw in resp.get("Messages", []):
+            receipt = raw["ReceiptHandle"]
+            try:
+                body = json.loads(raw["Body"])
+            except ValueError:
+                logging.error(f"Dropping non-JSON message from {self.queue_url}")
+                sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+                continue
+            messages.append(Message(
+                body,
+                ack=lambda r=receipt: sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=r),
+                extend=lambda seconds, r=receipt: sqs.change_message_visibility(
+                    QueueUrl=self.queue_url, ReceiptHandle=r, VisibilityTimeout=int(seconds)
+                ),
+            ))
+        return messages
+
+
+def unwrap_sns(body: dict) -> dict:
+    """Return the inner message of an SNS envelope, or ``body`` unchanged."""
+    if body.get("Type") == "Notification" and isinstance(body.get("Message"), str):
+        try:
+            return json.loads(body["Message"])
+        except ValueError:
+            return body
+    return body
@@ -1,17 +1,12 @@
-import time
-import boto3
-from utils import AWS_REGION
+import logging
+from concurrent.futures import Future
 
-rekognition = boto3.client("rekognition", region_name=AWS_REGION)
-
-SAFE_LABELS = {"Violence", "Graphic Violence"}
-BLOCK_LABELS = {"Explicit Nudity", "Sexual Activity", "Hate Symbols"}
-
-BLOCK_CATEGORIES = [
-    "Explicit Nudity", "Suggestive", "Violence",
-    "Visually Disturbing", "Weapons", "Drugs",
-    "Alcohol", "Tobacco", "Hate Symbols", "Self-Harm"
-]
+from aws_clients.cache import verdict_cache
+from aws_clients.clients import get_client
+from aws_clients.limits import acquire_job_slot, release_job_slot
+from aws_clients.poller import get_poller
+from utils import REKOGNITION_SNS_TOPIC_ARN, REKOGNITION_SNS_ROLE_ARN, VIDEO_RESULTS_PAGE_SIZE
+from utils.policy import get_policy
 
 
 # def moderate_image(bucket, key, threshold=70):
@@ -29,39 +24,136 @@ BLOCK_CATEGORIES = [
 
 
 
-def moderate_image(bucket: str, key: str, threshold=70) -> bool:
-    """Detect unsafe image content using Rekognition."""
-    response = rekognition.detect_moderation_labels(
-        Image={"S3Object": {"Bucket": bucket, "Name": key}}
-    )
+def _detect_image_labels(image: dict, policy) -> bool:
+    # Labels weaker than every threshold cannot block; Rekognition drops them
+    response = get_client("rekognition").detect_moderation_labels(Image=image, MinConfidence=policy.min_confidence)
     labels = response.get("ModerationLabels", [])
-    print("labels:", labels)
-    for label in labels:
-        if label["Confidence"] > threshold:  # configurable threshold
-            return True
-    return False
+    logging.debug(f"labels: {labels}")
+    return policy.any_blocks(labels)
 
 
-def moderate_video(bucket: str, key: str) -> bool:
-    """Start an async video moderation job."""
-    job_id = rekognition.start_content_moderation(
-        Video={"S3Object": {"Bucket": bucket, "Name": key}}
-    )["JobId"]
+def moderate_image(bucket: str, key: str, digest: str = None) -> bool:
+    """Detect unsafe image content using Rekognition, under the image policy.
 
-    # Poll for result
-    while True:
-        result = rekognition.get_content_moderation(JobId=job_id)
-        status = result["JobStatus"]
-        if status in ["SUCCEEDED", "FAILED"]:
-            break
-        time.sleep(5)
+    If the image's content hash is passed as ``digest`` the verdict is
+    cached, so re-uploads of the same image skip Rekognition. With image
+    moderation disabled by the policy no call is made.
+    """
+    policy = get_policy().image
+    if not policy.enabled:
+        return False
+    if digest is not None:
+        return verdict_cache.get_or_compute(
+            "image", digest, {"policy": policy.version},
+            lambda: moderate_image(bucket, key),
+        )
+    return _detect_image_labels({"S3Object": {"Bucket": bucket, "Name": key}}, policy)
+
+
+def moderate_image_bytes(data: bytes, digest: str = None) -> bool:
+    """Detect unsafe image content from in-memory bytes using Rekognition.
 
+    Rekognition reads the image from the request itself, so the image does
+    not need to be in S3 first. Images larger than
+    REKOGNITION_IMAGE_BYTES_MAX must go through moderate_image instead.
+    Verdicts share the cache with moderate_image.
+    """
+    policy = get_policy().image
+    if not policy.enabled:
+        return False
+    if digest is not None:
+        return verdict_cache.get_or_compute(
+            "image", digest, {"policy": policy.version},
+            lambda: moderate_image_bytes(data),
+        )
+    return _detect_image_labels({"Bytes": data}, policy)
+
+
+def _check_video_job(job_id: str):
+    """Poll a video moderation job once; return its result when finished."""
+    result = get_client("rekognition").get_content_moderation(
+        JobId=job_id, SortBy="TIMESTAMP", MaxResults=VIDEO_RESULTS_PAGE_SIZE
+    )
+    status = result["JobStatus"]
     if status == "FAILED":
         raise RuntimeError("Video moderation failed")
+    return result if status == "SUCCEEDED" else None
 
-    labels = result.get("ModerationLabels", [])
-    for label in labels:
-        if label["Confidence"] > 80:
+
+def iter_video_labels(job_id: str, first_page: dict = None):
+    """Yield the moderation labels of a finished video job, page by page.
+
+    Pages are only fetched as the caller consumes labels, so a caller that
+    stops early never downloads the rest. ``first_page`` is the response
+    that reported the job finished, reused as page one.
+    """
+    page = first_page
+    while True:
+        if page is None:
+            page = get_client("rekognition").get_content_moderation(
+                JobId=job_id, SortBy="TIMESTAMP", MaxResults=VIDEO_RESULTS_PAGE_SIZE
+            )
+        for detection in page.get("ModerationLabels", []):
+            yield detection["ModerationLabel"]
+        token = page.get("NextToken")
+        if not token:
+            return
+        page = get_client("rekognition").get_content_moderation(
+            JobId=job_id, SortBy="TIMESTAMP", MaxResults=VIDEO_RESULTS_PAGE_SIZE, NextToken=token
+        )
+
+
+def _video_verdict(job_id: str, result, policy) -> bool:
+    for label in iter_video_labels(job_id, result):
+        if policy.blocks(label):
+            logging.info(f"Video job {job_id} blocked on {label.get('ParentName')}/{label.get('Name')}")
             return True
     return False
 
+
+def start_video_moderation(bucket: str, key: str, expected_seconds: float = None) -> Future:
+    """Start an async video moderation job.
+
+    The job is tracked by the shared poller; the returned Future resolves
+    to True if the video has a label the video policy blocks (by default
+    one in BLOCK_CATEGORIES with at least VIDEO_MIN_CONFIDENCE). Rekognition
+    drops labels weaker than every threshold server-side and result pages
+    stop being read at the first blocking label. With video moderation
+    disabled by the policy the Future is already resolved to False.
+
+    Waits for one of the JOB_CONCURRENCY_LIMITS["video"] job slots first and
+    raises Overloaded if none frees up in time.
+    """
+    policy = get_policy().video
+    if not policy.enabled:
+        future = Future()
+        future.set_result(False)
+        return future
+    params = {
+        "Video": {"S3Object": {"Bucket": bucket, "Name": key}},
+        "MinConfidence": policy.min_confidence,
+    }
+    if REKOGNITION_SNS_TOPIC_ARN:
+        params["NotificationChannel"] = {
+            "SNSTopicArn": REKOGNITION_SNS_TOPIC_ARN,
+            "RoleArn": REKOGNITION_SNS_ROLE_ARN,
+        }
+    acquire_job_slot("video")
+    try:
+        job_id = get_client("rekognition").start_content_moderation(**params)["JobId"]
+    except BaseException:
+        release_job_slot("video")
+        raise
+    future = get_poller().watch(
+        job_id,
+        check=lambda: _check_video_job(job_id),
+        on_complete=lambda result: _video_verdict(job_id, result, policy),
+        expected_seconds=expected_seconds,
+    )
+    future.add_done_callback(lambda _: release_job_slot("video"))
+    return future
+
+
+def moderate_video(bucket: str, key: str) -> bool:
+    """Moderate a video and wait for the verdict."""
+    return start_video_moderation(bucket, key).result()
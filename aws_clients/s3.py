@@ -1,12 +1,17 @@
 
 import logging
-import boto3
 from botocore.exceptions import ClientError
 import os
-# Let's use Amazon S3
-s3 = boto3.resource('s3',)
+from aws_clients.clients import get_client, get_resource
 
 
+def __getattr__(name):
+    # ``s3`` used to be a resource built at import time; it is now built on
+    # first access so importing this module never touches boto3
+    if name == "s3":
+        return get_resource('s3')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def create_bucket(bucket_name, region=None):
     """Create an S3 bucket in a specified region
@@ -22,10 +27,10 @@ def create_bucket(bucket_name, region=None):
     # Create bucket
     try:
         if region is None:
-            s3_client = boto3.client('s3')
+            s3_client = get_client('s3')
             s3_client.create_bucket(Bucket=bucket_name)
         else:
-            s3_client = boto3.client('s3', region_name=region)
+            s3_client = get_client('s3', region_name=region)
             location = {'LocationConstraint': region}
             s3_client.create_bucket(Bucket=bucket_name,
                                     CreateBucketConfiguration=location)
@@ -50,7 +55,7 @@ def upload_file(file_name, bucket, object_name=None):
         object_name = os.path.basename(file_name)
 
     # Upload the file
-    s3_client = boto3.client('s3')
+    s3_client = get_client('s3')
     try:
         response = s3_client.upload_file(file_name, bucket, object_name)
     except ClientError as e:
@@ -67,8 +72,7 @@ def delete_file(bucket_name, object_name):
     :return: True if file deleted, else False
     """
     try:
-        s3_object = s3.Object(bucket_name, object_name)
-        s3_object.delete()
+        get_client('s3').delete_object(Bucket=bucket_name, Key=object_name)
         logging.info(f"Deleted {object_name} from bucket {bucket_name}")
     except ClientError as e:
         logging.error(e)
@@ -77,3 +81,93 @@ def delete_file(bucket_name, object_name):
 
 
 
+def put_bytes(data: bytes, bucket, object_name, content_type=None):
+    """Upload an in-memory payload to an S3 bucket with a single PutObject
+
+    :param data: Bytes to upload
+    :param bucket: Bucket to upload to
+    :param object_name: S3 object name
+    :param content_type: Optional Content-Type for the object
+    :return: True if the payload was uploaded, else False
+    """
+    extra = {"ContentType": content_type} if content_type else {}
+    try:
+        get_client('s3').put_object(Bucket=bucket, Key=object_name, Body=data, **extra)
+    except ClientError as e:
+        logging.error(e)
+        return False
+    return True
+
+
+class MultipartUpload:
+    """Thin wrapper around an S3 multipart upload.
+
+    Parts can be uploaded from several threads at once; ``complete`` sorts
+    them by part number before finishing the upload.
+    """
+
+    def __init__(self, bucket, object_name, content_type=None):
+        self.bucket = bucket
+        self.object_name = object_name
+        extra = {"ContentType": content_type} if content_type else {}
+        self.upload_id = get_client('s3').create_multipart_upload(
+            Bucket=bucket, Key=object_name, **extra
+        )["UploadId"]
+        self._parts = []
+
+    def upload_part(self, part_number: int, data: bytes):
+        response = get_client('s3').upload_part(
+            Bucket=self.bucket, Key=self.object_name, UploadId=self.upload_id,
+            PartNumber=part_number, Body=data,
+        )
+        self._parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    def complete(self):
+        get_client('s3').complete_multipart_upload(
+            Bucket=self.bucket, Key=self.object_name, UploadId=self.upload_id,
+            MultipartUpload={"Parts": sorted(self._parts, key=lambda p: p["PartNumber"])},
+        )
+
+    def abort(self):
+        try:
+            get_client('s3').abort_multipart_upload(
+                Bucket=self.bucket, Key=self.object_name, UploadId=self.upload_id
+            )
+        except ClientError as e:
+            logging.error(e)
+
+
+def presign_upload(bucket, object_name, method="put", content_type=None, expires_in=3600, max_bytes=None):
+    """Create a presigned request a client can upload one object with
+
+    Signing happens locally; no request is made to S3.
+
+    :param bucket: Bucket to upload to
+    :param object_name: S3 object name
+    :param method: "put" for a presigned PutObject URL, "post" for a browser form upload
+    :param content_type: Content-Type the upload must be sent with
+    :param expires_in: Seconds the presigned request stays valid
+    :param max_bytes: Largest accepted upload (POST only; S3 enforces it)
+    :return: dict with ``method`` and ``url``, plus the ``headers`` to send
+        (PUT) or the form ``fields`` to include (POST)
+    """
+    s3_client = get_client('s3')
+    if method == "post":
+        fields, conditions = {}, []
+        if content_type:
+            fields["Content-Type"] = content_type
+            conditions.append({"Content-Type": content_type})
+        if max_bytes:
+            conditions.append(["content-length-range", 1, max_bytes])
+        post = s3_client.generate_presigned_post(
+            bucket, object_name, Fields=fields, Conditions=conditions, ExpiresIn=expires_in,
+        )
+        return {"method": "POST", "url": post["url"], "fields": post["fields"]}
+
+    params = {"Bucket": bucket, "Key": object_name}
+    headers = {}
+    if content_type:
+        params["ContentType"] = content_type
+        headers["Content-Type"] = content_type
+    url = s3_client.generate_presigned_url("put_object", Params=params, ExpiresIn=expires_in)
+    return {"method": "PUT", "url": url, "headers": headers}
@@ -1,40 +1,72 @@
 import os
-import time
 import uuid
-import boto3
 import logging
-import requests
 from botocore.exceptions import ClientError
 
-from utils import AWS_REGION
+from aws_clients.clients import get_client
+from aws_clients.deletions import get_deletion_queue
+from aws_clients.limits import acquire_job_slot, release_job_slot
+from aws_clients.poller import get_poller
+from utils import S3_BUCKET, TRANSCRIBE_OUTPUT_PREFIX, TRANSCRIPT_READ_CHUNK_SIZE
+from utils.json_stream import extract_json_value
 
 #Speech to Text Service - Amazon Transcribe
 
 
-transcribe = boto3.client('transcribe', region_name=AWS_REGION)
+#
 
+def _check_transcription_job(job_name: str):
+    """Poll a Transcribe job once; return the job description when finished."""
+    status = get_client("transcribe").get_transcription_job(TranscriptionJobName=job_name)
+    job_status = status["TranscriptionJob"]["TranscriptionJobStatus"]
 
+    if job_status == "FAILED":
+        reason = status["TranscriptionJob"].get("FailureReason", "Unknown error")
+        raise RuntimeError(f"Transcription failed: {reason}")
+    if job_status != "COMPLETED":
+        logging.info(f"Transcription {job_name} in progress...")
+        return None
+    return status
 
-#
 
-def transcribe_voice_file(
+def _fetch_transcript(status, bucket: str, key: str) -> str:
+    """Read the transcript text of a completed job from its output object.
+
+    The object is streamed through the pooled S3 client and parsed only up
+    to the transcript text; the word-level items that make up most of the
+    file are never downloaded. The object is queued for deletion once read.
+    The text itself is returned whole: moderation starts once reading
+    stops, not while the transcript is being parsed.
+    """
+    body = get_client("s3").get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        transcripts = extract_json_value(body.iter_chunks(TRANSCRIPT_READ_CHUNK_SIZE), "transcripts")
+    finally:
+        body.close()
+    get_deletion_queue().enqueue(bucket, key)
+    transcript_text = " ".join(t["transcript"] for t in transcripts)
+
+    logging.info(f"Transcription completed for {status['TranscriptionJob']['TranscriptionJobName']}")
+    return transcript_text
+
+
+def start_transcription(
     file_uri: str,
     language_code: str = "en-US",
     output_bucket: str = None,
-    wait: bool = True,
-) -> str:
+    expected_seconds: float = None,
+):
     """
-    Convert voice (audio file) to text using Amazon Transcribe.
+    Start an Amazon Transcribe job and track it with the shared poller.
 
     Args:
-        file_uri (str): URI to the audio file.
-                        Can be a local path or an S3 URI (s3://bucket/file.mp3)
+        file_uri (str): S3 URI to the audio file (s3://bucket/file.mp3)
         language_code (str): Language code, default 'en-US'
-        output_bucket (str): Optional S3 bucket for storing transcription result.
-        wait (bool): If True, waits for job completion and returns transcription text.
+        output_bucket (str): S3 bucket for the transcription result, default S3_BUCKET.
+        expected_seconds (float): Rough expected job duration, used to space out polls.
 
     Returns:
-        str: Transcribed text if wait=True, otherwise the Transcribe job name.
+        tuple: (job name, Future resolving to the transcribed text)
     """
 
     job_name = f"transcribe-job-{uuid.uuid4()}"
@@ -44,46 +76,77 @@ def transcribe_voice_file(
     if not file_uri.startswith("s3://"):
         raise ValueError("Transcribe requires an S3 URI. Upload the file first.")
 
+    start_params = {
+        "TranscriptionJobName": job_name,
+        "Media": {"MediaFileUri": file_uri},
+        "MediaFormat": os.path.splitext(file_uri)[1].lstrip(".").lower(),
+        "LanguageCode": language_code,
+    }
+    # Results go to our own bucket so they can be read back over the pooled
+    # S3 client rather than through a pre-signed URL
+    output_bucket = output_bucket or S3_BUCKET
+    output_key = f"{TRANSCRIBE_OUTPUT_PREFIX}{job_name}.json"
+    start_params["OutputBucketName"] = output_bucket
+    start_params["OutputKey"] = output_key
+
+    # Stay within the concurrent transcription job quota
+    acquire_job_slot("transcription")
     try:
-        start_params = {
-            "TranscriptionJobName": job_name,
-            "Media": {"MediaFileUri": file_uri},
-            "MediaFormat": os.path.splitext(file_uri)[1].lstrip(".").lower(),
-            "LanguageCode": language_code,
-        }
-        if output_bucket:
-            start_params["OutputBucketName"] = output_bucket
+        get_client("transcribe").start_transcription_job(**start_params)
+    except BaseException:
+        release_job_slot("transcription")
+        raise
 
-        transcribe.start_transcription_job(**start_params)
+    future = get_poller().watch(
+        job_name,
+        check=lambda: _check_transcription_job(job_name),
+        on_complete=lambda status: _fetch_transcript(status, output_bucket, output_key),
+        expected_seconds=expected_seconds,
+    )
+    future.add_done_callback(lambda _: release_job_slot("transcription"))
+    return job_name, future
 
-        if not wait:
-            return job_name  # asynchronous mode
 
-        # Wait until the job completes
-        while True:
-            status = transcribe.get_transcription_job(TranscriptionJobName=job_name)
-            job_status = status["TranscriptionJob"]["TranscriptionJobStatus"]
+def cancel_transcription(job_name: str):
+    """Stop waiting for a job whose transcript is no longer needed and delete it.
 
-            if job_status in ["COMPLETED", "FAILED"]:
-                break
-            logging.info("Transcription in progress...")
-            time.sleep(5)
+    Its Future is cancelled, which frees its job slot. Output it still writes
+    is left to the orphan sweeper.
+    """
+    get_poller().cancel(job_name)
+    try:
+        get_client("transcribe").delete_transcription_job(TranscriptionJobName=job_name)
+    except ClientError as e:
+        logging.warning(f"Could not delete transcription job {job_name}: {e}")
 
-        if job_status == "FAILED":
-            reason = status["TranscriptionJob"].get("FailureReason", "Unknown error")
-            raise RuntimeError(f"Transcription failed: {reason}")
 
-        # Retrieve the transcript text
-        transcript_uri = status["TranscriptionJob"]["Transcript"]["TranscriptFileUri"]
+def transcribe_voice_file(
+    file_uri: str,
+    language_code: str = "en-US",
+    output_bucket: str = None,
+    wait: bool = True,
+) -> str:
+    """
+    Convert voice (audio file) to text using Amazon Transcribe.
+
+    Args:
+        file_uri (str): URI to the audio file.
+                        Can be a local path or an S3 URI (s3://bucket/file.mp3)
+        language_code (str): Language code, default 'en-US'
+        output_bucket (str): S3 bucket for the transcription result, default S3_BUCKET.
+        wait (bool): If True, waits for job completion and returns transcription text.
 
-        # Download the transcript JSON
+    Returns:
+        str: Transcribed text if wait=True, otherwise the Transcribe job name.
+    """
+    try:
+        job_name, future = start_transcription(file_uri, language_code, output_bucket)
 
-        resp = requests.get(transcript_uri)
-        transcript_json = resp.json()
-        transcript_text = transcript_json["results"]["transcripts"][0]["transcript"]
+        if not wait:
+            return job_name  # asynchronous mode
 
-        logging.info(f"Transcription completed for {file_uri}")
-        return transcript_text
+        # Wait until the job completes
+        return future.result()
 
     except ClientError as e:
         logging.error(f"AWS Transcribe error: {e}")
@@ -91,4 +154,3 @@ def transcribe_voice_file(
     except Exception as e:
         logging.error(f"Unexpected error: {e}")
         raise
-
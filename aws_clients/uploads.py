@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from aws_clients.executor import run_blocking
+from aws_clients.s3 import put_bytes, MultipartUpload
+from utils import S3_MULTIPART_PART_SIZE, S3_MULTIPART_CONCURRENCY
+
+
+@dataclass
+class UploadResult:
+    key: str
+    size: int
+    digest: str  # SHA-256 hex digest of the uploaded bytes
+    data: Optional[bytes] = None  # the payload, when it fit in a single part
+    path: Optional[str] = None  # local copy of a larger payload, if one was asked for
+
+    def discard(self):
+        """Remove the local copy, if any."""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+
+async def stream_upload(
+    file,
+    bucket: str,
+    object_name: str,
+    part_size: int = S3_MULTIPART_PART_SIZE,
+    concurrency: int = S3_MULTIPART_CONCURRENCY,
+    content_type: str = None,
+    spool: bool = False,
+) -> Optional[UploadResult]:
+    """Stream an upload into S3 without buffering the whole file.
+
+    Payloads that fit in one part are sent with a single PutObject. Larger
+    ones go through a multipart upload whose parts are read from ``file``
+    and uploaded ``concurrency`` at a time, so at most
+    ``(concurrency + 1) * part_size`` bytes are held in memory per request.
+    With ``spool`` those parts are also written to a temporary file, so the
+    payload can be processed locally without downloading it again; the
+    caller removes it with ``UploadResult.discard()``.
+
+    :param file: Object with an async ``read(size)`` method, e.g. UploadFile
+    :param bucket: Bucket to upload to
+    :param object_name: S3 object name
+    :param part_size: Multipart part size in bytes (S3 minimum is 5 MiB)
+    :param concurrency: Number of parts uploaded in parallel
+    :param content_type: Optional Content-Type for the object
+    :param spool: Keep a local copy of multipart payloads in ``UploadResult.path``
+    :return: UploadResult, or None if the upload failed
+    """
+    digest = hashlib.sha256()
+    chunk = await file.read(part_size)
+    lookahead = await file.read(part_size) if len(chunk) == part_size else b""
+
+    if not lookahead:
+        digest.update(chunk)
+        if not await run_blocking(put_bytes, chunk, bucket, object_name, content_type):
+            return None
+        return UploadResult(object_name, len(chunk), digest.hexdigest(), chunk)
+
+    try:
+        upload = await run_blocking(MultipartUpload, bucket, object_name, content_type)
+    except ClientError as e:
+        logging.error(e)
+        return None
+
+    slots = asyncio.Semaphore(concurrency)
+    tasks = []
+    size = 0
+    part_number = 0
+    copy = None
+    if spool:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(object_name)[1].lower())
+        copy = os.fdopen(fd, "wb")
+
+    async def send(number, data):
+        try:
+            await run_blocking(upload.upload_part, number, data)
+        finally:
+            slots.release()
+
+    try:
+        while chunk:
+            part_number += 1
+            size += len(chunk)
+            digest.update(chunk)
+            if copy is not None:
+                await run_blocking(copy.write, chunk)
+            await slots.acquire()
+            tasks.append(asyncio.create_task(send(part_number, chunk)))
+            chunk, lookahead = lookahead or await file.read(part_size), None
+        await asyncio.gather(*tasks)
+        await run_blocking(upload.complete)
+    except Exception as e:
+        logging.error(f"Multipart upload of {object_name} failed: {e}")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await run_blocking(upload.abort)
+        if copy is not None:
+            copy.close()
+            os.remove(path)
+        return None
+
+    if copy is None:
+        return UploadResult(object_name, size, digest.hexdigest())
+    copy.close()
+    return UploadResult(object_name, size, digest.hexdigest(), path=path)
+
+
+async def upload_unless_rejected(
+    data: bytes,
+    bucket: str,
+    object_name: str,
+    moderate,
+    content_type: str = None,
+):
+    """Upload ``data`` while it is being moderated, publishing it only if approved.
+
+    The bytes are sent as the single part of a multipart upload, in
+    parallel with ``moderate``. The upload is completed only once
+    moderation approves the content, so an approved file is stored in
+    about max(upload, moderation) time. A rejection aborts the upload, and
+    rejected bytes never become an object in the bucket.
+
+    :param data: Payload to upload
+    :param bucket: Bucket to upload to
+    :param object_name: S3 object name
+    :param moderate: Awaitable resolving to True if the content must be blocked
+    :param content_type: Optional Content-Type for the object
+    :return: (is_bad, UploadResult or None if rejected)
+    """
+    verdict = asyncio.ensure_future(moderate)
+    upload = None
+    part = None
+    try:
+        upload = await run_blocking(MultipartUpload, bucket, object_name, content_type)
+        part = asyncio.ensure_future(run_blocking(upload.upload_part, 1, data))
+        is_bad = await verdict
+        await part
+        if is_bad:
+            await run_blocking(upload.abort)
+            return True, None
+        await run_blocking(upload.complete)
+    except BaseException:
+        verdict.cancel()
+        if part is not None:
+            await asyncio.gather(part, return_exceptions=True)
+        if upload is not None:
+            await run_blocking(upload.abort)
+        raise
+
+    return False, UploadResult(object_name, len(data), hashlib.sha256(data).hexdigest(), data)
@@ -0,0 +1,89 @@
+"""
+Benchmark: time to verdict for a long voice file, as one Transcribe job
+versus parallel segment jobs (see moderation.segments), against the local
+stand-ins. Stand-in jobs take ``--job-seconds`` plus ``--realtime-factor``
+times the audio length, so a single job over the whole file is slowest.
+
+Usage:
+    python -m benchmarks.long_audio --minutes 30 --realtime-factor 0.01
+"""
+import argparse
+import io
+import json
+import math
+import time
+import wave
+from array import array
+
+from benchmarks.stubs import install_stubs
+
+RATE = 8000
+BAD_SEGMENT = 1  # index of the segment whose transcript blocks in the "bad" file
+
+
+def _tone_wav(minutes: float) -> bytes:
+    """Speech-level audio: a tone that is on for 0.6 s of every second."""
+    second = array("h", (int(6000 * math.sin(2 * math.pi * 220 * i / RATE)) if i < RATE * 0.6 else 0
+                         for i in range(RATE)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes((second * int(minutes * 60)).tobytes())
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    parser.add_argument("--job-seconds", type=float, default=1.0)
+    parser.add_argument("--realtime-factor", type=float, default=0.01)
+    args = parser.parse_args()
+
+    def transcript(name):
+        bad = name.startswith("bad") or (name == f"{BAD_SEGMENT:05d}.wav" and state["bad"])
+        return "this is a badword segment" if bad else "a perfectly ordinary segment"
+
+    state = {"bad": False}
+    stubs = install_stubs(latency={service: 0.0 for service in ("s3", "comprehend", "rekognition", "transcribe")},
+                          job_seconds=args.job_seconds)
+    stubs["transcribe"].transcript = transcript
+    stubs["transcribe"].realtime_factor = args.realtime_factor
+
+    import moderation.audio
+    import moderation.segments
+    from moderation.objects import moderate_object
+    from utils import S3_BUCKET
+
+    # Expected job durations (used to space out polls) as the stand-in behaves
+    moderation.audio.TRANSCRIBE_JOB_BASE_SECONDS = args.job_seconds
+    moderation.audio.TRANSCRIBE_SECONDS_PER_AUDIO_SECOND = args.realtime_factor
+
+    audio = _tone_wav(args.minutes)
+    results = []
+    for segmenting in (False, True):
+        moderation.segments.TRANSCRIBE_SEGMENTING_ENABLED = segmenting
+        for bad in (False, True):
+            state["bad"] = bad
+            key = f"voice/{'bad' if bad else 'clean'}-{args.minutes:g}min.wav"
+            stubs["s3"].objects[(S3_BUCKET, key)] = audio
+            calls = dict(stubs["transcribe"].calls)
+            start = time.perf_counter()
+            status = moderate_object(S3_BUCKET, key)["status"]
+            results.append({
+                "segmenting": segmenting,
+                "content": "bad" if bad else "clean",
+                "status": status,
+                "seconds_to_verdict": round(time.perf_counter() - start, 2),
+                "transcribe_jobs": stubs["transcribe"].calls.get("StartTranscriptionJob", 0)
+                                   - calls.get("StartTranscriptionJob", 0),
+                "jobs_cancelled": stubs["transcribe"].calls.get("DeleteTranscriptionJob", 0)
+                                  - calls.get("DeleteTranscriptionJob", 0),
+            })
+
+    print(json.dumps({"config": vars(args), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
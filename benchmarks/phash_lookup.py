@@ -0,0 +1,69 @@
+"""
+Benchmark: perceptual-hash index lookup latency against index size.
+
+Fills an in-memory PerceptualHashIndex with random 64-bit hashes and times
+near-duplicate lookups (a stored hash with a few bits flipped) and misses
+(fresh random hashes).
+
+Usage:
+    python -m benchmarks.phash_lookup --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import time
+
+from moderation.phash import PerceptualHashIndex, HASH_BITS
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(HASH_BITS), count):
+        value ^= 1 << bit
+    return value
+
+
+def time_lookups(index, queries):
+    latencies = []
+    for value in queries:
+        start = time.perf_counter()
+        index.match(value)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 2),
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 2),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)] * 1e6, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distance", type=int, default=6, help="block/allow distance of the index")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    for size in args.sizes:
+        index = PerceptualHashIndex(block_distance=args.distance, allow_distance=args.distance, max_entries=size)
+        stored = [rng.getrandbits(HASH_BITS) for _ in range(size)]
+        start = time.perf_counter()
+        for value in stored:
+            index.add(value, rng.random() < 0.1)
+        build_s = time.perf_counter() - start
+
+        near = [flip_bits(rng.choice(stored), rng.randint(1, args.distance), rng) for _ in range(args.queries)]
+        misses = [rng.getrandbits(HASH_BITS) for _ in range(args.queries)]
+        results.append({
+            "size": size,
+            "build_s": round(build_s, 2),
+            "near_duplicate": time_lookups(index, near),
+            "miss": time_lookups(index, misses),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
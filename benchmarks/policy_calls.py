@@ -0,0 +1,79 @@
+"""
+Benchmark: AWS calls made per moderated item under different moderation
+policies (see utils/policy.py), against the local stand-ins. Policies that
+relax checks should plan fewer calls than the default.
+
+Usage:
+    python -m benchmarks.policy_calls --items 50
+    python -m benchmarks.policy_calls --check   # exit 1 if a relaxed policy makes as many calls as the default
+"""
+import argparse
+import json
+import sys
+import uuid
+
+from benchmarks.stubs import install_stubs
+from utils.policy import ModerationPolicy, set_policy
+
+# name -> (policy overrides, allow_pii passed by the caller)
+SCENARIOS = {
+    "default": ({}, False),
+    "allow_pii": ({}, True),
+    "pii_disabled": ({"text": {"pii": {"enabled": False}}}, False),
+    "toxicity_only": ({"text": {"pii": {"enabled": False}, "sentiment": {"enabled": False}}}, False),
+    "text_disabled": ({"text": {check: {"enabled": False} for check in ("pii", "sentiment", "toxicity")}}, False),
+    "media_disabled": ({"image": {"enabled": False}, "video": {"enabled": False}}, False),
+}
+
+
+def _calls(stubs):
+    return {service: sum(stub.calls.values()) for service, stub in stubs.items()}
+
+
+def run_scenario(stubs, overrides, allow_pii, items):
+    from aws_clients.cache import verdict_cache
+    from aws_clients.rekognition import moderate_image_bytes, start_video_moderation
+    from moderation.text import moderate_text_content
+
+    set_policy(ModerationPolicy(overrides))
+    verdict_cache.clear()
+    before = _calls(stubs)
+    for _ in range(items):
+        # Unique texts, so neither the cache nor the prefilter settles them
+        moderate_text_content(f"the parcel arrives on tuesday {uuid.uuid4()}", allow_pii)
+        moderate_image_bytes(uuid.uuid4().bytes)
+    after_images = _calls(stubs)
+    start_video_moderation("bench", "clip.mp4").result()
+    after = _calls(stubs)
+    return {
+        "comprehend_per_text": round((after_images["comprehend"] - before["comprehend"]) / items, 2),
+        "rekognition_per_image": round((after_images["rekognition"] - before["rekognition"]) / items, 2),
+        "rekognition_per_video": after["rekognition"] - after_images["rekognition"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=50, help="texts and images moderated per policy")
+    parser.add_argument("--check", action="store_true", help="fail unless relaxed policies make fewer calls")
+    args = parser.parse_args()
+
+    stubs = install_stubs(latency={service: 0.0 for service in ("s3", "comprehend", "rekognition", "transcribe")},
+                          job_seconds=0.0)
+    results = {name: run_scenario(stubs, overrides, allow_pii, args.items)
+               for name, (overrides, allow_pii) in SCENARIOS.items()}
+    print(json.dumps(results, indent=2))
+
+    if args.check:
+        default = results["default"]
+        failed = [
+            name for name, result in results.items()
+            if name != "default" and not any(result[metric] < default[metric] for metric in default)
+        ]
+        if failed:
+            print(f"No fewer calls than the default policy: {', '.join(failed)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: local text prefilter throughput and share of traffic settled locally.
+
+Builds a prefilter over a synthetic blocklist and runs it over a synthetic
+traffic mix (plain text, PII, blocklisted terms, safe phrases).
+
+Usage:
+    python -m benchmarks.prefilter_throughput --terms 5000 --texts 20000
+"""
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import time
+
+from moderation.prefilter import TextPrefilter
+
+WORDS = ("the quick brown fox jumps over lazy dog we had a great time at the park "
+         "today and will come back tomorrow with friends to see the show").split()
+
+
+def random_word(rng, length=7):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_text(rng, blocked_terms, length):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    kind = rng.random()
+    if kind < 0.05:
+        words.insert(rng.randrange(len(words)), rng.choice(blocked_terms))
+    elif kind < 0.10:
+        words.insert(rng.randrange(len(words)), f"{random_word(rng)}@example.com")
+    elif kind < 0.15:
+        return rng.choice(["Thank you!", "hello", "Good morning"])
+    return " ".join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terms", type=int, default=5000, help="blocklist size")
+    parser.add_argument("--texts", type=int, default=20000, help="texts to check")
+    parser.add_argument("--words", type=int, default=60, help="average words per text")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    blocked_terms = [random_word(rng) for _ in range(args.terms)]
+    workdir = tempfile.mkdtemp()
+    blocklist = os.path.join(workdir, "blocklist.txt")
+    safe = os.path.join(workdir, "safe.txt")
+    with open(blocklist, "w") as f:
+        f.write("\n".join(blocked_terms))
+    with open(safe, "w") as f:
+        f.write("thank you\nhello\ngood morning\n")
+
+    start = time.perf_counter()
+    prefilter = TextPrefilter(blocklist, safe, reload_interval=3600)
+    build_s = time.perf_counter() - start
+
+    texts = [make_text(rng, blocked_terms, rng.randint(1, 2 * args.words)) for _ in range(args.texts)]
+    total_bytes = sum(len(t.encode()) for t in texts)
+    start = time.perf_counter()
+    for text in texts:
+        prefilter.check(text)
+    elapsed = time.perf_counter() - start
+
+    stats = prefilter.stats()
+    print(json.dumps({
+        "terms": args.terms,
+        "texts": args.texts,
+        "build_s": round(build_s, 3),
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 2),
+        "texts_per_second": round(args.texts / elapsed),
+        "settled_locally": round(stats["settled_locally"], 3),
+        "blocked": stats["blocked"],
+        "passed": stats["passed"],
+        "forwarded": stats["forwarded"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
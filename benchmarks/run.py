@@ -0,0 +1,218 @@
+"""
+Benchmark suite: drive every moderation endpoint at several concurrency
+levels against local AWS stand-ins (see benchmarks.stubs) and report
+throughput and p50/p95/p99 latency as JSON.
+
+Usage:
+    python -m benchmarks.run --concurrency 1 8 32 --output bench.json
+    python -m benchmarks.run --baseline bench.json --latency comprehend=0.1 --error-rate s3=0.01
+
+With ``--baseline`` every result also carries its ratio to the matching
+result of an earlier run.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+
+from benchmarks.stubs import install_stubs
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+SCENARIOS = ("text", "image", "image_async", "voice", "video")
+# Scenarios waiting on (stand-in) Transcribe/Rekognition jobs
+JOB_SCENARIOS = {"voice", "video"}
+
+
+def start_server(port):
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def _image_bytes():
+    """A small PNG of random noise, so no two requests share a cache entry."""
+    if Image is None:
+        return os.urandom(4096)
+    image = Image.frombytes("L", (64, 64), os.urandom(64 * 64))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _multipart(filename, content_type, data):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+
+def build_request(base_url, scenario):
+    """Return a fresh urllib Request for one call of ``scenario``."""
+    if scenario == "text":
+        body = json.dumps({"text": f"have a nice day {uuid.uuid4()}"}).encode()
+        return urllib.request.Request(
+            f"{base_url}/text-moderation/", data=body, headers={"Content-Type": "application/json"}
+        )
+    if scenario in ("image", "image_async"):
+        body, headers = _multipart("photo.png", "image/png", _image_bytes())
+        query = "?async_mode=true" if scenario == "image_async" else ""
+    elif scenario == "voice":
+        body, headers = _multipart("clip.wav", "audio/wav", os.urandom(16 * 1024))
+        query = ""
+    else:
+        body, headers = _multipart("clip.mp4", "video/mp4", os.urandom(64 * 1024))
+        query = ""
+    return urllib.request.Request(f"{base_url}/media-moderation/{query}", data=body, headers=headers)
+
+
+def timed_call(base_url, scenario):
+    """Return (seconds, ok) for one request."""
+    request = build_request(base_url, scenario)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as resp:
+            resp.read()
+        ok = True
+    except (urllib.error.URLError, ConnectionError):
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_level(base_url, scenario, concurrency, requests):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        outcomes = list(pool.map(lambda _: timed_call(base_url, scenario), range(requests)))
+        elapsed = time.perf_counter() - start
+    latencies = sorted(seconds for seconds, _ in outcomes)
+
+    def ms(value):
+        return round(value * 1000, 2)
+
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, ok in outcomes if not ok),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]),
+    }
+
+
+def compare(results, baseline):
+    """Attach the ratio to the matching baseline result (1.0 = unchanged)."""
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline.get("results", [])}
+    for result in results:
+        before = previous.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        result["vs_baseline"] = {
+            metric: round(result[metric] / before[metric], 3) if before[metric] else None
+            for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        }
+
+
+def _parse_service_values(values):
+    parsed = {}
+    for value in values or []:
+        service, _, number = value.partition("=")
+        parsed[service] = float(number)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=100, help="requests per level")
+    parser.add_argument("--job-requests", type=int, default=16, help="requests per level for voice and video")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS",
+                        help="mean latency of a stand-in, e.g. comprehend=0.08 (repeatable)")
+    parser.add_argument("--error-rate", action="append", metavar="SERVICE=FRACTION",
+                        help="fraction of calls to a stand-in that fail, e.g. s3=0.01 (repeatable)")
+    parser.add_argument("--job-seconds", type=float, default=1.0, help="duration of stand-in AWS jobs")
+    parser.add_argument("--flag-rate", type=float, default=0.0, help="fraction of media flagged unsafe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="JSON output of an earlier run to compare against")
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    latency = _parse_service_values(args.latency)
+    error_rate = _parse_service_values(args.error_rate)
+    stubs = install_stubs(latency, error_rate, args.job_seconds, args.flag_rate, args.seed)
+
+    # Keep the perceptual-hash index in memory instead of the working directory
+    import moderation.phash
+    moderation.phash.PHASH_INDEX_PATH = None
+
+    server, thread = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = []
+    try:
+        for scenario in args.scenarios:
+            timed_call(base_url, scenario)  # warm-up
+            requests = args.job_requests if scenario in JOB_SCENARIOS else args.requests
+            for concurrency in args.concurrency:
+                results.append(run_level(base_url, scenario, concurrency, max(requests, concurrency)))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+    report = {
+        "config": {
+            "scenarios": args.scenarios, "concurrency": args.concurrency, "latency": latency,
+            "error_rate": error_rate, "job_seconds": args.job_seconds, "flag_rate": args.flag_rate,
+            "seed": args.seed,
+        },
+        "results": results,
+        "aws_calls": {service: dict(stub.calls) for service, stub in stubs.items()},
+    }
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: cold start. Each run is a fresh interpreter that imports ``main``
+and serves one request, so nothing is cached between runs.
+
+Reports, per run and as medians:
+  - import_ms: time to import the app
+  - first_response_ms: from process start to the first answered request
+  - client_build_ms: building the first boto3 client afterwards, the cost
+    that is deferred to first use (or to prewarming, see AWS_PREWARM_CLIENTS)
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Runs in the child process. Process start is taken from the OS so the
+# interpreter's own startup is included.
+_CHILD = r"""
+import json, os, socket, threading, time, urllib.request
+
+def since_start():
+    with open(f"/proc/{os.getpid()}/stat") as f:
+        started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+    with open("/proc/uptime") as f:
+        uptime = float(f.read().split()[0])
+    return uptime - started_ticks / os.sysconf("SC_CLK_TCK")
+
+t0 = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - t0) * 1000
+
+import uvicorn
+
+sock = socket.socket()
+sock.bind(("127.0.0.1", 0))
+port = sock.getsockname()[1]
+sock.close()
+server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+threading.Thread(target=server.run, daemon=True).start()
+
+def get(path):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}")
+    while True:
+        try:
+            with urllib.request.urlopen(request) as resp:
+                return resp.read()
+        except urllib.error.URLError:
+            time.sleep(0.001)
+
+get("/")
+first_response_ms = since_start() * 1000
+
+from aws_clients import get_client
+t0 = time.perf_counter()
+get_client("comprehend")
+client_build_ms = (time.perf_counter() - t0) * 1000
+server.should_exit = True
+print(json.dumps({"import_ms": import_ms, "first_response_ms": first_response_ms, "client_build_ms": client_build_ms}))
+"""
+
+
+def run_once(env):
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD], capture_output=True, text=True, check=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    run_once(env)  # warm the OS file cache so runs are comparable
+    runs = [run_once(env) for _ in range(args.runs)]
+    medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+    print(json.dumps({"median": medians, "runs": runs}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
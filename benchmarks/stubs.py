@@ -0,0 +1,295 @@
+"""
+Local stand-ins for the AWS clients the service uses, with injected latency
+and errors, so benchmarks run without credentials, network or cost.
+
+    from benchmarks.stubs import install_stubs
+    stubs = install_stubs(latency={"comprehend": 0.05}, error_rate={"s3": 0.01})
+
+Each stand-in sleeps for a normally distributed latency per call and fails a
+configurable fraction of calls with a ThrottlingException ClientError. Only
+the operations the service calls are implemented.
+"""
+import io
+import json
+import random
+import threading
+import time
+import uuid
+import wave
+
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from aws_clients import register_client
+
+# Per-call latency (seconds) of each service when none is given
+DEFAULT_LATENCY = {"s3": 0.02, "comprehend": 0.05, "rekognition": 0.15, "transcribe": 0.05}
+
+
+class StubService:
+    """Base class: latency and error injection plus per-operation call counts."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = None, error_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.jitter = latency * 0.2 if jitter is None else jitter
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        self.errors = {}
+
+    def _call(self, operation: str):
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.latency else 0.0
+            fail = self._rng.random() < self.error_rate
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            if fail:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Injected error"},
+                 "ResponseMetadata": {"HTTPStatusCode": 400}},
+                operation,
+            )
+
+
+class _Paginator:
+    def __init__(self, pages):
+        self._pages = pages
+
+    def paginate(self, **kwargs):
+        return self._pages(**kwargs)
+
+
+class StubS3(StubService):
+    """In-memory object store."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.objects = {}
+        self._uploads = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call("PutObject")
+        self.objects[(Bucket, Key)] = Body.encode() if isinstance(Body, str) else bytes(Body)
+        return {"ETag": uuid.uuid4().hex}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        self._call("GetObject")
+        try:
+            data = self.objects[(Bucket, Key)]
+        except KeyError:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}}, "GetObject")
+        if Range:
+            start, _, end = Range.removeprefix("bytes=").partition("-")
+            data = data[int(start):int(end) + 1 if end else None]
+        return {"Body": StreamingBody(io.BytesIO(data), len(data)), "ContentLength": len(data)}
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        self._call("GetObject")
+        with open(Filename, "wb") as f:
+            f.write(self.objects[(Bucket, Key)])
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        self._call("DeleteObject")
+        self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self._call("DeleteObjects")
+        for obj in Delete["Objects"]:
+            self.objects.pop((Bucket, obj["Key"]), None)
+        return {"Errors": []}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call("CreateMultipartUpload")
+        upload_id = uuid.uuid4().hex
+        self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, UploadId, PartNumber, Body, **kwargs):
+        self._call("UploadPart")
+        self._uploads[UploadId][PartNumber] = bytes(Body)
+        return {"ETag": f"{UploadId}-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._call("CompleteMultipartUpload")
+        parts = self._uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        return {}
+
+    def abort_multipart_upload(self, UploadId, **kwargs):
+        self._call("AbortMultipartUpload")
+        self._uploads.pop(UploadId, None)
+        return {}
+
+    def get_paginator(self, operation_name):
+        def list_objects(Bucket, Prefix="", StartAfter="", **kwargs):
+            self._call("ListObjectsV2")
+            keys = sorted(k for b, k in self.objects if b == Bucket and k.startswith(Prefix) and k > StartAfter)
+            for i in range(0, max(len(keys), 1), 1000):
+                yield {"Contents": [{"Key": k, "Size": len(self.objects[(Bucket, k)])} for k in keys[i:i + 1000]]}
+
+        def list_uploads(**kwargs):
+            self._call("ListMultipartUploads")
+            yield {"Uploads": []}
+
+        return _Paginator({"list_objects_v2": list_objects, "list_multipart_uploads": list_uploads}[operation_name])
+
+
+class StubComprehend(StubService):
+    """Flags text containing ``trigger`` as negative and toxic."""
+
+    def __init__(self, trigger: str = "badword", **kwargs):
+        super().__init__(**kwargs)
+        self.trigger = trigger
+
+    def detect_pii_entities(self, Text, **kwargs):
+        self._call("DetectPiiEntities")
+        return {"Entities": []}
+
+    def detect_sentiment(self, Text, **kwargs):
+        self._call("DetectSentiment")
+        return {"Sentiment": "NEGATIVE" if self.trigger in Text else "NEUTRAL"}
+
+    def batch_detect_sentiment(self, TextList, **kwargs):
+        self._call("BatchDetectSentiment")
+        return {
+            "ResultList": [
+                {"Index": i, "Sentiment": "NEGATIVE" if self.trigger in text else "NEUTRAL"}
+                for i, text in enumerate(TextList)
+            ],
+            "ErrorList": [],
+        }
+
+    def detect_toxic_content(self, TextSegments, **kwargs):
+        self._call("DetectToxicContent")
+        return {
+            "ResultList": [
+                {"Labels": [{"Name": "PROFANITY", "Score": 0.99}] if self.trigger in segment["Text"] else [],
+                 "Toxicity": 0.99 if self.trigger in segment["Text"] else 0.01}
+                for segment in TextSegments
+            ]
+        }
+
+
+class StubRekognition(StubService):
+    """Image and video moderation; ``flag_rate`` of the media come back unsafe."""
+
+    def __init__(self, job_seconds: float = 2.0, flag_rate: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.job_seconds = job_seconds
+        self.flag_rate = flag_rate
+        self._jobs = {}
+
+    def _labels(self):
+        with self._lock:
+            flagged = self._rng.random() < self.flag_rate
+        if not flagged:
+            return []
+        return [{"Name": "Explicit Nudity", "ParentName": "", "Confidence": 99.0, "TaxonomyLevel": 1}]
+
+    def detect_moderation_labels(self, Image, **kwargs):
+        self._call("DetectModerationLabels")
+        return {"ModerationLabels": self._labels()}
+
+    def start_content_moderation(self, **kwargs):
+        self._call("StartContentModeration")
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = (time.monotonic(), self._labels())
+        return {"JobId": job_id}
+
+    def get_content_moderation(self, JobId, **kwargs):
+        self._call("GetContentModeration")
+        started, labels = self._jobs[JobId]
+        if time.monotonic() - started < self.job_seconds:
+            return {"JobStatus": "IN_PROGRESS"}
+        return {
+            "JobStatus": "SUCCEEDED",
+            "ModerationLabels": [{"Timestamp": 1000, "ModerationLabel": label} for label in labels],
+        }
+
+
+class StubTranscribe(StubService):
+    """Transcription jobs that finish after ``job_seconds`` (plus
+    ``realtime_factor`` times the length of WAV media) and write their output
+    JSON to the stub S3 store. ``transcript`` is the text, or a callable
+    returning the text for a media object key."""
+
+    def __init__(self, s3: StubS3, job_seconds: float = 2.0, transcript="hello and welcome",
+                 realtime_factor: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.s3 = s3
+        self.job_seconds = job_seconds
+        self.transcript = transcript
+        self.realtime_factor = realtime_factor
+        self._jobs = {}
+
+    def _media_seconds(self, uri):
+        bucket, _, key = uri.removeprefix("s3://").partition("/")
+        try:
+            with wave.open(io.BytesIO(self.s3.objects[(bucket, key)])) as wav:
+                return wav.getnframes() / wav.getframerate()
+        except (KeyError, wave.Error, EOFError):
+            return 0.0
+
+    def start_transcription_job(self, TranscriptionJobName, Media, OutputBucketName=None, OutputKey=None, **kwargs):
+        self._call("StartTranscriptionJob")
+        uri = Media["MediaFileUri"]
+        duration = self.job_seconds + self.realtime_factor * self._media_seconds(uri)
+        text = self.transcript(uri.rpartition("/")[2]) if callable(self.transcript) else self.transcript
+        self._jobs[TranscriptionJobName] = (
+            time.monotonic() + duration, OutputBucketName, OutputKey or f"{TranscriptionJobName}.json", text,
+        )
+        return {"TranscriptionJob": {"TranscriptionJobName": TranscriptionJobName, "TranscriptionJobStatus": "IN_PROGRESS"}}
+
+    def get_transcription_job(self, TranscriptionJobName, **kwargs):
+        self._call("GetTranscriptionJob")
+        finishes, bucket, key, text = self._jobs[TranscriptionJobName]
+        job = {"TranscriptionJobName": TranscriptionJobName, "TranscriptionJobStatus": "IN_PROGRESS"}
+        if time.monotonic() >= finishes:
+            if (bucket, key) not in self.s3.objects:
+                self.s3.objects[(bucket, key)] = json.dumps({
+                    "jobName": TranscriptionJobName,
+                    "results": {"transcripts": [{"transcript": text}], "items": []},
+                    "status": "COMPLETED",
+                }).encode()
+            job["TranscriptionJobStatus"] = "COMPLETED"
+            job["Transcript"] = {"TranscriptFileUri": f"https://s3.amazonaws.com/{bucket}/{key}"}
+        return {"TranscriptionJob": job}
+
+    def delete_transcription_job(self, TranscriptionJobName, **kwargs):
+        self._call("DeleteTranscriptionJob")
+        self._jobs.pop(TranscriptionJobName, None)
+        return {}
+
+
+def install_stubs(latency: dict = None, error_rate: dict = None, job_seconds: float = 2.0,
+                  flag_rate: float = 0.0, seed: int = 0) -> dict:
+    """Register stand-ins for S3, Comprehend, Rekognition and Transcribe.
+
+    :param latency: Mean seconds per call, by service name
+    :param error_rate: Fraction of calls failing, by service name
+    :param job_seconds: Duration of video moderation and transcription jobs
+    :param flag_rate: Fraction of images and videos flagged unsafe
+    :param seed: Seed for the latency, error and flag draws
+    :return: The stand-ins by service name
+    """
+    latency = {**DEFAULT_LATENCY, **(latency or {})}
+    error_rate = error_rate or {}
+
+    def options(service, offset):
+        return {"latency": latency.get(service, 0.0), "error_rate": error_rate.get(service, 0.0), "seed": seed + offset}
+
+    s3 = StubS3(**options("s3", 0))
+    stubs = {
+        "s3": s3,
+        "comprehend": StubComprehend(**options("comprehend", 1)),
+        "rekognition": StubRekognition(job_seconds=job_seconds, flag_rate=flag_rate, **options("rekognition", 2)),
+        "transcribe": StubTranscribe(s3, job_seconds=job_seconds, **options("transcribe", 3)),
+    }
+    for service, stub in stubs.items():
+        register_client(service, stub)
+    return stubs
@@ -0,0 +1,95 @@
+"""
+Load test: text moderation latency while video moderation jobs are running.
+
+Starts the FastAPI app in-process with the local AWS stand-ins (see
+benchmarks.stubs; no credentials or network needed), measures text
+moderation latency on an idle server, then again while a batch of video
+uploads are being moderated. With the AWS calls running off the event
+loop both numbers should be roughly the same.
+
+Usage:
+    python -m benchmarks.text_latency_under_video_load --videos 20 --texts 200
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.run import start_server
+from benchmarks.stubs import install_stubs
+
+
+def post_text(base_url):
+    # Unique text, so the verdict cache does not answer every request after the first
+    body = json.dumps({"text": f"have a nice day {uuid.uuid4()}"}).encode()
+    req = urllib.request.Request(
+        f"{base_url}/text-moderation/", data=body, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def post_video(base_url):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="clip.mp4"\r\n'
+        "Content-Type: video/mp4\r\n\r\n"
+    ).encode() + b"\x00" * 1024 + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(
+        f"{base_url}/media-moderation/",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        resp.read()
+
+
+def measure_text(base_url, count, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(lambda _: post_text(base_url), range(count)))
+    return {
+        "count": count,
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--videos", type=int, default=20, help="concurrent video uploads")
+    parser.add_argument("--texts", type=int, default=200, help="text requests per phase")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent text clients")
+    parser.add_argument("--api-latency", type=float, default=0.02, help="stand-in AWS call latency (s)")
+    parser.add_argument("--video-seconds", type=float, default=8.0, help="stand-in video job duration (s)")
+    args = parser.parse_args()
+
+    install_stubs(latency={service: args.api_latency for service in ("s3", "comprehend", "rekognition", "transcribe")},
+                  job_seconds=args.video_seconds)
+    server, thread = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    idle = measure_text(base_url, args.texts, args.concurrency)
+
+    video_pool = ThreadPoolExecutor(max_workers=args.videos)
+    videos = [video_pool.submit(post_video, base_url) for _ in range(args.videos)]
+    time.sleep(0.5)  # let the uploads reach the polling stage
+    loaded = measure_text(base_url, args.texts, args.concurrency)
+    for video in videos:
+        video.result()
+    video_pool.shutdown()
+
+    server.should_exit = True
+    thread.join()
+    print(json.dumps({"idle": idle, "during_video_jobs": loaded, "videos": args.videos}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
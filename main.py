@@ -1,9 +1,45 @@
-from fastapi import FastAPI
+import math
+import threading
+from contextlib import asynccontextmanager
+
+from botocore.exceptions import ClientError
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.middleware.cors import CORSMiddleware
 
-from routers import s3_router, text_moderation_router, media_moderation_router
+from aws_clients.cache import verdict_cache
+from aws_clients.clients import prewarm_clients
+from aws_clients.comprehend import batch_stats
+from aws_clients.deletions import OrphanSweeper, get_deletion_queue
+from aws_clients.executor import shutdown_executors
+from aws_clients.limits import Overloaded, is_throttling_error, limits_stats
+from aws_clients.poller import get_poller
+from moderation import get_prefilter, get_phash_index
+from moderation.audio import audio_stats
+from moderation.events import start_upload_events, get_upload_event_listener
+from routers import s3_router, text_moderation_router, media_moderation_router, bulk_moderation_router
+from utils import ORPHAN_SWEEP_INTERVAL, AWS_THROTTLE_RETRY_AFTER, AWS_PREWARM_CLIENTS
+from utils.metrics import RequestMetricsMiddleware, register_stats, render_metrics
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build clients in the background; startup does not wait for boto3
+    if AWS_PREWARM_CLIENTS:
+        threading.Thread(target=prewarm_clients, args=(AWS_PREWARM_CLIENTS,), name="prewarm", daemon=True).start()
+    # Work off deletes left pending by a previous run
+    deletions = get_deletion_queue().start()
+    sweeper = OrphanSweeper(deletions).start() if ORPHAN_SWEEP_INTERVAL else None
+    # Moderate direct-to-S3 uploads as their events arrive
+    start_upload_events()
+    yield
+    if sweeper is not None:
+        sweeper.stop()
+    deletions.flush(timeout=10)
+    shutdown_executors(wait=False)
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 
@@ -17,10 +53,48 @@ app.add_middleware(
         allow_methods=["*"],     # Allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
         allow_headers=["*"],     # Allow all headers
     )
+app.add_middleware(RequestMetricsMiddleware)
+
+def _stats_if_enabled(get_component):
+    component = get_component()
+    return component.stats() if component is not None else None
+
+
+register_stats("verdict_cache", verdict_cache.stats)
+register_stats("comprehend_batches", batch_stats)
+register_stats("prefilter", lambda: _stats_if_enabled(get_prefilter))
+register_stats("phash", lambda: _stats_if_enabled(get_phash_index))
+register_stats("poller", lambda: get_poller().stats())
+register_stats("deletions", lambda: get_deletion_queue().stats())
+register_stats("limits", limits_stats)
+register_stats("voice_analysis", audio_stats)
+register_stats("upload_events", lambda: _stats_if_enabled(get_upload_event_listener))
+
+
+def _too_many_requests(detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # A rate limit or job-slot queue is full: shed the request
+    return _too_many_requests(str(exc), exc.retry_after)
+
+
+@app.exception_handler(ClientError)
+async def client_error_handler(request: Request, exc: ClientError):
+    if is_throttling_error(exc):
+        return _too_many_requests("AWS is throttling requests, retry later", AWS_THROTTLE_RETRY_AFTER)
+    return JSONResponse({"detail": str(exc)}, status_code=500)
 
 app.include_router(s3_router)
 app.include_router(text_moderation_router)
 app.include_router(media_moderation_router)
+app.include_router(bulk_moderation_router)
 
 
 
@@ -33,3 +107,25 @@ async def root():
 async def say_hello(name: str):
     return {"message": f"Hello {name}"}
 
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return verdict_cache.stats()
+
+
+@app.get("/prefilter/stats")
+async def prefilter_stats():
+    prefilter = get_prefilter()
+    return prefilter.stats() if prefilter is not None else {"enabled": False}
+
+
+@app.get("/deletions/stats")
+async def deletion_stats():
+    return get_deletion_queue().stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: AWS calls per operation, HTTP requests per route,
+    and the counters of the caches, batchers, prefilter, poller and deletions."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
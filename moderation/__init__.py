@@ -0,0 +1,7 @@
+from .jobs import JobStore, InMemoryJobStore, SQLiteJobStore, get_job_store, set_job_store, send_webhook, validate_callback_url
+
+from .phash import PerceptualHashIndex, dhash, get_phash_index, moderate_with_phash
+
+from .prefilter import TextPrefilter, get_prefilter
+
+from .text import moderate_text_content
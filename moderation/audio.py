@@ -0,0 +1,163 @@
+import io
+import logging
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from array import array
+from dataclasses import dataclass
+from typing import Optional
+
+from utils import (
+    VOICE_ANALYSIS_ENABLED, FFMPEG_PATH, FFMPEG_TIMEOUT, VAD_FRAME_MS, VAD_MIN_DBFS, VAD_SPEECH_DBFS,
+    VAD_NOISE_MARGIN_DB, VAD_MIN_RUN_FRAMES, VAD_MIN_SPEECH_SECONDS,
+    TRANSCRIBE_JOB_BASE_SECONDS, TRANSCRIBE_SECONDS_PER_AUDIO_SECOND,
+)
+
+# Rate ffmpeg resamples to; plenty for measuring speech energy
+DECODE_RATE = 8000
+# Frame energy is measured on every n-th sample, down to about this rate
+ENERGY_RATE = 4000
+
+_lock = threading.Lock()
+_counters = {"analyzed": 0, "silent": 0, "undecodable": 0}
+
+
+@dataclass
+class AudioAnalysis:
+    duration: float  # seconds of audio
+    speech_seconds: float  # seconds of it that look like speech
+
+    @property
+    def has_speech(self) -> bool:
+        return self.speech_seconds >= VAD_MIN_SPEECH_SECONDS
+
+
+def _decode_wav(data: bytes):
+    """Return (mono 16-bit samples, sample rate) of a PCM WAV file, or None."""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            raw = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    if width == 2:
+        samples = array("h", raw)
+    elif width == 1:
+        # 8-bit WAV is unsigned
+        samples = array("h", ((b - 128) << 8 for b in raw))
+    elif width == 4:
+        samples = array("i", raw)
+    else:
+        return None
+    if width > 1 and sys.byteorder == "big":
+        samples.byteswap()
+    if width == 4:
+        samples = array("h", (s >> 16 for s in samples))
+    if channels > 1:
+        samples = samples[::channels]  # first channel is enough to find speech
+    return samples, rate
+
+
+def _decode_ffmpeg(data: bytes):
+    """Decode any format ffmpeg knows to mono 16-bit samples at DECODE_RATE, or None."""
+    ffmpeg = shutil.which(FFMPEG_PATH)
+    if ffmpeg is None:
+        return None
+    # From a file rather than a pipe: MP4/M4A keep their index at the end
+    try:
+        with tempfile.NamedTemporaryFile() as source:
+            source.write(data)
+            source.flush()
+            result = subprocess.run(
+                [ffmpeg, "-nostdin", "-v", "error", "-i", source.name,
+                 "-f", "s16le", "-ac", "1", "-ar", str(DECODE_RATE), "pipe:1"],
+                capture_output=True, timeout=FFMPEG_TIMEOUT,
+            )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"ffmpeg could not decode audio: {e}")
+        return None
+    if result.returncode != 0 or not result.stdout:
+        return None
+    samples = array("h", result.stdout[:len(result.stdout) // 2 * 2])
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples, DECODE_RATE
+
+
+def decode_audio(data: bytes, filename: str):
+    """Return (mono 16-bit samples, sample rate) of an audio file, or None if it can't be decoded."""
+    decoded = None
+    if os.path.splitext(filename.lower())[1] == ".wav":
+        decoded = _decode_wav(data)
+    return decoded or _decode_ffmpeg(data)
+
+
+def detect_speech(samples, rate: int, frame_ms: int = VAD_FRAME_MS) -> AudioAnalysis:
+    """Energy-based voice activity detection.
+
+    Frames louder than the noise floor (the 10th percentile frame) by
+    VAD_NOISE_MARGIN_DB count as speech when they come in runs of at least
+    VAD_MIN_RUN_FRAMES. The threshold never drops below VAD_MIN_DBFS and
+    never rises above VAD_SPEECH_DBFS, so steady speech without pauses is
+    still found; anything loud errs towards being transcribed.
+    """
+    frame = max(1, rate * frame_ms // 1000)
+    stride = max(1, rate // ENERGY_RATE)
+    levels = []
+    for start in range(0, len(samples) - frame + 1, frame):
+        chunk = samples[start:start + frame:stride]
+        power = sum(s * s for s in chunk) / len(chunk)
+        levels.append(10 * math.log10(power / 32768 ** 2) if power else -120.0)
+
+    speech_frames = 0
+    if levels:
+        noise_floor = sorted(levels)[len(levels) // 10]
+        threshold = min(max(noise_floor + VAD_NOISE_MARGIN_DB, VAD_MIN_DBFS), VAD_SPEECH_DBFS)
+        run = 0
+        for level in levels + [-120.0]:
+            if level >= threshold:
+                run += 1
+                continue
+            if run >= VAD_MIN_RUN_FRAMES:
+                speech_frames += run
+            run = 0
+    return AudioAnalysis(duration=len(samples) / rate, speech_seconds=speech_frames * frame / rate)
+
+
+def analyze_audio(data: bytes, filename: str) -> Optional[AudioAnalysis]:
+    """Decode an audio file and measure how much speech it holds.
+
+    Returns None when analysis is disabled or the audio can't be decoded
+    (e.g. an MP3 without ffmpeg installed); callers then transcribe as usual.
+    """
+    if not VOICE_ANALYSIS_ENABLED or not data:
+        return None
+    decoded = decode_audio(data, filename)
+    if decoded is None or not decoded[1]:
+        with _lock:
+            _counters["undecodable"] += 1
+        return None
+    analysis = detect_speech(*decoded)
+    with _lock:
+        _counters["analyzed"] += 1
+        if not analysis.has_speech:
+            _counters["silent"] += 1
+    logging.info(f"Audio {filename}: {analysis.duration:.1f}s, {analysis.speech_seconds:.1f}s of speech")
+    return analysis
+
+
+def expected_transcription_seconds(analysis: Optional[AudioAnalysis]) -> Optional[float]:
+    """Rough Transcribe job duration for the analysed audio, or None if unknown."""
+    if analysis is None:
+        return None
+    return TRANSCRIBE_JOB_BASE_SECONDS + analysis.duration * TRANSCRIBE_SECONDS_PER_AUDIO_SECOND
+
+
+def audio_stats() -> dict:
+    with _lock:
+        return dict(_counters)
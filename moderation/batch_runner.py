@@ -0,0 +1,147 @@
+"""
+Run a JSONL file of moderation records through the same moderation
+functions as the API.
+
+    python -m moderation.batch_runner records.jsonl results.jsonl --workers 32
+
+Each input line is one record, either text or a reference to an object in S3:
+
+    {"id": "42", "text": "some comment", "allow_pii": false}
+    {"id": "43", "s3_key": "image/5f0c....png", "bucket": "optional-bucket"}
+
+Each record produces exactly one output line, in input order. Running the
+same command again after an interruption resumes after the last line
+written to the output file.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from moderation.objects import moderate_object, APPROVED, REJECTED, NO_CONTENT
+from moderation.text import moderate_text_content
+from utils import S3_BUCKET, BATCH_RUNNER_WORKERS, BATCH_REPORT_INTERVAL
+
+ERROR = "error"
+
+
+def moderate_record(record: dict) -> dict:
+    """Moderate one input record and return its result fields."""
+    if "text" in record:
+        text = record["text"]
+        if not text.strip():
+            return {"status": NO_CONTENT}
+        is_bad = moderate_text_content(text, record.get("allow_pii", False))
+        return {"status": REJECTED if is_bad else APPROVED}
+    if "s3_key" in record:
+        return moderate_object(record.get("bucket") or S3_BUCKET, record["s3_key"], record.get("category"))
+    raise ValueError("Record has neither 'text' nor 's3_key'")
+
+
+def _moderate_line(number: int, line: str) -> dict:
+    result = {"line": number}
+    try:
+        record = json.loads(line)
+        result["id"] = record.get("id")
+        result.update(moderate_record(record))
+    except Exception as e:
+        logging.error(f"Line {number} failed: {e}")
+        result.update(status=ERROR, error=str(e))
+    return result
+
+
+def _completed_lines(output_path: str) -> int:
+    """Count complete lines in the output, dropping a torn last line."""
+    if not os.path.exists(output_path):
+        return 0
+    count = 0
+    good_size = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            good_size += len(line)
+    if good_size != os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(good_size)
+    return count
+
+
+def _records(input_path: str):
+    """Yield (line number, line) for each non-blank input line, streaming."""
+    with open(input_path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if line.strip():
+                yield number, line
+
+
+def run_batch(input_path: str, output_path: str, workers: int = BATCH_RUNNER_WORKERS,
+              report_interval: float = BATCH_REPORT_INTERVAL) -> dict:
+    """
+    Moderate every record of ``input_path`` and append results to ``output_path``.
+
+    Records are read lazily and at most ``workers * 4`` are in flight, so
+    memory use does not depend on the file size. Results are written in
+    input order as soon as they and all records before them are done, which
+    is what lets a rerun skip exactly the records already in the output.
+
+    Returns:
+        dict: Counts per status, records processed, seconds and records/second.
+    """
+    skip = _completed_lines(output_path)
+    if skip:
+        logging.info(f"Resuming after {skip} completed records")
+
+    counts = {}
+    processed = 0
+    started = last_report = time.monotonic()
+    window = deque()
+
+    def write(result):
+        nonlocal processed, last_report
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        processed += 1
+        now = time.monotonic()
+        if now - last_report >= report_interval:
+            last_report = now
+            logging.info(f"{skip + processed} records done, {processed / (now - started):.1f} records/s")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as pool, \
+            open(output_path, "a", encoding="utf-8") as out:
+        for index, (number, line) in enumerate(_records(input_path)):
+            if index < skip:
+                continue
+            window.append(pool.submit(_moderate_line, number, line))
+            if len(window) >= workers * 4:
+                write(window.popleft().result())
+        while window:
+            write(window.popleft().result())
+
+    elapsed = time.monotonic() - started
+    summary = {"counts": counts, "processed": processed, "skipped_as_done": skip, "seconds": round(elapsed, 3),
+               "records_per_second": round(processed / elapsed, 3) if elapsed else 0.0}
+    logging.info(f"Batch finished: {summary}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Moderate a JSONL file of text and S3 object records.")
+    parser.add_argument("input", help="input JSONL file")
+    parser.add_argument("output", help="output JSONL file; an existing file is resumed")
+    parser.add_argument("--workers", type=int, default=BATCH_RUNNER_WORKERS)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    summary = run_batch(args.input, args.output, args.workers)
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
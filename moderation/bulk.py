@@ -0,0 +1,190 @@
+"""
+Moderate every object under an S3 prefix.
+
+    python -m moderation.bulk --prefix image/ --checkpoint image-scan.json > results.ndjson
+
+Results are written as NDJSON while the scan runs. With ``--checkpoint``
+an interrupted scan continues where it stopped when run again.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from aws_clients.clients import get_client
+from aws_clients.deletions import get_deletion_queue
+from moderation.objects import moderate_object
+from utils import get_file_category, S3_BUCKET, BULK_CONCURRENCY, BULK_CHECKPOINT_EVERY
+
+ERROR = "error"
+
+# Shared by every scan in the process, so concurrent scans together run at
+# most BULK_CONCURRENCY[category] moderations per category
+_SLOTS = {category: threading.BoundedSemaphore(workers) for category, workers in BULK_CONCURRENCY.items()}
+
+
+def _moderate_in_slot(slot, bucket: str, key: str, category: str, delete_rejected: bool) -> dict:
+    with slot:
+        return moderate_object(bucket, key, category, delete_rejected)
+
+
+class BulkScan:
+    """Page through a prefix with list_objects_v2 and moderate each object.
+
+    Every category gets its own pool of ``concurrency[category]`` threads,
+    so slow video and voice jobs cannot hold up images and text. Each
+    moderation also takes a process-wide slot for its category, so running
+    several scans at once does not multiply the load on AWS. Listing
+    pauses while too many objects are in flight, keeping memory flat for any
+    number of objects.
+
+    The checkpoint records a watermark: the last key, in listing order, up
+    to which every object is finished. Resuming starts the listing after it,
+    so objects finished past the watermark may be moderated again.
+    """
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = "", concurrency: dict = None,
+                 checkpoint_path: str = None, delete_rejected: bool = False,
+                 checkpoint_every: int = BULK_CHECKPOINT_EVERY):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.concurrency = {**BULK_CONCURRENCY, **(concurrency or {})}
+        self.checkpoint_path = checkpoint_path
+        self.delete_rejected = delete_rejected
+        self.checkpoint_every = checkpoint_every
+        self.start_after = None
+        self.counts = {}
+        self._since_checkpoint = 0
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            checkpoint = json.load(f)
+        if (checkpoint["bucket"], checkpoint["prefix"]) != (self.bucket, self.prefix):
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} belongs to s3://{checkpoint['bucket']}/{checkpoint['prefix']}"
+            )
+        self.start_after = checkpoint["start_after"]
+        self.counts = checkpoint["counts"]
+        logging.info(f"Resuming scan of s3://{self.bucket}/{self.prefix} after {self.start_after}")
+
+    def _save_checkpoint(self):
+        self._since_checkpoint = 0
+        if not self.checkpoint_path:
+            return
+        checkpoint = {"bucket": self.bucket, "prefix": self.prefix, "start_after": self.start_after,
+                      "counts": self.counts, "updated_at": time.time()}
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _list_keys(self):
+        params = {"Bucket": self.bucket, "Prefix": self.prefix}
+        if self.start_after:
+            params["StartAfter"] = self.start_after
+        for page in get_client("s3").get_paginator("list_objects_v2").paginate(**params):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith("/"):
+                    yield obj["Key"]
+
+    def run(self):
+        """Yield one result dict per object as it finishes, then a summary."""
+        pools = {
+            category: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"bulk-{category}")
+            for category, workers in self.concurrency.items()
+        }
+        finished = queue.Queue()
+        in_order = deque()  # keys in listing order, not yet behind the watermark
+        done = set()
+        max_in_flight = sum(self.concurrency.values()) * 2
+        in_flight = completed = 0
+        started = time.monotonic()
+
+        def collect(item):
+            nonlocal in_flight, completed
+            key, category, future = item
+            in_flight -= 1
+            completed += 1
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"Moderating s3://{self.bucket}/{key} failed: {e}")
+                result = {"key": key, "category": category, "status": ERROR, "error": str(e)}
+            self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+            done.add(key)
+            while in_order and in_order[0] in done:
+                self.start_after = in_order.popleft()
+                done.discard(self.start_after)
+            self._since_checkpoint += 1
+            if self._since_checkpoint >= self.checkpoint_every:
+                self._save_checkpoint()
+            return result
+
+        try:
+            for key in self._list_keys():
+                while in_flight >= max_in_flight:
+                    yield collect(finished.get())
+                category = get_file_category(key)
+                in_order.append(key)
+                in_flight += 1
+                pool = category if category in pools else "other"
+                future = pools[pool].submit(
+                    _moderate_in_slot, _SLOTS.get(pool, _SLOTS["other"]),
+                    self.bucket, key, category, self.delete_rejected,
+                )
+                future.add_done_callback(lambda f, k=key, c=category: finished.put((k, c, f)))
+                while not finished.empty():
+                    yield collect(finished.get_nowait())
+            while in_flight:
+                yield collect(finished.get())
+
+            elapsed = time.monotonic() - started
+            yield {"summary": {"bucket": self.bucket, "prefix": self.prefix, "counts": self.counts,
+                               "seconds": round(elapsed, 3), "start_after": self.start_after,
+                               "objects_per_second": round(completed / elapsed, 3) if elapsed else 0.0}}
+        finally:
+            # Also reached when the consumer stops early, e.g. a client disconnects
+            self._save_checkpoint()
+            for pool in pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse_concurrency(values):
+    concurrency = {}
+    for value in values or []:
+        category, _, workers = value.partition("=")
+        concurrency[category] = int(workers)
+    return concurrency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Moderate every object under an S3 prefix.")
+    parser.add_argument("--bucket", default=S3_BUCKET)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--concurrency", action="append", metavar="CATEGORY=N",
+                        help="concurrent moderations for a category, e.g. video=2, at most the "
+                             "BULK_CONCURRENCY default (repeatable)")
+    parser.add_argument("--checkpoint", help="checkpoint file; resumes the scan if it exists")
+    parser.add_argument("--delete-rejected", action="store_true", help="delete rejected objects")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+    scan = BulkScan(args.bucket, args.prefix, _parse_concurrency(args.concurrency),
+                    args.checkpoint, args.delete_rejected)
+    for result in scan.run():
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+    if args.delete_rejected:
+        get_deletion_queue().flush()
+
+
+if __name__ == "__main__":
+    main()
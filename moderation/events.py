@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote_plus
+
+from aws_clients.queues import LocalQueue, SQSQueue, unwrap_sns
+from moderation.jobs import RUNNING, COMPLETED, FAILED, InMemoryJobStore, get_job_store, send_webhook
+from moderation.objects import REJECTED, moderate_object
+from utils import (
+    PRESIGNED_UPLOAD_PREFIX, S3_EVENTS_ENABLED, S3_EVENT_QUEUE_URL, S3_EVENT_WORKERS, S3_EVENT_VISIBILITY_TIMEOUT,
+)
+
+
+def upload_job_id(key: str) -> str:
+    """Job id of a presigned upload: the UUID part of its generate_s3_key() name."""
+    return os.path.splitext(os.path.basename(key))[0]
+
+
+def created_objects(body: dict) -> list:
+    """Return the (bucket, key) pairs created according to an S3 event
+    notification, sent directly or wrapped in an SNS envelope."""
+    body = unwrap_sns(body)
+    objects = []
+    for record in body.get("Records", []):
+        if record.get("eventSource") != "aws:s3" or not record.get("eventName", "").startswith("ObjectCreated:"):
+            continue
+        s3 = record["s3"]
+        # Keys in S3 notifications are URL-encoded
+        objects.append((s3["bucket"]["name"], unquote_plus(s3["object"]["key"])))
+    return objects
+
+
+def moderate_upload(bucket: str, key: str) -> dict:
+    """Moderate a direct upload, deleting it if rejected, and record the
+    outcome on its job (if this process's job store has it)."""
+    store = get_job_store()
+    job_id = upload_job_id(key)
+    store.update(job_id, status=RUNNING)
+    try:
+        result = moderate_object(bucket, key, delete_rejected=True)
+    except Exception as e:
+        job = store.update(job_id, status=FAILED, error=str(e))
+        _deliver(job)
+        raise
+    job = store.update(job_id, status=COMPLETED, result=result)
+    _deliver(job)
+    return result
+
+
+def _deliver(job):
+    callback_url = job.get("callback_url") if job is not None else None
+    if callback_url and not send_webhook(callback_url, job):
+        logging.error(f"Could not deliver callback for job {job['job_id']} to {callback_url}")
+
+
+class UploadEventListener:
+    """Moderate objects uploaded with presigned URLs as their S3 events arrive.
+
+    Messages are handled by ``workers`` threads; no more messages are
+    received while all of them are busy, so a backlog stays in the queue.
+    A message is acked once every object in it was moderated; on failure it
+    is left for the queue to redeliver. Messages are received hidden for
+    ``visibility_timeout`` seconds, and the messages still being handled
+    are hidden again every half of that, so a long video or voice job is
+    not redelivered and moderated twice. Objects outside
+    PRESIGNED_UPLOAD_PREFIX (e.g. uploads through the API, transcripts) are
+    ignored.
+    """
+
+    def __init__(self, source, workers: int = S3_EVENT_WORKERS, prefix: str = PRESIGNED_UPLOAD_PREFIX,
+                 visibility_timeout: int = S3_EVENT_VISIBILITY_TIMEOUT):
+        self.source = source
+        self.prefix = prefix
+        self.visibility_timeout = visibility_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-events")
+        self._slots = threading.BoundedSemaphore(workers)
+        self._thread = threading.Thread(target=self._run, name="s3-event-listener", daemon=True)
+        self._keep_alive_thread = threading.Thread(target=self._keep_alive, name="s3-event-visibility", daemon=True)
+        self._lock = threading.Lock()
+        self._handling = set()
+        self._counters = {"messages": 0, "objects": 0, "ignored": 0, "rejected": 0, "failed": 0, "extended": 0}
+
+    def start(self):
+        self._thread.start()
+        self._keep_alive_thread.start()
+        return self
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _run(self):
+        while True:
+            try:
+                messages = self.source.receive(visibility_timeout=self.visibility_timeout)
+            except Exception as e:
+                logging.error(f"Receiving S3 events failed: {e}")
+                time.sleep(5)
+                continue
+            for message in messages:
+                self._slots.acquire()
+                with self._lock:
+                    self._handling.add(message)
+                self._pool.submit(self._handle, message)
+
+    def _keep_alive(self):
+        while True:
+            time.sleep(self.visibility_timeout / 2)
+            with self._lock:
+                messages = list(self._handling)
+            for message in messages:
+                try:
+                    message.extend(self.visibility_timeout)
+                    self._count("extended")
+                except Exception as e:
+                    logging.error(f"Extending the visibility of an S3 event failed: {e}")
+
+    def _handle(self, message):
+        try:
+            self._count("messages")
+            objects = created_objects(message.body)
+            ok = True
+            for bucket, key in objects:
+                if not key.startswith(self.prefix):
+                    self._count("ignored")
+                    continue
+                self._count("objects")
+                try:
+                    result = moderate_upload(bucket, key)
+                except Exception as e:
+                    logging.error(f"Moderating s3://{bucket}/{key} failed: {e}")
+                    self._count("failed")
+                    ok = False
+                    continue
+                if result["status"] == REJECTED:
+                    self._count("rejected")
+            if ok:
+                message.ack()
+        except Exception as e:
+            logging.error(f"Handling S3 event failed: {e}")
+        finally:
+            with self._lock:
+                self._handling.discard(message)
+            self._slots.release()
+
+
+_listener = None
+_events = None
+_lock = threading.Lock()
+
+
+def start_upload_events():
+    """Start the process-wide S3 event listener if S3_EVENTS_ENABLED is set;
+    return it, or None when disabled.
+
+    Raises RuntimeError when events come from SQS but jobs are kept in
+    process memory: the worker receiving an event could not update a job
+    another worker created, and its ``/jobs/{id}`` would stay pending.
+    """
+    global _listener, _events
+    if S3_EVENTS_ENABLED and _listener is None:
+        if S3_EVENT_QUEUE_URL and isinstance(get_job_store(), InMemoryJobStore):
+            raise RuntimeError('S3 event uploads need a shared job store, e.g. JOB_STORE_BACKEND = "sqlite"')
+        with _lock:
+            if _listener is None:
+                _events = SQSQueue(S3_EVENT_QUEUE_URL) if S3_EVENT_QUEUE_URL else LocalQueue()
+                _listener = UploadEventListener(_events).start()
+    return _listener
+
+
+def get_upload_event_listener():
+    """Return the running S3 event listener, or None."""
+    return _listener
+
+
+def get_upload_event_queue():
+    """Return the queue S3 events are read from (None if disabled).
+
+    With no S3_EVENT_QUEUE_URL configured this is a LocalQueue that local
+    stand-ins can ``send()`` S3 event notifications to.
+    """
+    start_upload_events()
+    return _events
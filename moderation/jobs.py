@@ -0,0 +1,210 @@
+import ipaddress
+import json
+import logging
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import urlsplit
+
+from utils import (
+    JOB_STORE_BACKEND, JOB_STORE_SQLITE_PATH, JOB_TTL_SECONDS, WEBHOOK_TIMEOUT, WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_ALLOWED_HOSTS,
+)
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobStore:
+    """Interface for storing the state of background moderation jobs.
+
+    A job is a plain dict with at least ``job_id``, ``status``,
+    ``created_at`` and ``updated_at``; ``result`` holds the moderation
+    response once the job completes and ``error`` the message if it fails.
+    """
+
+    def create(self, **fields) -> dict:
+        raise NotImplementedError
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    @staticmethod
+    def _new_job(fields) -> dict:
+        now = time.time()
+        job = {"job_id": str(uuid.uuid4()), "status": PENDING, "created_at": now,
+               "updated_at": now, "result": None, "error": None}
+        job.update(fields)
+        return job
+
+
+class InMemoryJobStore(JobStore):
+    """Job store local to one process. Finished jobs expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = JOB_TTL_SECONDS):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, **fields) -> dict:
+        job = self._new_job(fields)
+        with self._lock:
+            self._expire()
+            self._jobs[job["job_id"]] = job
+        return dict(job)
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job.update(fields, updated_at=time.time())
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["status"] in (COMPLETED, FAILED) and job["updated_at"] < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore(JobStore):
+    """Job store in a SQLite file, shared by every worker process on the host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def create(self, **fields) -> dict:
+        job = self._new_job(fields)
+        self._connection().execute(
+            "INSERT INTO jobs (job_id, data) VALUES (?, ?)", (job["job_id"], json.dumps(job))
+        )
+        return job
+
+    def update(self, job_id: str, **fields) -> Optional[dict]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("ROLLBACK")
+                return None
+            job = json.loads(row[0])
+            job.update(fields, updated_at=time.time())
+            conn.execute("UPDATE jobs SET data = ? WHERE job_id = ?", (json.dumps(job), job_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+
+_job_store = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """Return the job store selected by JOB_STORE_BACKEND ("memory" or "sqlite")."""
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                if JOB_STORE_BACKEND == "sqlite":
+                    _job_store = SQLiteJobStore(JOB_STORE_SQLITE_PATH)
+                else:
+                    _job_store = InMemoryJobStore()
+    return _job_store
+
+
+def set_job_store(store: JobStore):
+    """Replace the job store, e.g. with a custom backend."""
+    global _job_store
+    with _job_store_lock:
+        _job_store = store
+
+
+def validate_callback_url(url: str) -> str:
+    """Check that the server may POST job results to ``url`` and return it.
+
+    The URL must be https. If WEBHOOK_ALLOWED_HOSTS is set its host must be
+    one of them; otherwise every address the host resolves to must be
+    public, so callbacks can't reach loopback, private networks or the
+    instance metadata endpoint. Resolves DNS, so call it off the event loop.
+
+    :raises ValueError: If the URL is not acceptable
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.scheme != "https" or not host:
+        raise ValueError("Callback URL must be an https URL")
+    if WEBHOOK_ALLOWED_HOSTS:
+        if host not in WEBHOOK_ALLOWED_HOSTS:
+            raise ValueError(f"Callback host {host} is not allowed")
+        return url
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, UnicodeError):
+        raise ValueError(f"Callback host {host} does not resolve")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"Callback host {host} resolves to a non-public address")
+    return url
+
+
+def send_webhook(url: str, payload: dict) -> bool:
+    """POST ``payload`` as JSON to ``url``, retrying with backoff.
+
+    The URL is validated again before every attempt (its DNS may have
+    changed since the job was created) and redirects are not followed.
+
+    :return: True if the callback was delivered, else False
+    """
+    import requests  # deferred: only needed when a callback is requested
+
+    for attempt in range(1, WEBHOOK_MAX_ATTEMPTS + 1):
+        try:
+            validate_callback_url(url)
+        except ValueError as e:
+            logging.error(f"Not delivering webhook to {url}: {e}")
+            return False
+        try:
+            resp = requests.post(url, json=payload, timeout=WEBHOOK_TIMEOUT, allow_redirects=False)
+            if resp.status_code < 500:
+                return 200 <= resp.status_code < 300
+            logging.warning(f"Webhook {url} returned {resp.status_code} (attempt {attempt})")
+        except requests.RequestException as e:
+            logging.warning(f"Webhook {url} failed (attempt {attempt}): {e}")
+        if attempt < WEBHOOK_MAX_ATTEMPTS:
+            time.sleep(2 ** attempt)
+    return False
@@ -0,0 +1,82 @@
+import logging
+import os
+
+from aws_clients.clients import get_client
+from aws_clients.deletions import get_deletion_queue
+from aws_clients.rekognition import moderate_image, start_video_moderation
+from moderation.text import moderate_text_content
+from moderation.voice import moderate_voice
+from utils import get_file_category, TEXT_OBJECT_MAX_BYTES, VOICE_ANALYSIS_MAX_BYTES
+
+# Extensions in the "txt" category that can be read as plain text
+PLAIN_TEXT_EXTENSIONS = {".txt", ".md", ".json", ".csv", ".log"}
+
+# Statuses of a moderated object
+APPROVED = "approved"
+REJECTED = "rejected"
+NO_CONTENT = "no_content"
+SKIPPED = "skipped"
+
+
+def _read_text_object(bucket: str, key: str) -> str:
+    body = get_client("s3").get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{TEXT_OBJECT_MAX_BYTES - 1}")["Body"]
+    try:
+        return body.read().decode("utf-8", errors="ignore")
+    finally:
+        body.close()
+
+
+def _read_voice_object(bucket: str, key: str):
+    """Return a voice object's bytes, or None if it is larger than VOICE_ANALYSIS_MAX_BYTES."""
+    # One byte over the limit tells a complete small file from a truncated large one
+    body = get_client("s3").get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{VOICE_ANALYSIS_MAX_BYTES}")["Body"]
+    try:
+        data = body.read()
+    finally:
+        body.close()
+    return data if len(data) <= VOICE_ANALYSIS_MAX_BYTES else None
+
+
+def moderate_object(bucket: str, key: str, category: str = None, delete_rejected: bool = False) -> dict:
+    """
+    Moderate an object that is already stored in S3, blocking until done.
+
+    The object is dispatched by its category (see get_file_category) to the
+    same moderation functions the upload API uses.
+
+    Args:
+        bucket (str): Bucket holding the object.
+        key (str): Object key.
+        category (str): Category to moderate as; derived from the key if omitted.
+        delete_rejected (bool): Queue rejected objects for deletion.
+
+    Returns:
+        dict: ``key``, ``category`` and ``status`` (approved, rejected,
+        no_content or skipped).
+    """
+    category = category or get_file_category(key)
+    result = {"key": key, "category": category}
+
+    if category == "image":
+        is_bad = moderate_image(bucket, key)
+    elif category == "video":
+        is_bad = start_video_moderation(bucket, key).result()
+    elif category == "voice":
+        verdict = moderate_voice(bucket, key, _read_voice_object(bucket, key))
+        if not verdict.has_speech:
+            return {**result, "status": NO_CONTENT}
+        is_bad = verdict.blocked
+    elif category == "txt" and os.path.splitext(key.lower())[1] in PLAIN_TEXT_EXTENSIONS:
+        text = _read_text_object(bucket, key)
+        if not text.strip():
+            return {**result, "status": NO_CONTENT}
+        is_bad = moderate_text_content(text)
+    else:
+        return {**result, "status": SKIPPED}
+
+    if is_bad:
+        if delete_rejected:
+            get_deletion_queue().enqueue(bucket, key)
+        logging.info(f"Rejected s3://{bucket}/{key}")
+        return {**result, "status": REJECTED}
+    return {**result, "status": APPROVED}
@@ -0,0 +1,284 @@
+import io
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from itertools import combinations
+
+from utils import (
+    PHASH_INDEX_ENABLED, PHASH_INDEX_PATH, PHASH_BLOCK_DISTANCE, PHASH_ALLOW_DISTANCE, PHASH_INDEX_MAX_ENTRIES,
+    PHASH_INDEX_POLICIES,
+)
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+_Image = None
+_pil_checked = False
+
+
+def _pil_image():
+    """Return PIL.Image, imported on first use, or None if Pillow is missing.
+
+    Pillow is optional; without it the index is skipped. Importing it lazily
+    keeps it off the startup path.
+    """
+    global _Image, _pil_checked
+    if not _pil_checked:
+        try:
+            from PIL import Image
+            _Image = Image
+        except ImportError:
+            _Image = None
+        _pil_checked = True
+    return _Image
+
+
+def dhash(data: bytes):
+    """Return the 64-bit difference hash of an image, or None if it can't be decoded.
+
+    The image is reduced to a 9x8 grayscale thumbnail and each bit records
+    whether a pixel is brighter than its right-hand neighbour, so the hash
+    survives re-encoding, resizing and small edits.
+    """
+    Image = _pil_image()
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (64, 64))  # lets JPEG decode at reduced size
+            pixels = list(img.convert("L").resize((9, 8), Image.Resampling.BILINEAR).getdata())
+    except Exception as e:
+        logging.info(f"Could not decode image for perceptual hash: {e}")
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+
+def _band_neighbours(value: int, radius: int):
+    """Yield every BAND_BITS-wide value within ``radius`` bits of ``value``."""
+    yield value
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            yield flipped
+
+
+class _PolicyIndex:
+    """Multi-index hash table over the entries recorded under one policy."""
+
+    def __init__(self):
+        self.verdicts = {}  # hash -> verdict
+        self.bands = [dict() for _ in range(BANDS)]  # band value -> hashes
+
+    def add(self, value: int, verdict: bool):
+        if value not in self.verdicts:
+            for band in range(BANDS):
+                key = (value >> (band * BAND_BITS)) & BAND_MASK
+                self.bands[band].setdefault(key, set()).add(value)
+        self.verdicts[value] = verdict
+
+    def remove(self, value: int):
+        del self.verdicts[value]
+        for band in range(BANDS):
+            key = (value >> (band * BAND_BITS)) & BAND_MASK
+            bucket = self.bands[band][key]
+            bucket.discard(value)
+            if not bucket:
+                del self.bands[band][key]
+
+    def nearest(self, value: int, max_distance: int):
+        """Return (distance, verdict) of the closest entry within ``max_distance``."""
+        # Pigeonhole: if two hashes differ in at most max_distance bits, at
+        # least one of the BANDS bands differs in at most max_distance // BANDS
+        radius = max_distance // BANDS
+        best = None
+        seen = set()
+        for band in range(BANDS):
+            table = self.bands[band]
+            key = (value >> (band * BAND_BITS)) & BAND_MASK
+            for probe in _band_neighbours(key, radius):
+                for stored in table.get(probe, ()):
+                    if stored in seen:
+                        continue
+                    seen.add(stored)
+                    distance = (value ^ stored).bit_count()
+                    if distance > max_distance:
+                        continue
+                    candidate = (distance, not self.verdicts[stored])  # ties favour "bad"
+                    if best is None or candidate < best:
+                        best = candidate
+        if best is None:
+            return None
+        return best[0], not best[1]
+
+    def __len__(self):
+        return len(self.verdicts)
+
+
+def _signed(value: int) -> int:
+    """``value`` as the signed 64-bit integer SQLite stores."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+class PerceptualHashIndex:
+    """Verdicts of previously moderated images, searchable by Hamming distance.
+
+    Entries are kept per policy (the image policy version) because a
+    verdict only holds for the policy it was made under. Only the
+    ``max_policies`` policies most recently recorded under are kept (by
+    default the current one and the one before it, which requests already
+    in flight may still use), and at most ``max_entries`` entries, the
+    oldest going first. With a ``path`` the index is persisted to SQLite
+    and reloaded on start; evicted entries are deleted there too.
+    """
+
+    def __init__(self, path: str = None,
+                 block_distance: int = PHASH_BLOCK_DISTANCE, allow_distance: int = PHASH_ALLOW_DISTANCE,
+                 max_entries: int = PHASH_INDEX_MAX_ENTRIES, max_policies: int = PHASH_INDEX_POLICIES):
+        self.path = path
+        self.block_distance = block_distance
+        self.allow_distance = allow_distance
+        self.max_entries = max_entries
+        self.max_policies = max_policies
+        self._policies = OrderedDict()  # policy -> _PolicyIndex, least recently recorded under first
+        self._ages = OrderedDict()  # (policy, hash), oldest first
+        self._lock = threading.RLock()
+        self._conn = None
+        self._counters = {"lookups": 0, "blocked": 0, "allowed": 0, "evicted": 0}
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS phashes "
+                "(policy TEXT NOT NULL, hash INTEGER NOT NULL, verdict INTEGER NOT NULL, "
+                "PRIMARY KEY (policy, hash))"
+            )
+            self._load()
+
+    def _load(self):
+        count = 0
+        # INSERT OR REPLACE gives a rewritten row a new rowid, so this is oldest first
+        rows = self._conn.execute("SELECT policy, hash, verdict FROM phashes ORDER BY rowid").fetchall()
+        for policy, value, verdict in rows:
+            self._record(value & ((1 << HASH_BITS) - 1), bool(verdict), policy)
+            count += 1
+        self._evict()
+        logging.info(f"Loaded {count} perceptual hashes from {self.path}, kept {len(self)}")
+
+    def _record(self, value: int, verdict: bool, policy: str):
+        index = self._policies.get(policy)
+        if index is None:
+            index = self._policies[policy] = _PolicyIndex()
+        self._policies.move_to_end(policy)
+        index.add(value, verdict)
+        self._ages[(policy, value)] = None
+        self._ages.move_to_end((policy, value))
+
+    def _evict(self):
+        while len(self._policies) > self.max_policies:
+            policy, index = self._policies.popitem(last=False)
+            for value in index.verdicts:
+                del self._ages[(policy, value)]
+            self._counters["evicted"] += len(index)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM phashes WHERE policy = ?", (policy,))
+            logging.info(f"Dropped {len(index)} perceptual hashes of superseded policy {policy}")
+        while len(self._ages) > self.max_entries:
+            (policy, value), _ = self._ages.popitem(last=False)
+            index = self._policies[policy]
+            index.remove(value)
+            if not index:
+                del self._policies[policy]
+            self._counters["evicted"] += 1
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM phashes WHERE policy = ? AND hash = ?", (policy, _signed(value)))
+
+    def add(self, value: int, verdict: bool, policy: str = ""):
+        """Record the verdict for an image hash."""
+        with self._lock:
+            self._record(value, verdict, policy)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO phashes (policy, hash, verdict) VALUES (?, ?, ?)",
+                    (policy, _signed(value), int(verdict)),
+                )
+            self._evict()
+
+    def match(self, value: int, policy: str = ""):
+        """Return the locally decided verdict for an image hash, or None.
+
+        A near-duplicate of a known-bad image within ``block_distance``
+        blocks; one of a known-good image within ``allow_distance`` passes.
+        """
+        with self._lock:
+            self._counters["lookups"] += 1
+            index = self._policies.get(policy)
+            if index is None:
+                return None
+            found = index.nearest(value, max(self.block_distance, self.allow_distance))
+            if found is None:
+                return None
+            distance, verdict = found
+            if verdict and distance <= self.block_distance:
+                self._counters["blocked"] += 1
+                return True
+            if not verdict and distance <= self.allow_distance:
+                self._counters["allowed"] += 1
+                return False
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._ages)
+            stats["policies"] = len(self._policies)
+        return stats
+
+    def __len__(self):
+        return len(self._ages)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_phash_index():
+    """Return the shared index, or None if disabled or Pillow is missing."""
+    global _index
+    if not PHASH_INDEX_ENABLED or _pil_image() is None:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PerceptualHashIndex(PHASH_INDEX_PATH)
+    return _index
+
+
+def moderate_with_phash(data: bytes, policy: str, moderate) -> bool:
+    """Decide an image from near-duplicates in the index, else call ``moderate``.
+
+    :param data: Image bytes
+    :param policy: Key of the policy the verdict is made under, e.g. "policy=<image policy version>"
+    :param moderate: Zero-argument callable returning True if the image is unsafe
+    :return: True if the image is unsafe
+    """
+    index = get_phash_index()
+    value = dhash(data) if index is not None else None
+    if value is None:
+        return moderate()
+
+    verdict = index.match(value, policy)
+    if verdict is not None:
+        return verdict
+
+    verdict = moderate()
+    index.add(value, verdict, policy)
+    return verdict
@@ -0,0 +1,215 @@
+import logging
+import os
+import re
+import threading
+import time
+
+from utils import PREFILTER_ENABLED, PREFILTER_BLOCKLIST_PATH, PREFILTER_SAFE_PHRASES_PATH, PREFILTER_RELOAD_INTERVAL
+
+# Verdicts returned by the prefilter
+BLOCK = "block"
+PASS = "pass"
+UNSURE = None
+
+# Common PII shapes. Only matches that are unambiguous on their own are
+# listed here; anything subtler is left to Comprehend.
+PII_PATTERNS = {
+    "email": re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}"),
+    "phone": re.compile(r"(?<![\w+])(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{3}\)|\d{3})[\s.-]\d{3}[\s.-]\d{4}(?!\w)"),
+    "us_ssn": re.compile(r"(?<!\d)\d{3}-\d{2}-\d{4}(?!\d)"),
+    "card_number": re.compile(r"(?<!\d)(?:\d[ -]?){12,18}\d(?!\d)"),
+}
+
+_NORMALIZE = re.compile(r"[^\w]+")
+_DIGIT_RUN = re.compile(r"\d{3}")
+
+
+def _luhn_valid(digits: str) -> bool:
+    total = 0
+    for i, ch in enumerate(reversed(digits)):
+        n = int(ch)
+        if i % 2:
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+    return total % 10 == 0
+
+
+def find_pii(text: str):
+    """Return the name of the first PII shape found in ``text``, or None."""
+    # Cheap scans first: most text has no "@" and no run of digits
+    has_at = "@" in text
+    has_digits = _DIGIT_RUN.search(text) is not None
+    if not has_at and not has_digits:
+        return None
+    for name, pattern in PII_PATTERNS.items():
+        if (name == "email" and not has_at) or (name != "email" and not has_digits):
+            continue
+        for match in pattern.finditer(text):
+            if name == "card_number":
+                digits = re.sub(r"\D", "", match.group())
+                if not _luhn_valid(digits):
+                    continue
+            return name
+    return None
+
+
+class AhoCorasick:
+    """Multi-pattern matcher finding every term of a list in one pass over the text.
+
+    Terms only match on word boundaries, so a blocked word inside a longer,
+    harmless word does not trigger.
+    """
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for term in terms:
+            self._add(term)
+        self._build()
+
+    def _add(self, term: str):
+        node = 0
+        for ch in term:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (len(term),)
+
+    def _build(self):
+        # Breadth-first, so every node's fail link is set before its children's.
+        # Fail transitions are folded into each node's table, turning the
+        # automaton into a DFA: one dict lookup per character of input.
+        queue = list(self._goto[0].values())
+        for node in queue:
+            fail_table = self._goto[self._fail[node]]
+            for ch, child in list(self._goto[node].items()):
+                queue.append(child)
+                self._fail[child] = fail_table.get(ch, 0) if node else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+            for ch, target in fail_table.items():
+                if node and ch not in self._goto[node]:
+                    self._goto[node][ch] = target
+
+    def search(self, text: str):
+        """Return the first term found in ``text`` (on word boundaries), or None."""
+        goto, out = self._goto, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                end = i + 1
+                for length in out[node]:
+                    start = end - length
+                    if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                        return text[start:end]
+        return None
+
+
+def _read_terms(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+
+
+class TextPrefilter:
+    """Cheap local first stage in front of Comprehend.
+
+    Returns BLOCK for text containing a blocklisted term (or, unless PII is
+    allowed, an obvious PII shape), PASS for text that is exactly one of the
+    known-safe phrases, and UNSURE for everything else. Term lists are
+    re-read when their files change.
+    """
+
+    def __init__(self, blocklist_path=PREFILTER_BLOCKLIST_PATH, safe_phrases_path=PREFILTER_SAFE_PHRASES_PATH,
+                 reload_interval=PREFILTER_RELOAD_INTERVAL):
+        self.blocklist_path = blocklist_path
+        self.safe_phrases_path = safe_phrases_path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._checked_at = 0.0
+        self._matcher = AhoCorasick([])
+        self._safe_phrases = frozenset()
+        self._counters = {"blocked": 0, "passed": 0, "forwarded": 0, "bytes": 0, "seconds": 0.0}
+        self.reload()
+
+    def _current_mtimes(self):
+        return tuple(
+            os.path.getmtime(path) if path and os.path.exists(path) else None
+            for path in (self.blocklist_path, self.safe_phrases_path)
+        )
+
+    def reload(self, force: bool = False):
+        """Rebuild the matchers if the term files changed (or ``force``)."""
+        mtimes = self._current_mtimes()
+        if not force and mtimes == self._mtimes:
+            return
+        terms = _read_terms(self.blocklist_path)
+        matcher = AhoCorasick(terms)
+        safe_phrases = frozenset(_NORMALIZE.sub(" ", p).strip() for p in _read_terms(self.safe_phrases_path))
+        with self._lock:
+            self._matcher, self._safe_phrases, self._mtimes = matcher, safe_phrases, mtimes
+        logging.info(f"Prefilter loaded {len(terms)} blocked terms and {len(safe_phrases)} safe phrases")
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            try:
+                self.reload()
+            except OSError as e:
+                logging.error(f"Prefilter reload failed: {e}")
+
+    def check(self, text: str, allow_pii: bool = False):
+        """Return BLOCK, PASS or UNSURE for ``text``."""
+        self._maybe_reload()
+        start = time.perf_counter()
+        lowered = text.lower()
+        if self._matcher.search(lowered) is not None:
+            verdict = BLOCK
+        elif not allow_pii and find_pii(text) is not None:
+            verdict = BLOCK
+        elif _NORMALIZE.sub(" ", lowered).strip() in self._safe_phrases:
+            verdict = PASS
+        else:
+            verdict = UNSURE
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._counters["bytes"] += len(text)
+            self._counters["seconds"] += elapsed
+            self._counters["blocked" if verdict == BLOCK else "passed" if verdict == PASS else "forwarded"] += 1
+        return verdict
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        total = stats["blocked"] + stats["passed"] + stats["forwarded"]
+        stats["settled_locally"] = (stats["blocked"] + stats["passed"]) / total if total else 0.0
+        stats["mb_per_second"] = stats["bytes"] / stats["seconds"] / 1e6 if stats["seconds"] else 0.0
+        return stats
+
+
+_prefilter = None
+_prefilter_lock = threading.Lock()
+
+
+def get_prefilter():
+    """Return the shared prefilter, or None if PREFILTER_ENABLED is off."""
+    global _prefilter
+    if not PREFILTER_ENABLED:
+        return None
+    if _prefilter is None:
+        with _prefilter_lock:
+            if _prefilter is None:
+                _prefilter = TextPrefilter()
+    return _prefilter
@@ -0,0 +1,193 @@
+import io
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import uuid
+import wave
+from typing import Optional
+
+from aws_clients.clients import get_client
+from aws_clients.deletions import get_deletion_queue
+from aws_clients.s3 import put_bytes
+from aws_clients.transcribe import start_transcription, cancel_transcription
+from moderation.audio import AudioAnalysis, decode_audio, detect_speech, expected_transcription_seconds
+from moderation.text import moderate_text_content
+from utils import (
+    FFMPEG_PATH, FFMPEG_CONVERT_TIMEOUT, FFMPEG_CONVERT_SECONDS_PER_MB, TRANSCRIBE_SEGMENTING_ENABLED,
+    TRANSCRIBE_SEGMENT_MIN_SECONDS, TRANSCRIBE_SEGMENT_SECONDS, TRANSCRIBE_SEGMENT_OVERLAP_SECONDS,
+    TRANSCRIBE_SEGMENT_PREFIX,
+)
+
+# Format segments are converted to when the source is not a plain PCM WAV
+SEGMENT_RATE = 16000
+
+
+def _pcm_wav(source: str, workdir: str) -> Optional[str]:
+    """Return the path of a 16-bit PCM WAV version of ``source`` (itself if it
+    already is one), or None if it can't be converted."""
+    try:
+        with wave.open(source) as wav:
+            if wav.getsampwidth() == 2:
+                return source
+    except (wave.Error, EOFError):
+        pass
+    ffmpeg = shutil.which(FFMPEG_PATH)
+    if ffmpeg is None:
+        return None
+    target = os.path.join(workdir, "audio.wav")
+    # Long recordings take a while to decode, so the limit grows with the file
+    timeout = FFMPEG_CONVERT_TIMEOUT + FFMPEG_CONVERT_SECONDS_PER_MB * os.path.getsize(source) / (1024 * 1024)
+    try:
+        result = subprocess.run(
+            [ffmpeg, "-nostdin", "-v", "error", "-y", "-i", source,
+             "-ac", "1", "-ar", str(SEGMENT_RATE), "-c:a", "pcm_s16le", target],
+            capture_output=True, timeout=timeout,
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logging.warning(f"ffmpeg could not convert audio: {e}")
+        return None
+    if result.returncode != 0:
+        logging.warning(f"ffmpeg could not convert audio: {result.stderr.decode(errors='ignore').strip()}")
+        return None
+    return target
+
+
+def wav_duration(path: str) -> float:
+    with wave.open(path) as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def split_wav(path: str, segment_seconds: float = TRANSCRIBE_SEGMENT_SECONDS,
+              overlap_seconds: float = TRANSCRIBE_SEGMENT_OVERLAP_SECONDS):
+    """Yield (start, end, WAV bytes) for consecutive segments of a PCM WAV
+    file, each overlapping the previous one by ``overlap_seconds``.
+
+    Only one segment is held in memory at a time.
+    """
+    with wave.open(path) as wav:
+        rate, total = wav.getframerate(), wav.getnframes()
+        length = int(segment_seconds * rate)
+        step = max(1, length - int(overlap_seconds * rate))
+        start = 0
+        while True:
+            wav.setpos(start)
+            frames = wav.readframes(min(length, total - start))
+            segment = io.BytesIO()
+            with wave.open(segment, "wb") as out:
+                out.setparams(wav.getparams())
+                out.writeframes(frames)
+            end = min(start + length, total)
+            yield start / rate, end / rate, segment.getvalue()
+            if end >= total:
+                return
+            start += step
+
+
+class _SegmentedTranscription:
+    """Transcribe the segments of one file as parallel jobs and moderate
+    each transcript as soon as it arrives."""
+
+    def __init__(self, bucket: str, allow_pii: bool):
+        self.bucket = bucket
+        self.allow_pii = allow_pii
+        self.prefix = f"{TRANSCRIBE_SEGMENT_PREFIX}{uuid.uuid4()}/"
+        self.keys = []
+        self.jobs = {}  # segment index -> job name, for jobs not yet handled
+        self.texts = {}
+        self.done = queue.Queue()
+        self.blocked = False
+
+    def run(self, wav_path: str) -> dict:
+        try:
+            for index, (start, end, data) in enumerate(split_wav(wav_path)):
+                # Stop launching jobs once an earlier segment has blocked
+                self._handle_finished(block=False)
+                if self.blocked:
+                    break
+                self._start(index, start, end, data)
+            while self.jobs and not self.blocked:
+                self._handle_finished(block=True)
+        finally:
+            for job_name in self.jobs.values():
+                cancel_transcription(job_name)
+            for key in self.keys:
+                get_deletion_queue().enqueue(self.bucket, key)
+
+        transcript = "" if self.blocked else " ".join(self.texts[index] for index in sorted(self.texts)).strip()
+        return {"blocked": self.blocked, "transcript": transcript, "segments": len(self.keys)}
+
+    def _start(self, index: int, start: float, end: float, data: bytes):
+        speech = detect_speech(*decode_audio(data, "segment.wav"))
+        if not speech.has_speech:
+            return
+        key = f"{self.prefix}{index:05d}.wav"
+        if not put_bytes(data, self.bucket, key, content_type="audio/wav"):
+            raise RuntimeError(f"Upload of audio segment {key} failed")
+        self.keys.append(key)
+        job_name, future = start_transcription(
+            f"s3://{self.bucket}/{key}",
+            expected_seconds=expected_transcription_seconds(AudioAnalysis(end - start, speech.speech_seconds)),
+        )
+        self.jobs[index] = job_name
+        future.add_done_callback(lambda f: self.done.put((index, f)))
+
+    def _handle_finished(self, block: bool):
+        while True:
+            try:
+                index, future = self.done.get(block=block)
+            except queue.Empty:
+                return
+            block = False
+            if future.cancelled() or index not in self.jobs:
+                continue
+            del self.jobs[index]
+            text = future.result()
+            self.texts[index] = text
+            if text.strip() and moderate_text_content(text, self.allow_pii):
+                logging.info(f"Segment {index} blocked; cancelling {len(self.jobs)} remaining jobs")
+                self.blocked = True
+                return
+
+
+def moderate_long_audio(bucket: str, key: str, data: bytes = None, allow_pii: bool = False,
+                        path: str = None) -> Optional[dict]:
+    """
+    Moderate long audio as parallel Transcribe jobs over overlapping segments.
+
+    Each segment's transcript is moderated as soon as its job finishes; the
+    first one that blocks rejects the file and the remaining jobs are
+    cancelled. Silent segments are not transcribed at all.
+
+    Args:
+        bucket (str): Bucket holding the audio.
+        key (str): Object key of the audio.
+        data (bytes): The audio itself, if already in memory; otherwise it
+            is downloaded.
+        allow_pii (bool): If True, PII will not cause rejection.
+        path (str): A local copy of the audio, used instead of downloading it.
+
+    Returns:
+        dict: ``blocked`` (bool), ``segments`` (jobs started) and
+        ``transcript`` (segment texts in order, empty if blocked; words in
+        the overlaps appear twice). None if the audio is shorter than
+        TRANSCRIBE_SEGMENT_MIN_SECONDS or can't be decoded, in which case
+        it should be transcribed as a single job.
+    """
+    if not TRANSCRIBE_SEGMENTING_ENABLED:
+        return None
+    with tempfile.TemporaryDirectory() as workdir:
+        source = path
+        if source is None:
+            source = os.path.join(workdir, "source" + os.path.splitext(key)[1].lower())
+            if data is not None:
+                with open(source, "wb") as f:
+                    f.write(data)
+            else:
+                get_client("s3").download_file(bucket, key, source)
+        wav_path = _pcm_wav(source, workdir)
+        if wav_path is None or wav_duration(wav_path) < TRANSCRIBE_SEGMENT_MIN_SECONDS:
+            return None
+        return _SegmentedTranscription(bucket, allow_pii).run(wav_path)
@@ -0,0 +1,27 @@
+from aws_clients import detect_bad_content
+from moderation.prefilter import get_prefilter, BLOCK, PASS
+from utils.policy import get_policy
+
+
+def moderate_text_content(text: str, allow_pii: bool = False) -> bool:
+    """
+    Moderate text, settling it locally when possible.
+    Return True if content is bad (should be blocked).
+
+    The local prefilter answers obvious cases (blocklisted terms, clear PII,
+    known-safe phrases); everything else goes to Comprehend through
+    detect_bad_content.
+
+    :param text: The text to analyze.
+    :param allow_pii: If True, PII will not cause rejection (nor does it when
+                      the policy disables the PII check).
+    """
+    allow_pii = allow_pii or "pii" not in get_policy().text.enabled
+    prefilter = get_prefilter()
+    if prefilter is not None:
+        verdict = prefilter.check(text, allow_pii)
+        if verdict == BLOCK:
+            return True
+        if verdict == PASS:
+            return False
+    return detect_bad_content(text, allow_pii)
@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+
+from aws_clients.transcribe import start_transcription
+from moderation.audio import analyze_audio, expected_transcription_seconds
+from moderation.segments import moderate_long_audio
+from moderation.text import moderate_text_content
+from utils import TRANSCRIBE_SEGMENT_MIN_SECONDS
+
+
+@dataclass
+class VoiceVerdict:
+    blocked: bool
+    transcript: str  # empty if blocked, or if the file holds no speech
+
+    @property
+    def has_speech(self) -> bool:
+        return self.blocked or bool(self.transcript.strip())
+
+
+def moderate_voice(bucket: str, key: str, data: bytes = None, allow_pii: bool = False,
+                   path: str = None) -> VoiceVerdict:
+    """
+    Transcribe a voice file stored in S3 and moderate the transcript, blocking until done.
+
+    Files found silent locally are never transcribed. Long files (at least
+    TRANSCRIBE_SEGMENT_MIN_SECONDS) go through parallel segment jobs, see
+    moderation.segments; the rest, and long files that can't be split, are
+    transcribed as one job.
+
+    Args:
+        bucket (str): Bucket holding the file.
+        key (str): Object key of the file.
+        data (bytes): The file itself, if already in memory. Without it the
+            file is checked for length by downloading it.
+        allow_pii (bool): If True, PII will not cause rejection.
+        path (str): A local copy of the file, used instead of downloading it.
+
+    Returns:
+        VoiceVerdict: Whether the transcript blocks, and the transcript.
+    """
+    analysis = analyze_audio(data, key) if data is not None else None
+    if analysis is not None and not analysis.has_speech:
+        return VoiceVerdict(blocked=False, transcript="")
+
+    if data is None or (analysis is not None and analysis.duration >= TRANSCRIBE_SEGMENT_MIN_SECONDS):
+        segmented = moderate_long_audio(bucket, key, data, allow_pii, path=path)
+        if segmented is not None:
+            return VoiceVerdict(blocked=segmented["blocked"], transcript=segmented["transcript"])
+
+    _, transcript = start_transcription(
+        f"s3://{bucket}/{key}", expected_seconds=expected_transcription_seconds(analysis)
+    )
+    text = transcript.result()
+    if text.strip() and moderate_text_content(text, allow_pii):
+        return VoiceVerdict(blocked=True, transcript="")
+    return VoiceVerdict(blocked=False, transcript=text)
@@ -1,4 +1,5 @@
 from .s3_router import router as s3_router
 from .text_moderation import router as text_moderation_router
 
-from .media_moderation import router as media_moderation_router
\ No newline at end of file
+from .media_moderation import router as media_moderation_router
+from .bulk_moderation import router as bulk_moderation_router
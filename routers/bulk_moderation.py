@@ -0,0 +1,41 @@
+import json
+import os
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from moderation.bulk import BulkScan
+from schema import BulkModerationRequest
+from utils import S3_BUCKET, BULK_CHECKPOINT_DIR
+
+# Apply the dependency to the whole router
+router = APIRouter(
+    prefix="/bulk-moderation",
+    tags=["bulk-moderation"]
+)
+
+
+@router.post("/")
+async def moderate_prefix(request: BulkModerationRequest):
+    """
+    Moderate every object under a prefix of the bucket and stream the
+    results back as NDJSON, one line per object and a final summary line.
+
+    Passing a ``checkpoint`` name makes the scan resumable: sending the same
+    request again continues after the last object finished in order.
+    """
+    checkpoint_path = None
+    if request.checkpoint:
+        os.makedirs(BULK_CHECKPOINT_DIR, exist_ok=True)
+        checkpoint_path = os.path.join(BULK_CHECKPOINT_DIR, f"{request.checkpoint}.json")
+
+    try:
+        scan = BulkScan(
+            request.bucket or S3_BUCKET, request.prefix, request.concurrency,
+            checkpoint_path, request.delete_rejected,
+        )
+    except ValueError as e:
+        # The checkpoint belongs to a different bucket or prefix
+        raise HTTPException(status_code=409, detail=str(e))
+    # A sync generator: Starlette iterates it in a worker thread
+    lines = (json.dumps(result) + "\n" for result in scan.run())
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -1,13 +1,28 @@
-import os
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException, UploadFile, File, Query
+from pydantic import HttpUrl
 from fastapi.responses import JSONResponse
-from tempfile import NamedTemporaryFile
 
-from aws_clients import detect_bad_content, upload_file, moderate_video, moderate_image
-from aws_clients.s3 import delete_file
-from aws_clients.transcribe import transcribe_voice_file
-from utils import get_file_category, generate_s3_key, S3_BUCKET, AWS_REGION
+from aws_clients import moderate_image, run_blocking, run_long_job
+from aws_clients.limits import raise_if_overloaded
+from aws_clients.cache import content_digest, verdict_cache
+from aws_clients.rekognition import moderate_image_bytes
+from aws_clients.rekognition import start_video_moderation
+from aws_clients.deletions import get_deletion_queue
+from aws_clients.s3 import presign_upload
+from aws_clients.uploads import stream_upload, upload_unless_rejected
+from moderation import get_job_store, send_webhook, validate_callback_url, moderate_with_phash
+from moderation.jobs import RUNNING, COMPLETED, FAILED
+from moderation.events import upload_job_id
+from moderation.voice import moderate_voice
+from schema import PresignUploadRequest
+from utils.policy import get_policy
+from utils import (
+    get_file_category, generate_s3_key, S3_BUCKET, AWS_REGION, REKOGNITION_IMAGE_BYTES_MAX,
+    S3_EVENTS_ENABLED, PRESIGN_EXPIRES_SECONDS, PRESIGN_MAX_BYTES, PRESIGNED_UPLOAD_PREFIX,
+)
 
 # Apply the dependency to the whole router
 router = APIRouter(
@@ -16,123 +31,280 @@ router = APIRouter(
 )
 
 
+async def moderate_uploaded_media(category: str, s3_key: str, upload) -> dict:
+    """
+    Moderate a file that has already been uploaded to S3 and return the
+    response body. Rejected files, and files whose moderation failed, are
+    queued for deletion from the bucket.
+    """
+    try:
+        return await _moderate_uploaded_media(category, s3_key, upload)
+    except Exception:
+        await run_blocking(get_deletion_queue().enqueue, S3_BUCKET, s3_key)
+        raise
+    finally:
+        upload.discard()
+
+
+async def _moderate_uploaded_media(category: str, s3_key: str, upload) -> dict:
+    file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+    s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
+
+    # Voice moderation
+    if category == "voice":
+        # Waits on Transcribe, so it runs in the jobs executor
+        verdict = await run_long_job(moderate_voice, S3_BUCKET, s3_key, upload.data, path=upload.path)
+        if not verdict.has_speech:
+            return {
+                "status": "no_content",
+                "category": category,
+                "message": "Voice file is silent or contains no speech.",
+                "file_url": file_url,
+            }
+        if verdict.blocked:
+            await run_blocking(get_deletion_queue().enqueue, S3_BUCKET, s3_key)
+            return {
+                "status": "rejected",
+                "category": category,
+                "reason": "Unsafe voice content",
+                "action": "File deleted",
+            }
+        return {
+            "status": "approved",
+            "category": category,
+            "message": "Voice content safe",
+            "file_url": file_url,
+            "transcript": verdict.transcript,
+        }
+
+    # Image moderation
+    elif category == "image":
+        is_bad = await run_blocking(moderate_image, S3_BUCKET, s3_key, digest=upload.digest)
+        if is_bad:
+            await run_blocking(get_deletion_queue().enqueue, S3_BUCKET, s3_key)
+            return {
+                "status": "rejected",
+                "category": category,
+                "reason": "Unsafe image content",
+                "action": "File deleted",
+            }
+        return {
+            "status": "approved",
+            "category": category,
+            "message": "Image content safe",
+            "file_url": file_url,
+        }
+
+    # Video moderation
+    elif category == "video":
+        verdict = await run_blocking(start_video_moderation, S3_BUCKET, s3_key)
+        is_bad = await asyncio.wrap_future(verdict)
+        if is_bad:
+            await run_blocking(get_deletion_queue().enqueue, S3_BUCKET, s3_key)
+            return {
+                "status": "rejected",
+                "category": category,
+                "reason": "Unsafe video content",
+                "action": "File deleted",
+            }
+        return {
+            "status": "approved",
+            "category": category,
+            "message": "Video content safe",
+            "file_url": file_url,
+        }
+
+    # Default for other file types (e.g. txt)
+    else:
+        return {
+            "status": "uploaded",
+            "category": category,
+            "message": "File uploaded (no moderation applied).",
+            "file_url": file_url,
+        }
+
+
+async def moderate_image_before_upload(s3_key: str, data: bytes, content_type: str = None) -> dict:
+    """
+    Moderate an in-memory image while its upload is held back, and return
+    the response body. Rejected images are never stored in the bucket.
+    """
+    # Exact-hash cache first, then near-duplicates, then Rekognition
+    def moderate():
+        policy = get_policy().image
+        if not policy.enabled:
+            return False
+        return verdict_cache.get_or_compute(
+            "image", content_digest(data), {"policy": policy.version},
+            lambda: moderate_with_phash(data, f"policy={policy.version}", lambda: moderate_image_bytes(data)),
+        )
+
+    moderation = run_blocking(moderate)
+    is_bad, _ = await upload_unless_rejected(data, S3_BUCKET, s3_key, moderation, content_type)
+    if is_bad:
+        return {
+            "status": "rejected",
+            "category": "image",
+            "reason": "Unsafe image content",
+            "action": "Not uploaded",
+        }
+    return {
+        "status": "approved",
+        "category": "image",
+        "message": "Image content safe",
+        "file_url": f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}",
+    }
+
+
+async def run_moderation_job(job_id: str, moderate, callback_url: Optional[str]):
+    """Run moderation for an async-mode upload and record the outcome in the job store.
+
+    ``moderate`` is a zero-argument coroutine function returning the response body.
+    """
+    # The SQLite store does file I/O, so every call goes through run_blocking
+    store = get_job_store()
+    await run_blocking(store.update, job_id, status=RUNNING)
+    try:
+        result = await moderate()
+        job = await run_blocking(store.update, job_id, status=COMPLETED, result=result)
+    except Exception as e:
+        logging.error(f"Moderation job {job_id} failed: {e}")
+        job = await run_blocking(store.update, job_id, status=FAILED, error=str(e))
+
+    if callback_url and job is not None:
+        delivered = await run_blocking(send_webhook, callback_url, job)
+        if not delivered:
+            logging.error(f"Could not deliver callback for job {job_id} to {callback_url}")
+
+
+async def checked_callback_url(url) -> Optional[str]:
+    """Validate a caller-supplied callback URL (see validate_callback_url); 422 if it is refused."""
+    if url is None:
+        return None
+    try:
+        return await run_blocking(validate_callback_url, str(url))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
 # ---------- ENDPOINT ----------
 @router.post("/")
-async def upload_media(file: UploadFile = File(...)):
+async def upload_media(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    async_mode: bool = Query(False, description="Return 202 with a job id instead of waiting for moderation"),
+    callback_url: Optional[HttpUrl] = Query(
+        None, description="https URL to POST the job to when it finishes (async mode only)"
+    ),
+):
     """
     Upload a media file to S3 and automatically moderate based on file type.
+
+    With ``async_mode=true`` the upload returns ``202`` and a job id right
+    away; poll ``GET /media-moderation/jobs/{job_id}`` for the outcome.
     """
+    callback_url = await checked_callback_url(callback_url)
     try:
-        # Save file temporarily
-        with NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
         # Detect category and generate key
         category = get_file_category(file.filename)
         s3_key = generate_s3_key(file.filename)
+        moderate = None
+        upload = None
 
-        # Upload to S3
-        success = upload_file(tmp_path, S3_BUCKET, s3_key)
-        os.remove(tmp_path)
-        if not success:
-            raise HTTPException(status_code=500, detail="Upload to S3 failed")
-
-        file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-        s3_uri = f"s3://{S3_BUCKET}/{s3_key}"
-        logging.info(f"Uploaded {file.filename} as {s3_key}")
-
-        # Voice moderation
-        if category == "voice":
-            text = transcribe_voice_file(s3_uri)
-            if not text.strip():
-                return JSONResponse(
-                    {
-                        "status": "no_content",
-                        "category": category,
-                        "message": "Voice file is silent or contains no speech.",
-                        "file_url": file_url,
-                    }
-                )
+        # Images small enough for Rekognition's inline bytes are moderated
+        # from memory before they are stored
+        if category == "image":
+            data = await file.read(REKOGNITION_IMAGE_BYTES_MAX + 1)
+            if len(data) <= REKOGNITION_IMAGE_BYTES_MAX:
+                moderate = lambda: moderate_image_before_upload(s3_key, data, file.content_type)
+            else:
+                await file.seek(0)
 
-            is_bad = detect_bad_content(text)
-            if is_bad:
-                delete_file(S3_BUCKET, s3_key)
-                return JSONResponse(
-                    {
-                        "status": "rejected",
-                        "category": category,
-                        "reason": "Unsafe voice content",
-                        "action": "File deleted",
-                    }
-                )
-            return JSONResponse(
-                {
-                    "status": "approved",
-                    "category": category,
-                    "message": "Voice content safe",
-                    "file_url": file_url,
-                    "transcript": text,
-                }
+        if moderate is None:
+            # Stream the upload to S3, keeping a local copy of large voice
+            # files so they are not downloaded again for segmenting
+            upload = await stream_upload(
+                file, S3_BUCKET, s3_key, content_type=file.content_type, spool=category == "voice"
             )
+            if upload is None:
+                raise HTTPException(status_code=500, detail="Upload to S3 failed")
+            logging.info(f"Uploaded {file.filename} as {s3_key}")
+            moderate = lambda: moderate_uploaded_media(category, s3_key, upload)
 
-        # Image moderation
-        elif category == "image":
-            is_bad = moderate_image(S3_BUCKET, s3_key, threshold=90)
-            if is_bad:
-                delete_file(S3_BUCKET, s3_key)
-                return JSONResponse(
-                    {
-                        "status": "rejected",
-                        "category": category,
-                        "reason": "Unsafe image content",
-                        "action": "File deleted",
-                    }
+        if async_mode:
+            try:
+                job = await run_blocking(
+                    get_job_store().create, category=category, s3_key=s3_key, callback_url=callback_url
                 )
+            except Exception:
+                if upload is not None:
+                    upload.discard()
+                raise
+            background_tasks.add_task(run_moderation_job, job["job_id"], moderate, callback_url)
             return JSONResponse(
                 {
-                    "status": "approved",
+                    "status": "accepted",
+                    "job_id": job["job_id"],
                     "category": category,
-                    "message": "Image content safe",
-                    "file_url": file_url,
-                }
+                    "status_url": router.url_path_for("get_moderation_job", job_id=job["job_id"]),
+                },
+                status_code=202,
             )
 
-        # Video moderation
-        elif category == "video":
-            is_bad = moderate_video(S3_BUCKET, s3_key)
-            if is_bad:
-                delete_file(S3_BUCKET, s3_key)
-                return JSONResponse(
-                    {
-                        "status": "rejected",
-                        "category": category,
-                        "reason": "Unsafe video content",
-                        "action": "File deleted",
-                    }
-                )
-            return JSONResponse(
-                {
-                    "status": "approved",
-                    "category": category,
-                    "message": "Video content safe",
-                    "file_url": file_url,
-                }
-            )
-
-        # Default for other file types (e.g. txt)
-        else:
-            return JSONResponse(
-                {
-                    "status": "uploaded",
-                    "category": category,
-                    "message": "File uploaded (no moderation applied).",
-                    "file_url": file_url,
-                }
-            )
+        return JSONResponse(await moderate())
 
+    except HTTPException:
+        raise
     except Exception as e:
+        # Shed or throttled requests become a 429, see main.py
+        raise_if_overloaded(e)
         logging.error(f"Media upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/presign")
+async def presign_media_upload(request: PresignUploadRequest):
+    """
+    Hand out a presigned URL for uploading a media file straight to S3.
+
+    The file never passes through the API. Once S3 reports the object as
+    created it is moderated by category (see moderation.events) and deleted
+    if rejected; poll ``status_url`` or pass ``callback_url`` for the outcome.
+    """
+    if not S3_EVENTS_ENABLED:
+        # Without the event listener nothing would moderate the upload
+        raise HTTPException(status_code=503, detail="Direct uploads are not enabled")
+    callback_url = await checked_callback_url(request.callback_url)
+    try:
+        category = get_file_category(request.filename)
+        s3_key = PRESIGNED_UPLOAD_PREFIX + generate_s3_key(request.filename)
+        upload = await run_blocking(
+            presign_upload, S3_BUCKET, s3_key, request.method, request.content_type,
+            PRESIGN_EXPIRES_SECONDS, PRESIGN_MAX_BYTES,
+        )
+        job = await run_blocking(
+            get_job_store().create,
+            job_id=upload_job_id(s3_key), category=category, s3_key=s3_key, callback_url=callback_url,
+        )
+    except Exception as e:
+        raise_if_overloaded(e)
+        logging.error(f"Presigning upload failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {
+        "job_id": job["job_id"],
+        "category": category,
+        "s3_key": s3_key,
+        "upload": upload,
+        "expires_in": PRESIGN_EXPIRES_SECONDS,
+        "status_url": router.url_path_for("get_moderation_job", job_id=job["job_id"]),
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_moderation_job(job_id: str):
+    """Return the status, and once finished the result, of an async moderation job."""
+    job = await run_blocking(get_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,10 +1,11 @@
-import os
 import logging
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse
-from tempfile import NamedTemporaryFile
-from aws_clients import upload_file
-from aws_clients.s3 import create_bucket, s3
+from aws_clients import run_blocking
+from aws_clients.limits import raise_if_overloaded
+from aws_clients.clients import get_resource
+from aws_clients.s3 import create_bucket
+from aws_clients.uploads import stream_upload
 from schema import CreateBucket
 from utils import generate_s3_key, S3_BUCKET, AWS_REGION
 
@@ -18,12 +19,13 @@ router = APIRouter(
 @router.get("/get-all-buckets")
 async def get_all_buckets():
     # Print out bucket names
-    for bucket in s3.buckets.all():
+    buckets = await run_blocking(lambda: list(get_resource('s3').buckets.all()))
+    for bucket in buckets:
         print(bucket.name)
 
 @router.post("/")
 async def create_s3_bucket(bucket: CreateBucket):
-    is_created = create_bucket(bucket.name, bucket.region)
+    is_created = await run_blocking(create_bucket, bucket.name, bucket.region)
 
     return {"is_created": is_created}
 
@@ -32,28 +34,24 @@ async def create_s3_bucket(bucket: CreateBucket):
 async def upload_to_s3(file: UploadFile = File(...)):
     """Endpoint to upload a file to S3."""
     try:
-        # Save the uploaded file temporarily
-        with NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
         # Use the original filename for S3 object
         # object_name = file.filename
         object_name = generate_s3_key(file.filename)
 
-        # Upload to S3
-        success = upload_file(tmp_path, S3_BUCKET, object_name)
-
-        # Delete temp file
-        os.remove(tmp_path)
+        # Stream the upload to S3
+        upload = await stream_upload(file, S3_BUCKET, object_name, content_type=file.content_type)
 
-        if not success:
+        if upload is None:
             raise HTTPException(status_code=500, detail="Failed to upload to S3")
 
         file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{object_name}"
         return JSONResponse({"message": "File uploaded successfully", "url": file_url})
 
+    except HTTPException:
+        raise
     except Exception as e:
+        # Shed or throttled requests become a 429, see main.py
+        raise_if_overloaded(e)
         logging.error(f"Upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
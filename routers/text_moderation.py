@@ -1,11 +1,13 @@
-import os
 import uuid
 import logging
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 
-from aws_clients import detect_bad_content, upload_file_to_s3
+from aws_clients import upload_text_to_s3, run_blocking
+from aws_clients.limits import raise_if_overloaded
+from moderation import moderate_text_content
 from schema import TextInput
+from utils import TEXT_MAX_BYTES
 
 # Apply the dependency to the whole router
 router = APIRouter(
@@ -28,9 +30,11 @@ async def moderate_text(input_data: TextInput):
         text = input_data.text.strip()
         if not text:
             raise HTTPException(status_code=400, detail="Text cannot be empty")
+        if len(text.encode("utf-8")) > TEXT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Text is larger than {TEXT_MAX_BYTES} bytes")
 
         # Apply moderation FIRST
-        is_bad = detect_bad_content(text)
+        is_bad = await run_blocking(moderate_text_content, text)
         if is_bad:
             return JSONResponse(
                 {
@@ -42,19 +46,11 @@ async def moderate_text(input_data: TextInput):
                 status_code=200,
             )
 
-        # Only if content is safe, write to a temp file
-        filename = f"{uuid.uuid4()}.txt"
-        with open(filename, "w", encoding="utf-8") as f:
-            f.write(text)
+        # Only if content is safe, generate S3 key
+        s3_key = f"txt/{uuid.uuid4()}.txt"
 
-        # Generate S3 key
-        s3_key = f"txt/{filename}"
-
-        # Upload file
-        file_url = upload_file_to_s3(filename, s3_key)
-
-        # Delete temp file locally
-        os.remove(filename)
+        # Upload the text straight from memory
+        file_url = await run_blocking(upload_text_to_s3, text, s3_key)
 
         # Return success
         return JSONResponse(
@@ -67,7 +63,11 @@ async def moderate_text(input_data: TextInput):
             status_code=200,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
+        # Shed or throttled requests become a 429, see main.py
+        raise_if_overloaded(e)
         logging.error(f"Moderation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1 +1 @@
-from .schemas import CreateBucket, TextInput
\ No newline at end of file
+from .schemas import CreateBucket, TextInput, BulkModerationRequest, PresignUploadRequest
\ No newline at end of file
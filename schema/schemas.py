@@ -1,6 +1,8 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, HttpUrl, field_validator
 import re
-from typing import Optional
+from typing import Dict, Literal, Optional
+
+from utils import BULK_ALLOWED_BUCKETS, BULK_CONCURRENCY
 
 
 class CreateBucket(BaseModel):
@@ -32,4 +34,50 @@ class CreateBucket(BaseModel):
         return v
 
 class TextInput(BaseModel):
-    text: str
\ No newline at end of file
+    text: str
+
+
+class BulkModerationRequest(BaseModel):
+    bucket: Optional[str] = None
+    prefix: str = ""
+    concurrency: Optional[Dict[str, int]] = None
+    checkpoint: Optional[str] = None
+    delete_rejected: bool = False
+
+    @field_validator('checkpoint')
+    def validate_checkpoint(cls, v):
+        if v is not None and not re.match(r'^[A-Za-z0-9_-]{1,64}$', v):
+            raise ValueError('Checkpoint name can only contain letters, numbers, underscores and hyphens')
+        return v
+
+    @field_validator('bucket')
+    def validate_bucket(cls, v):
+        # Rejected objects may be deleted, so only configured buckets can be scanned
+        if v is not None and v not in BULK_ALLOWED_BUCKETS:
+            raise ValueError(f'Bucket must be one of: {", ".join(BULK_ALLOWED_BUCKETS)}')
+        return v
+
+    @field_validator('concurrency')
+    def validate_concurrency(cls, v):
+        if v is None:
+            return v
+        for category, n in v.items():
+            if category not in BULK_CONCURRENCY:
+                raise ValueError(f'Unknown category {category!r}, expected one of: {", ".join(BULK_CONCURRENCY)}')
+            if not 1 <= n <= BULK_CONCURRENCY[category]:
+                raise ValueError(f'Concurrency for {category} must be between 1 and {BULK_CONCURRENCY[category]}')
+        return v
+
+
+class PresignUploadRequest(BaseModel):
+    filename: str
+    content_type: Optional[str] = None
+    method: Literal["put", "post"] = "put"
+    # Checked further by the route, see moderation.jobs.validate_callback_url
+    callback_url: Optional[HttpUrl] = None
+
+    @field_validator('filename')
+    def validate_filename(cls, v):
+        if not v.strip():
+            raise ValueError('Filename cannot be empty')
+        return v
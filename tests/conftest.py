@@ -0,0 +1,51 @@
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from aws_clients import clients
+from utils import AWS_REGION
+from utils.policy import reset_policy
+
+
+@pytest.fixture
+def install_client(monkeypatch):
+    """Return a function that installs a client for a service in the shared
+    registry until the test ends, when the previous entry is restored."""
+
+    def install(service: str, client):
+        # Same entry register_client() writes, but undone by monkeypatch
+        monkeypatch.setitem(clients._clients, (service, AWS_REGION), client)
+        return client
+
+    return install
+
+
+@pytest.fixture
+def stub_client(install_client):
+    """Return a factory that installs a stubbed client for a service and returns its Stubber.
+
+    The registry entry is restored when the test ends, so later tests get
+    whatever client was there before.
+    """
+    stubbers = []
+
+    def install(service: str) -> Stubber:
+        client = boto3.session.Session().client(
+            service, region_name=AWS_REGION, aws_access_key_id="testing", aws_secret_access_key="testing",
+        )
+        stubber = Stubber(client)
+        stubber.activate()
+        install_client(service, client)
+        stubbers.append(stubber)
+        return stubber
+
+    yield install
+    for stubber in stubbers:
+        stubber.deactivate()
+
+
+@pytest.fixture(autouse=True)
+def _reset_policy():
+    """Every test starts from the policy file, whatever set_policy() an earlier one made."""
+    yield
+    reset_policy()
@@ -0,0 +1,48 @@
+import threading
+import time
+
+from moderation import bulk
+from moderation.bulk import BulkScan
+
+
+class ListingS3:
+    def __init__(self, keys):
+        self.keys = keys
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, Bucket, Prefix="", StartAfter="", **kwargs):
+        yield {"Contents": [{"Key": key} for key in self.keys if key.startswith(Prefix) and key > StartAfter]}
+
+
+def test_concurrent_scans_share_the_category_limit(install_client, monkeypatch):
+    install_client("s3", ListingS3([f"image/{index}.png" for index in range(20)]))
+    monkeypatch.setattr(bulk, "_SLOTS", {"image": threading.BoundedSemaphore(3),
+                                         "other": threading.BoundedSemaphore(1)})
+    lock = threading.Lock()
+    running = peak = 0
+
+    def moderate_object(bucket, key, category, delete_rejected):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return {"key": key, "category": category, "status": "approved"}
+
+    monkeypatch.setattr(bulk, "moderate_object", moderate_object)
+    summaries = []
+    scans = [
+        threading.Thread(target=lambda: summaries.append(list(BulkScan("bucket", "image/").run())[-1]))
+        for _ in range(3)
+    ]
+    for scan in scans:
+        scan.start()
+    for scan in scans:
+        scan.join(10)
+
+    assert [summary["summary"]["counts"] for summary in summaries] == [{"approved": 20}] * 3
+    assert peak == 3
@@ -0,0 +1,32 @@
+import uuid
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+from aws_clients import comprehend
+from aws_clients.comprehend import detect_bad_content
+from utils.policy import ModerationPolicy, set_policy
+
+
+class FlakyComprehend:
+    """DetectToxicContent that fails to connect while ``offline`` is set."""
+
+    def __init__(self):
+        self.offline = True
+
+    def detect_toxic_content(self, TextSegments, **kwargs):
+        if self.offline:
+            raise EndpointConnectionError(endpoint_url="https://comprehend.us-east-1.amazonaws.com/")
+        return {"ResultList": [{"Labels": [{"Name": "INSULT", "Score": 0.95}], "Toxicity": 0.95} for _ in TextSegments]}
+
+
+def test_connection_error_fails_the_toxicity_check_without_disabling_it(install_client):
+    set_policy(ModerationPolicy({"text": {"pii": {"enabled": False}, "sentiment": {"enabled": False}}}))
+    client = install_client("comprehend", FlakyComprehend())
+
+    with pytest.raises(EndpointConnectionError):
+        detect_bad_content(f"you are a {uuid.uuid4()}")
+    assert comprehend._toxicity_unavailable is False
+
+    client.offline = False
+    assert detect_bad_content(f"you are a {uuid.uuid4()}") is True
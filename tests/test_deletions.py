@@ -0,0 +1,99 @@
+import glob
+import json
+import threading
+import time
+
+from aws_clients import deletions
+from aws_clients.deletions import DeletionQueue
+
+
+class RecordingS3:
+    def __init__(self):
+        self.deleted = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        self.release.wait(10)
+        self.deleted += [(Bucket, obj["Key"]) for obj in Delete["Objects"]]
+        return {}
+
+
+def _journaled(path):
+    """Keys a restart would replay from ``path``."""
+    pending = set()
+    for journal in glob.glob(f"{path}.*"):
+        with open(journal, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                item = (entry["bucket"], entry["key"])
+                pending.add(item) if entry["op"] == "add" else pending.discard(item)
+    return pending
+
+
+def test_keys_are_journaled_until_deleted(tmp_path, install_client):
+    s3 = install_client("s3", RecordingS3())
+    path = str(tmp_path / "deletes.jsonl")
+    queue = DeletionQueue(path, flush_interval=0.01)
+
+    s3.release.clear()
+    queue.enqueue("bucket", "a")
+    assert _journaled(path) == {("bucket", "a")}
+    s3.release.set()
+
+    assert queue.flush(timeout=10)
+    assert s3.deleted == [("bucket", "a")]
+    assert _journaled(path) == set()
+
+
+def test_compaction_during_enqueue_keeps_the_key(tmp_path, install_client):
+    s3 = install_client("s3", RecordingS3())
+    s3.release.clear()
+    path = str(tmp_path / "deletes.jsonl")
+    queue = DeletionQueue(path, flush_interval=0.01)
+    append = queue._append
+    compactions = []
+
+    def append_then_compact(entry, sync=False):
+        append(entry, sync)
+        # A compaction started between the journal write and the queue insert
+        compaction = threading.Thread(target=queue._compact)
+        compaction.start()
+        compaction.join(0.2)
+        compactions.append(compaction)
+
+    queue._append = append_then_compact
+    queue.enqueue("bucket", "a")
+    compactions[0].join(10)
+    assert _journaled(path) == {("bucket", "a")}
+    s3.release.set()
+    assert queue.flush(timeout=10)
+
+
+class StickyS3(RecordingS3):
+    """Never manages to delete ``keep``, so the queue is never idle."""
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        sticky = [obj for obj in Delete["Objects"] if obj["Key"] == "keep"]
+        Delete = {"Objects": [obj for obj in Delete["Objects"] if obj["Key"] != "keep"]}
+        super().delete_objects(Bucket, Delete)
+        return {"Errors": [{"Key": obj["Key"], "Code": "InternalError"} for obj in sticky]}
+
+
+def test_journal_is_compacted_under_steady_load(tmp_path, install_client, monkeypatch):
+    s3 = install_client("s3", StickyS3())
+    monkeypatch.setattr(deletions, "DELETE_JOURNAL_COMPACT_RECORDS", 50)
+    path = str(tmp_path / "deletes.jsonl")
+    queue = DeletionQueue(path, batch_size=10, flush_interval=0.01, max_attempts=10 ** 9)
+    queue.enqueue("bucket", "keep")
+    for index in range(200):
+        queue.enqueue("bucket", f"key-{index}")
+
+    deadline = time.monotonic() + 10
+    while len(s3.deleted) < 200 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(s3.deleted) == 200
+    lines = sum(1 for journal in glob.glob(f"{path}.*") for _ in open(journal, encoding="utf-8"))
+    assert lines < 100
+    assert _journaled(path) == {("bucket", "keep")}
+    queue.max_attempts = 0  # let the worker give up on it
@@ -0,0 +1,33 @@
+import threading
+import time
+
+from aws_clients.executor import any_check_blocks
+
+
+def test_checks_in_flight_are_bounded():
+    lock = threading.Lock()
+    running = peak = 0
+
+    def check():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return False
+
+    assert any_check_blocks([check] * 40, max_in_flight=4) is False
+    assert peak <= 4
+
+
+def test_first_blocking_check_stops_submitting_the_rest():
+    started = []
+
+    def check(index):
+        started.append(index)
+        return index == 1
+
+    assert any_check_blocks([lambda i=i: check(i) for i in range(100)], max_in_flight=2) is True
+    assert len(started) < 100
@@ -0,0 +1,35 @@
+import pytest
+
+from moderation import jobs
+from moderation.jobs import send_webhook, validate_callback_url
+
+
+@pytest.mark.parametrize("url", [
+    "http://hooks.example.com/done",
+    "https://127.0.0.1/done",
+    "https://localhost:8443/done",
+    "https://169.254.169.254/latest/meta-data/",
+    "https://10.0.0.5/done",
+    "https://[::1]/done",
+])
+def test_callback_urls_to_internal_hosts_are_refused(url):
+    with pytest.raises(ValueError):
+        validate_callback_url(url)
+
+
+def test_allowed_hosts_replace_the_address_check(monkeypatch):
+    monkeypatch.setattr(jobs, "WEBHOOK_ALLOWED_HOSTS", ("hooks.example.com",))
+
+    assert validate_callback_url("https://hooks.example.com/done") == "https://hooks.example.com/done"
+    with pytest.raises(ValueError):
+        validate_callback_url("https://other.example.com/done")
+
+
+def test_webhook_is_not_sent_to_a_refused_url(monkeypatch):
+    import requests
+
+    def post(*args, **kwargs):
+        raise AssertionError("webhook was sent")
+
+    monkeypatch.setattr(requests, "post", post)
+    assert send_webhook("https://169.254.169.254/latest/meta-data/", {"job_id": "1"}) is False
@@ -0,0 +1,40 @@
+import sqlite3
+
+from moderation.phash import PerceptualHashIndex
+
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return sorted(conn.execute("SELECT policy, hash FROM phashes"))
+
+
+def test_superseded_policies_are_dropped(tmp_path):
+    path = str(tmp_path / "phash.db")
+    index = PerceptualHashIndex(path, max_policies=2)
+    index.add(1, True, "policy=a")
+    index.add(2, True, "policy=b")
+    assert index.match(1, "policy=a") is True
+
+    index.add(3, True, "policy=c")
+    assert index.match(1, "policy=a") is None
+    assert index.match(2, "policy=b") is True
+    assert _rows(path) == [("policy=b", 2), ("policy=c", 3)]
+
+
+def test_oldest_entries_are_evicted(tmp_path):
+    path = str(tmp_path / "phash.db")
+    index = PerceptualHashIndex(path, block_distance=0, allow_distance=0, max_entries=3)
+    for value in (1, 2, 3):
+        index.add(value, False)
+    index.add(1, True)  # re-moderated, so it is recent again
+    index.add(4, False)
+
+    assert len(index) == 3
+    assert index.match(2) is None
+    assert index.match(1) is True
+    assert _rows(path) == [("", 1), ("", 3), ("", 4)]
+
+    reloaded = PerceptualHashIndex(path, block_distance=0, allow_distance=0, max_entries=2)
+    assert len(reloaded) == 2
+    assert reloaded.match(3) is None
+    assert _rows(path) == [("", 1), ("", 4)]
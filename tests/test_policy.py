@@ -0,0 +1,33 @@
+import uuid
+
+from aws_clients.comprehend import detect_bad_content
+from utils.policy import ModerationPolicy, set_policy
+
+
+def _text() -> str:
+    # Unique, so the verdict cache never answers
+    return f"the parcel arrives on tuesday {uuid.uuid4()}"
+
+
+def test_disabled_checks_make_no_comprehend_calls(stub_client):
+    set_policy(ModerationPolicy({"text": {"pii": {"enabled": False}, "sentiment": {"enabled": False}}}))
+    stubber = stub_client("comprehend")
+    # Only toxicity is planned; a PII or sentiment call would fail the test
+    stubber.add_response("detect_toxic_content", {"ResultList": [{"Labels": [], "Toxicity": 0.01}]})
+
+    assert detect_bad_content(_text()) is False
+    stubber.assert_no_pending_responses()
+
+
+def test_text_policy_with_every_check_disabled_makes_no_calls(stub_client):
+    set_policy(ModerationPolicy({"text": {check: {"enabled": False} for check in ("pii", "sentiment", "toxicity")}}))
+    stub_client("comprehend")
+
+    assert detect_bad_content(_text()) is False
+
+
+def test_allow_pii_leaves_pii_detection_out_of_the_plan():
+    policy = ModerationPolicy().text
+
+    assert policy.plan(allow_pii=False) == ("pii", "sentiment", "toxicity")
+    assert policy.plan(allow_pii=True) == ("sentiment", "toxicity")
@@ -0,0 +1,51 @@
+from aws_clients.rekognition import iter_video_labels, start_video_moderation
+from utils import VIDEO_RESULTS_PAGE_SIZE
+from utils.policy import ModerationPolicy, set_policy
+
+JOB_ID = "job-1"
+
+
+def _page(labels, next_token=None) -> dict:
+    page = {
+        "JobStatus": "SUCCEEDED",
+        "ModerationLabels": [
+            {"Timestamp": index * 1000, "ModerationLabel": {"Name": name, "ParentName": parent, "Confidence": 95.0}}
+            for index, (name, parent) in enumerate(labels)
+        ],
+    }
+    if next_token:
+        page["NextToken"] = next_token
+    return page
+
+
+def _page_params(next_token=None) -> dict:
+    params = {"JobId": JOB_ID, "SortBy": "TIMESTAMP", "MaxResults": VIDEO_RESULTS_PAGE_SIZE}
+    if next_token:
+        params["NextToken"] = next_token
+    return params
+
+
+def test_iter_video_labels_follows_next_token(stub_client):
+    stubber = stub_client("rekognition")
+    stubber.add_response("get_content_moderation", _page([("Smoking", "Tobacco")], "page-2"), _page_params())
+    stubber.add_response("get_content_moderation", _page([("Beer", "Alcohol"), ("Wine", "Alcohol")]),
+                         _page_params("page-2"))
+
+    labels = [label["Name"] for label in iter_video_labels(JOB_ID)]
+
+    assert labels == ["Smoking", "Beer", "Wine"]
+    stubber.assert_no_pending_responses()
+
+
+def test_video_moderation_stops_paging_at_first_blocking_label(stub_client):
+    set_policy(ModerationPolicy())
+    stubber = stub_client("rekognition")
+    stubber.add_response("start_content_moderation", {"JobId": JOB_ID})
+    # The poll that finds the job finished is reused as page one
+    stubber.add_response("get_content_moderation", _page([("Cartoon", "Animation")], "page-2"), _page_params())
+    stubber.add_response("get_content_moderation", _page([("Weapons", "Violence")], "page-3"),
+                         _page_params("page-2"))
+    # No response for page-3: fetching it would fail the test
+
+    assert start_video_moderation("bucket", "clip.mp4").result(timeout=30) is True
+    stubber.assert_no_pending_responses()
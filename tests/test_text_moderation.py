@@ -0,0 +1,10 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from utils import TEXT_MAX_BYTES
+
+
+def test_text_over_the_size_limit_is_refused_before_moderation():
+    response = TestClient(app).post("/text-moderation/", json={"text": "a" * (TEXT_MAX_BYTES + 1)})
+
+    assert response.status_code == 413
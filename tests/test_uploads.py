@@ -0,0 +1,64 @@
+import asyncio
+import io
+import os
+import wave
+
+from aws_clients.uploads import stream_upload
+from moderation.segments import moderate_long_audio
+
+
+class MemoryS3:
+    def __init__(self):
+        self.parts = {}
+        self.objects = {}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        return {"UploadId": "upload"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self.parts[PartNumber] = Body
+        return {"ETag": str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self.objects[Key] = b"".join(self.parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+    def abort_multipart_upload(self, **kwargs):
+        pass
+
+
+class AsyncBytes:
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+
+    async def read(self, size: int) -> bytes:
+        return self.file.read(size)
+
+
+def test_spooled_upload_keeps_a_local_copy(install_client):
+    s3 = install_client("s3", MemoryS3())
+    payload = os.urandom(10_000)
+
+    upload = asyncio.run(stream_upload(AsyncBytes(payload), "bucket", "voice.wav", part_size=4096, spool=True))
+
+    assert s3.objects["voice.wav"] == payload
+    assert upload.data is None and upload.path.endswith(".wav")
+    with open(upload.path, "rb") as f:
+        assert f.read() == payload
+    path = upload.path
+    upload.discard()
+    assert not os.path.exists(path)
+
+
+def test_long_audio_uses_the_local_copy(tmp_path, install_client):
+    # No download_file: the copy has to be read instead
+    install_client("s3", MemoryS3())
+    path = str(tmp_path / "voice.wav")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(8000)
+        wav.writeframes(b"\0\0" * 8000)
+
+    # One second of audio is too short to segment
+    assert moderate_long_audio("bucket", "voice.wav", allow_pii=False, path=path) is None
+    assert os.path.exists(path)
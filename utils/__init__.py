@@ -1,3 +1,5 @@
 from .file_key_util import generate_s3_key, get_file_category
 
+from .text_segmenter import split_text
+
 from .constant import *
\ No newline at end of file
@@ -1,3 +1,242 @@
 
 S3_BUCKET = "test-your-bucket"
 AWS_REGION = "us-east-1"
+
+# Worker threads used to run blocking boto3 calls off the event loop
+AWS_EXECUTOR_MAX_WORKERS = 64
+# Worker threads reserved for long-running video/voice moderation jobs
+AWS_JOB_EXECUTOR_MAX_WORKERS = 32
+# Worker threads running the parallel sub-calls of one moderation request,
+# and how many of them one request may have in flight at a time
+AWS_FANOUT_MAX_WORKERS = 64
+AWS_FANOUT_MAX_IN_FLIGHT = 8
+
+# Micro-batching of Comprehend calls: concurrent requests are grouped for up
+# to COMPREHEND_BATCH_WINDOW_MS or until the batch is full
+COMPREHEND_BATCHING_ENABLED = True
+COMPREHEND_BATCH_WINDOW_MS = 5
+COMPREHEND_SENTIMENT_BATCH_SIZE = 25  # BatchDetectSentiment limit
+COMPREHEND_TOXIC_BATCH_SIZE = 10      # DetectToxicContent TextSegments limit
+
+# Per-request text size limits (UTF-8 bytes); longer text is moderated in
+# sentence-aligned chunks
+COMPREHEND_PII_MAX_BYTES = 100_000
+COMPREHEND_SENTIMENT_MAX_BYTES = 5_000
+COMPREHEND_TOXIC_MAX_BYTES = 1_000
+# Largest text the text moderation API accepts (UTF-8 bytes); larger gets a 413
+TEXT_MAX_BYTES = 100_000
+# Regions that offer DetectToxicContent; elsewhere toxicity is not checked
+COMPREHEND_TOXICITY_REGIONS = ("us-east-1", "us-west-2", "eu-west-1", "ap-southeast-2")
+
+# Verdict cache keyed by content hash + policy parameters. Set the SQLite
+# path to share verdicts between worker processes on the same host.
+VERDICT_CACHE_MAX_ENTRIES = 100_000
+VERDICT_CACHE_TTL_SECONDS = 24 * 60 * 60
+VERDICT_CACHE_SQLITE_PATH = None
+
+# Streaming uploads: payloads larger than one part go through a multipart
+# upload with this many parts in flight at once
+S3_MULTIPART_PART_SIZE = 8 * 1024 * 1024
+S3_MULTIPART_CONCURRENCY = 4
+
+# Shared boto3 client settings (see aws_clients/clients.py)
+AWS_MAX_POOL_CONNECTIONS = 128
+AWS_CONNECT_TIMEOUT = 5
+AWS_READ_TIMEOUT = 60
+AWS_RETRY_MODE = "adaptive"
+AWS_MAX_ATTEMPTS = 5
+AWS_TCP_KEEPALIVE = True
+# Per-service endpoint overrides for local stand-ins,
+# e.g. {"s3": "http://localhost:4566"}
+AWS_ENDPOINT_URLS = {}
+
+# Background moderation jobs: "memory" keeps job state in-process,
+# "sqlite" shares it between workers through JOB_STORE_SQLITE_PATH
+JOB_STORE_BACKEND = "memory"
+JOB_STORE_SQLITE_PATH = "moderation_jobs.db"
+JOB_TTL_SECONDS = 24 * 60 * 60
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_MAX_ATTEMPTS = 3
+# Callback URLs must be https. With hosts listed here only those are
+# accepted; otherwise any host whose addresses are all public is.
+WEBHOOK_ALLOWED_HOSTS = ()
+
+# Central poller for Rekognition video and Transcribe jobs
+POLLER_POLLS_PER_SECOND = 5     # budget shared by all in-flight jobs
+POLLER_MIN_INTERVAL = 2         # seconds between polls of a young job
+POLLER_MAX_INTERVAL = 30        # ceiling for old jobs
+POLLER_AGE_FACTOR = 0.2         # poll interval grows with job age
+POLLER_MAX_WORKERS = 8
+# With notifications enabled, jobs are polled only when a completion event
+# arrives, plus a slow fallback poll. Without a queue URL a LocalQueue is
+# used as the event source. A notification for a job another worker started
+# is left on the queue for that worker; the ids of the last
+# POLLER_RECENT_JOBS jobs finished here are kept so their late notifications
+# are still acked.
+JOB_NOTIFICATIONS_ENABLED = False
+JOB_NOTIFICATION_QUEUE_URL = None
+POLLER_NOTIFIED_FALLBACK_INTERVAL = 300
+POLLER_RECENT_JOBS = 1000
+# Optional SNS channel Rekognition publishes video job completion to
+REKOGNITION_SNS_TOPIC_ARN = None
+REKOGNITION_SNS_ROLE_ARN = None
+
+# Images up to this size are moderated from memory (Rekognition's limit for
+# inline image bytes) while their upload is held back until approval
+REKOGNITION_IMAGE_BYTES_MAX = 5 * 1024 * 1024
+
+# Perceptual-hash index of moderated images (needs Pillow). Near-duplicates
+# of known-bad images within PHASH_BLOCK_DISTANCE bits are blocked locally,
+# of known-good images within PHASH_ALLOW_DISTANCE bits are approved.
+PHASH_INDEX_ENABLED = True
+PHASH_INDEX_PATH = "phash_index.db"
+PHASH_BLOCK_DISTANCE = 6
+PHASH_ALLOW_DISTANCE = 3
+# The index keeps the PHASH_INDEX_POLICIES image policy versions most
+# recently recorded under (the current one, and the one before it while
+# requests that started under it finish) and at most
+# PHASH_INDEX_MAX_ENTRIES hashes, dropping the oldest first
+PHASH_INDEX_POLICIES = 2
+PHASH_INDEX_MAX_ENTRIES = 500_000
+
+# Local text prefilter in front of Comprehend. Files hold one term or
+# phrase per line and are re-read when they change.
+PREFILTER_ENABLED = True
+PREFILTER_BLOCKLIST_PATH = "config/blocklist.txt"
+PREFILTER_SAFE_PHRASES_PATH = "config/safe_phrases.txt"
+PREFILTER_RELOAD_INTERVAL = 5  # seconds between file change checks
+
+# Video moderation: labels below this confidence are dropped by Rekognition,
+# labels at or above it in a blocked category reject the video
+VIDEO_MIN_CONFIDENCE = 80
+VIDEO_RESULTS_PAGE_SIZE = 1000
+
+# Transcribe writes its results to our bucket under this prefix; they are
+# streamed back through the pooled S3 client in chunks of this size
+TRANSCRIBE_OUTPUT_PREFIX = "transcripts/"
+TRANSCRIPT_READ_CHUNK_SIZE = 64 * 1024
+
+# Rejected objects are deleted in the background with DeleteObjects calls of
+# up to DELETE_BATCH_SIZE keys. Pending deletes are journaled to
+# DELETE_JOURNAL_PATH.<pid> (None keeps them in memory only); journals of
+# workers that are no longer running are replayed on start.
+DELETE_BATCH_SIZE = 1000
+DELETE_FLUSH_INTERVAL = 1.0
+DELETE_MAX_ATTEMPTS = 8
+DELETE_RETRY_MAX_DELAY = 300
+DELETE_JOURNAL_PATH = "pending_deletes.jsonl"
+# Under steady load the journal is rewritten once it has this many lines
+# and more than half of them are finished keys
+DELETE_JOURNAL_COMPACT_RECORDS = 100_000
+
+# Orphan sweeper: aborts multipart uploads and removes transcript outputs
+# older than ORPHAN_MAX_AGE_SECONDS, every ORPHAN_SWEEP_INTERVAL seconds
+# (0 disables it)
+ORPHAN_SWEEP_INTERVAL = 3600
+ORPHAN_MAX_AGE_SECONDS = 24 * 3600
+
+# Moderating objects already in the bucket: text objects larger than
+# TEXT_OBJECT_MAX_BYTES are moderated on their first TEXT_OBJECT_MAX_BYTES
+TEXT_OBJECT_MAX_BYTES = 1_000_000
+
+# Bulk prefix scans: concurrent moderations per category, across all scans
+# in the process (also the most a request may ask for), and how many
+# finished objects between checkpoint writes. The API only scans buckets in BULK_ALLOWED_BUCKETS.
+BULK_CONCURRENCY = {"image": 16, "txt": 16, "voice": 4, "video": 4, "other": 16}
+BULK_ALLOWED_BUCKETS = (S3_BUCKET,)
+BULK_CHECKPOINT_EVERY = 1000
+BULK_CHECKPOINT_DIR = "checkpoints"
+
+# Offline JSONL batch runner: worker threads, and seconds between progress reports
+BATCH_RUNNER_WORKERS = 16
+BATCH_REPORT_INTERVAL = 10
+
+# Client-side rate limits per AWS operation ("service.Operation": (requests
+# per second, burst)), kept under the account's TPS quotas. A call that would
+# wait more than AWS_RATE_LIMIT_MAX_WAIT seconds for its token is shed, which
+# bounds the queue per operation at rate * max wait callers.
+AWS_RATE_LIMITS = {
+    "comprehend.DetectPiiEntities": (20, 20),
+    "comprehend.DetectSentiment": (20, 20),
+    "comprehend.BatchDetectSentiment": (10, 10),
+    "comprehend.DetectToxicContent": (10, 10),
+    "rekognition.DetectModerationLabels": (50, 50),
+    "rekognition.StartContentModeration": (20, 20),
+    "rekognition.GetContentModeration": (20, 20),
+    "transcribe.StartTranscriptionJob": (25, 25),
+    "transcribe.GetTranscriptionJob": (20, 20),
+}
+AWS_RATE_LIMIT_MAX_WAIT = 2.0
+
+# Concurrent AWS jobs per job type (Rekognition video moderation and
+# Transcribe each have a concurrent-job quota). At most JOB_SLOT_MAX_WAITERS
+# callers wait up to JOB_SLOT_MAX_WAIT seconds for a slot; others are shed.
+JOB_CONCURRENCY_LIMITS = {"video": 20, "transcription": 100}
+JOB_SLOT_MAX_WAITERS = 100
+JOB_SLOT_MAX_WAIT = 30
+
+# Retry-After (seconds) sent when AWS itself throttled a request
+AWS_THROTTLE_RETRY_AFTER = 1
+
+# Clients are built on first use. Services listed here are built, and their
+# credentials resolved, in the background right after startup instead, so
+# the first request does not pay for it (e.g. for long-lived containers).
+AWS_PREWARM_CLIENTS = ()
+
+# Direct uploads: clients PUT/POST straight to S3 with presigned URLs valid
+# for PRESIGN_EXPIRES_SECONDS, under PRESIGNED_UPLOAD_PREFIX + generate_s3_key().
+# The bucket's ObjectCreated notifications for that prefix are read from
+# S3_EVENT_QUEUE_URL (a LocalQueue stand-in without one) and moderated by
+# S3_EVENT_WORKERS threads; rejected objects are deleted. Messages stay
+# hidden for S3_EVENT_VISIBILITY_TIMEOUT seconds, extended while their
+# objects are still being moderated. Any worker may receive the event of an
+# upload another one presigned, so an SQS queue requires a shared job store
+# (JOB_STORE_BACKEND = "sqlite").
+PRESIGN_EXPIRES_SECONDS = 15 * 60
+PRESIGN_MAX_BYTES = 5 * 1024 ** 3  # size cap for presigned POST uploads
+PRESIGNED_UPLOAD_PREFIX = "incoming/"
+S3_EVENTS_ENABLED = False
+S3_EVENT_QUEUE_URL = None
+S3_EVENT_WORKERS = 16
+S3_EVENT_VISIBILITY_TIMEOUT = 120
+
+# Moderation policy: which checks run and the thresholds that block, per
+# content type (see utils/policy.py). The file is re-read when it changes;
+# without it the built-in defaults apply.
+POLICY_PATH = "config/policy.json"
+POLICY_RELOAD_INTERVAL = 5  # seconds between file change checks
+
+# Local voice pre-analysis: audio up to VOICE_ANALYSIS_MAX_BYTES is decoded
+# (WAV natively, other formats with FFMPEG_PATH if it is installed) and
+# files with less than VAD_MIN_SPEECH_SECONDS of speech are answered
+# "no_content" without a Transcribe job. A frame counts as speech when
+# louder than VAD_NOISE_MARGIN_DB over the file's noise floor, clamped to
+# [VAD_MIN_DBFS, VAD_SPEECH_DBFS].
+VOICE_ANALYSIS_ENABLED = True
+VOICE_ANALYSIS_MAX_BYTES = 8 * 1024 * 1024
+FFMPEG_PATH = "ffmpeg"
+FFMPEG_TIMEOUT = 30
+# Converting long audio for segmenting is allowed FFMPEG_CONVERT_TIMEOUT
+# seconds plus FFMPEG_CONVERT_SECONDS_PER_MB per MiB of input
+FFMPEG_CONVERT_TIMEOUT = 60
+FFMPEG_CONVERT_SECONDS_PER_MB = 2
+VAD_FRAME_MS = 30
+VAD_MIN_DBFS = -45
+VAD_SPEECH_DBFS = -30
+VAD_NOISE_MARGIN_DB = 10
+VAD_MIN_RUN_FRAMES = 3  # shorter bursts (clicks, pops) are not speech
+VAD_MIN_SPEECH_SECONDS = 0.3
+# Expected Transcribe job duration, used to space out polls
+TRANSCRIBE_JOB_BASE_SECONDS = 10
+TRANSCRIBE_SECONDS_PER_AUDIO_SECOND = 0.5
+
+# Long audio (at least TRANSCRIBE_SEGMENT_MIN_SECONDS) is split into
+# segments of TRANSCRIBE_SEGMENT_SECONDS that overlap by
+# TRANSCRIBE_SEGMENT_OVERLAP_SECONDS, so no word is lost at a cut. Segments
+# are uploaded under TRANSCRIBE_SEGMENT_PREFIX and transcribed as parallel
+# jobs; the first segment that blocks rejects the file.
+TRANSCRIBE_SEGMENTING_ENABLED = True
+TRANSCRIBE_SEGMENT_MIN_SECONDS = 10 * 60
+TRANSCRIBE_SEGMENT_SECONDS = 5 * 60
+TRANSCRIBE_SEGMENT_OVERLAP_SECONDS = 5
+TRANSCRIBE_SEGMENT_PREFIX = "segments/"
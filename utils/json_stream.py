@@ -0,0 +1,118 @@
+import codecs
+import json
+
+_WHITESPACE = " \t\r\n"
+
+
+class _KeyScanner:
+    """Character-level scanner that finds the first value stored under a key.
+
+    Tracks just enough JSON syntax (strings, escapes, nesting) to tell a
+    real object key from the same text appearing inside a string value, and
+    only buffers the characters of the value it is looking for.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.in_string = False
+        self.escape = False
+        self.string_chars = []
+        self.last_string = None  # a string that just ended, maybe a key
+        self.state = "search"  # search -> colon -> value -> done
+        self.value = []
+        self.depth = 0
+
+    def feed(self, text: str):
+        """Consume more text; return the raw JSON of the value once complete."""
+        for ch in text:
+            if self.state == "value":
+                if self._value_char(ch):
+                    return "".join(self.value)
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                    self.string_chars.append(ch)
+                elif ch == "\\":
+                    self.escape = True
+                    self.string_chars.append(ch)
+                elif ch == '"':
+                    self.in_string = False
+                    self.last_string = "".join(self.string_chars)
+                    self.string_chars = []
+                else:
+                    self.string_chars.append(ch)
+                continue
+
+            if ch in _WHITESPACE:
+                continue
+            if self.state == "colon":
+                self.state = "value"
+                if self._value_char(ch):
+                    return "".join(self.value)
+                continue
+            if ch == ":" and self.last_string == self.key:
+                self.state = "colon"
+            elif ch == '"':
+                self.in_string = True
+            self.last_string = None
+        return None
+
+    def _value_char(self, ch) -> bool:
+        """Add one character of the value; True once the value is complete."""
+        if self.in_string:
+            self.value.append(ch)
+            if self.escape:
+                self.escape = False
+            elif ch == "\\":
+                self.escape = True
+            elif ch == '"':
+                self.in_string = False
+                return self.depth == 0
+            return False
+        if ch == '"':
+            self.in_string = True
+        elif ch in "[{":
+            self.depth += 1
+        elif ch in "]}":
+            if self.depth == 0:  # end of a scalar value
+                return True
+            self.depth -= 1
+            self.value.append(ch)
+            return self.depth == 0
+        elif ch == "," and self.depth == 0:
+            return True
+        self.value.append(ch)
+        return False
+
+
+def extract_json_value(chunks, key: str):
+    """
+    Return the first value stored under ``key`` in a JSON document that
+    arrives as a stream of byte chunks, without reading the rest.
+
+    Only the value itself is buffered, so the document can be far larger
+    than memory as long as the value is small. Reading stops as soon as the
+    value is complete.
+
+    Args:
+        chunks: Iterable of bytes (e.g. StreamingBody.iter_chunks()).
+        key (str): Object key to look for, at any depth.
+
+    Returns:
+        The decoded JSON value.
+
+    Raises:
+        KeyError: If the document ends before the key is found.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    scanner = _KeyScanner(key)
+    for chunk in chunks:
+        raw = scanner.feed(decoder.decode(chunk))
+        if raw is not None:
+            return json.loads(raw)
+    raw = scanner.feed(decoder.decode(b"", final=True) + " ")
+    if raw is not None:
+        return json.loads(raw)
+    raise KeyError(key)
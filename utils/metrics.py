@@ -0,0 +1,203 @@
+import bisect
+import threading
+import time
+
+# Histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Latency histogram with one series per label combination.
+
+    ``observe`` is a bisect and three increments under a lock; cumulative
+    bucket counts are only computed when rendering.
+    """
+
+    def __init__(self, name: str, help_text: str, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(snapshot.items()):
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with one series per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            snapshot = dict(self._series)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{{{_format_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+aws_call_seconds = Histogram(
+    "aws_call_duration_seconds", "Duration of AWS API calls, including retries",
+    ("service", "operation", "outcome", "retries"),
+)
+aws_retries = Counter(
+    "aws_call_retries_total", "Retry attempts made by botocore", ("service", "operation"),
+)
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests until the response is complete",
+    ("method", "route", "status"),
+)
+
+_stats_sources = {}
+
+
+def register_stats(name: str, source):
+    """Expose the numeric values of ``source()`` (a dict) as gauges named
+    ``moderation_<name>_<key>``."""
+    _stats_sources[name] = source
+
+
+def render_metrics() -> str:
+    """Return every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in (aws_call_seconds, aws_retries, http_request_seconds):
+        lines.extend(metric.render())
+    for name, source in sorted(_stats_sources.items()):
+        stats = source()
+        if stats is None:
+            continue
+        for key, value in sorted(_flatten(stats)):
+            metric = f"moderation_{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {float(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _flatten(stats: dict, prefix: str = ""):
+    for key, value in stats.items():
+        key = f"{prefix}{key}".replace("-", "_").replace(".", "_")
+        if isinstance(value, dict):
+            yield from _flatten(value, f"{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield key, value
+        elif isinstance(value, bool):
+            yield key, int(value)
+
+
+# -- botocore hooks ------------------------------------------------------------
+# Registered on the shared session in aws_clients.clients, so every client
+# built from it reports here. botocore passes a per-call ``context`` dict to
+# both events, which carries the start time across.
+
+def _operation(event_name: str):
+    _, service, operation = event_name.split(".", 2)
+    return service, operation
+
+
+def before_aws_call(context, **kwargs):
+    context["metrics_started"] = time.perf_counter()
+
+
+def after_aws_call(event_name, context, parsed, http_response=None, **kwargs):
+    started = context.get("metrics_started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    service, operation = _operation(event_name)
+    retries = parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+    outcome = "success"
+    if http_response is not None and http_response.status_code >= 300:
+        outcome = parsed.get("Error", {}).get("Code", "error")
+    aws_call_seconds.observe((service, operation, outcome, str(retries)), elapsed)
+    if retries:
+        aws_retries.inc((service, operation), retries)
+
+
+def after_aws_call_error(event_name, context, exception, **kwargs):
+    started = context.get("metrics_started")
+    if started is None:
+        return
+    service, operation = _operation(event_name)
+    aws_call_seconds.observe((service, operation, type(exception).__name__, "unknown"), time.perf_counter() - started)
+
+
+def install_botocore_hooks(events):
+    """Register the metric hooks on a botocore event emitter (session.events)."""
+    events.register("before-call", before_aws_call, unique_id="moderation-metrics-before")
+    events.register("after-call", after_aws_call, unique_id="moderation-metrics-after")
+    events.register("after-call-error", after_aws_call_error, unique_id="moderation-metrics-error")
+
+
+# -- HTTP requests ------------------------------------------------------------
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request by method, route template and status.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses are
+    passed through untouched and timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label to keep cardinality bounded
+            path = getattr(route, "path", "unmatched")
+            http_request_seconds.observe((scope["method"], path, status), time.perf_counter() - started)
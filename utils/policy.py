@@ -0,0 +1,210 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from utils.constant import POLICY_PATH, POLICY_RELOAD_INTERVAL, VIDEO_MIN_CONFIDENCE
+
+# Comprehend checks a text policy can enable, in the order they are planned
+TEXT_CHECKS = ("pii", "sentiment", "toxicity")
+
+# Rekognition moderation categories blocked in videos by default
+BLOCK_CATEGORIES = [
+    "Explicit Nudity", "Suggestive", "Violence",
+    "Visually Disturbing", "Weapons", "Drugs",
+    "Alcohol", "Tobacco", "Hate Symbols", "Self-Harm"
+]
+
+# Used for every key the policy file leaves out. Label sections block a
+# label at ``threshold`` confidence unless ``categories`` has a threshold
+# for the label or its parent category; a null threshold blocks only the
+# listed categories. Labels in ``allow`` never block.
+DEFAULT_POLICY = {
+    "text": {
+        "pii": {"enabled": True},
+        "sentiment": {"enabled": True, "block": ["NEGATIVE"]},
+        "toxicity": {"enabled": True, "threshold": 0.7, "labels": {}},
+    },
+    "image": {"enabled": True, "threshold": 90, "categories": {}, "allow": []},
+    "video": {
+        "enabled": True,
+        "threshold": None,
+        "categories": {category: VIDEO_MIN_CONFIDENCE for category in BLOCK_CATEGORIES},
+        "allow": [],
+    },
+}
+
+
+def _version(spec) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+class TextPolicy:
+    """Compiled text rules: the enabled Comprehend checks and what blocks."""
+
+    def __init__(self, spec: dict):
+        self.version = _version(spec)
+        self.enabled = frozenset(check for check in TEXT_CHECKS if spec[check].get("enabled", True))
+        self.blocked_sentiments = frozenset(spec["sentiment"].get("block", ()))
+        self.toxicity_threshold = float(spec["toxicity"]["threshold"])
+        self.toxicity_labels = {name: float(score) for name, score in spec["toxicity"].get("labels", {}).items()}
+
+    def plan(self, allow_pii: bool = False) -> tuple:
+        """Return the checks that can change the verdict of a request.
+
+        PII detection is left out when the caller allows PII, and sentiment
+        when no sentiment blocks, so neither is paid for only to be ignored.
+        """
+        checks = set(self.enabled)
+        if allow_pii:
+            checks.discard("pii")
+        if not self.blocked_sentiments:
+            checks.discard("sentiment")
+        return tuple(check for check in TEXT_CHECKS if check in checks)
+
+    def sentiment_blocks(self, sentiment: str) -> bool:
+        return sentiment in self.blocked_sentiments
+
+    def toxicity_blocks(self, labels) -> bool:
+        return any(
+            label["Score"] > self.toxicity_labels.get(label["Name"], self.toxicity_threshold) for label in labels
+        )
+
+
+class LabelPolicy:
+    """Compiled Rekognition label rules for images or videos.
+
+    Thresholds are looked up by label name, then parent category, then the
+    default, so checking a label is a couple of dict lookups.
+    """
+
+    def __init__(self, spec: dict):
+        self.version = _version(spec)
+        self.enabled = bool(spec.get("enabled", True))
+        self.threshold = None if spec.get("threshold") is None else float(spec["threshold"])
+        self.thresholds = {name: float(score) for name, score in spec.get("categories", {}).items()}
+        self.allow = frozenset(spec.get("allow", ()))
+        levels = list(self.thresholds.values()) + ([self.threshold] if self.threshold is not None else [])
+        # Labels below every threshold cannot block; Rekognition can drop them
+        self.min_confidence = min(levels) if levels else None
+        if self.min_confidence is None:
+            self.enabled = False
+
+    def blocks(self, label: dict) -> bool:
+        """True if a Rekognition moderation label rejects the content."""
+        name = label.get("Name")
+        if name in self.allow:
+            return False
+        threshold = self.thresholds.get(name)
+        if threshold is None:
+            threshold = self.thresholds.get(label.get("ParentName"), self.threshold)
+        return threshold is not None and label.get("Confidence", 0) >= threshold
+
+    def any_blocks(self, labels) -> bool:
+        return any(self.blocks(label) for label in labels)
+
+
+class ModerationPolicy:
+    """A policy spec compiled once into per-content-type lookup tables.
+
+    Each section has its own ``version`` (a hash of its rules), which cached
+    verdicts are keyed by, so changing the image rules does not invalidate
+    cached text verdicts.
+    """
+
+    def __init__(self, spec: dict = None):
+        self.spec = merge_policy(DEFAULT_POLICY, spec or {})
+        self.text = TextPolicy(self.spec["text"])
+        self.image = LabelPolicy(self.spec["image"])
+        self.video = LabelPolicy(self.spec["video"])
+        self.version = _version(self.spec)
+
+
+def merge_policy(base: dict, override: dict) -> dict:
+    """Return ``base`` with the keys of ``override`` replaced, recursing into
+    sections and checks but not into threshold tables."""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict) and key not in ("categories", "labels"):
+            merged[key] = merge_policy(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+class PolicyLoader:
+    """Holds the compiled policy and recompiles it when its file changes.
+
+    A file that fails to parse or compile is logged and the previous policy
+    stays in force.
+    """
+
+    def __init__(self, path=POLICY_PATH, reload_interval=POLICY_RELOAD_INTERVAL, policy: ModerationPolicy = None):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._policy = policy or ModerationPolicy()
+        self.reload()
+
+    def _current_mtime(self):
+        return os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+
+    def reload(self, force: bool = False):
+        """Recompile the policy if its file changed (or ``force``)."""
+        mtime = self._current_mtime()
+        if not force and mtime == self._mtime:
+            return
+        try:
+            spec = {}
+            if mtime is not None:
+                with open(self.path, encoding="utf-8") as f:
+                    spec = json.load(f)
+            policy = ModerationPolicy(spec)
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            logging.error(f"Could not load moderation policy from {self.path}, keeping the current one: {e}")
+            with self._lock:
+                self._mtime = mtime
+            return
+        with self._lock:
+            self._policy, self._mtime = policy, mtime
+        logging.info(f"Moderation policy {policy.version} loaded")
+
+    def current(self) -> ModerationPolicy:
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self.reload()
+        return self._policy
+
+
+_loader = None
+_loader_lock = threading.Lock()
+
+
+def get_policy() -> ModerationPolicy:
+    """Return the current moderation policy, re-read from POLICY_PATH when it changes."""
+    global _loader
+    if _loader is None:
+        with _loader_lock:
+            if _loader is None:
+                _loader = PolicyLoader()
+    return _loader.current()
+
+
+def set_policy(policy: ModerationPolicy):
+    """Use ``policy`` from now on instead of the policy file (e.g. for benchmarks)."""
+    global _loader
+    with _loader_lock:
+        _loader = PolicyLoader(path=None, policy=policy)
+
+
+def reset_policy():
+    """Undo set_policy(): read the policy from POLICY_PATH again."""
+    global _loader
+    with _loader_lock:
+        _loader = None
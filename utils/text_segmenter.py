@@ -0,0 +1,69 @@
+import re
+
+# A sentence ends at ., ! or ? (including CJK forms) followed by whitespace,
+# or at a line break
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?。！？])\s+|\s*\n\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _split_oversized(piece: str, max_bytes: int):
+    """Split a single sentence that is over the limit on word boundaries,
+    falling back to a hard split for words longer than the limit."""
+    words = _WHITESPACE.split(piece)
+    current = ""
+    for word in words:
+        candidate = f"{current} {word}" if current else word
+        if _utf8_len(candidate) <= max_bytes:
+            current = candidate
+            continue
+        if current:
+            yield current
+        # A single word over the limit: cut it without splitting a character
+        while _utf8_len(word) > max_bytes:
+            cut = word.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
+            yield cut
+            word = word[len(cut):]
+        current = word
+    if current:
+        yield current
+
+
+def split_text(text: str, max_bytes: int) -> list:
+    """
+    Split text into chunks of at most ``max_bytes`` UTF-8 bytes, breaking on
+    sentence boundaries where possible.
+
+    Example:
+        split_text("One. Two. Three.", 9) -> ["One. Two.", "Three."]
+
+    Args:
+        text (str): The text to split.
+        max_bytes (int): Maximum size of each chunk in UTF-8 bytes.
+
+    Returns:
+        list: Non-empty chunks, in order.
+    """
+    text = text.strip()
+    if _utf8_len(text) <= max_bytes:
+        return [text] if text else []
+
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_BREAK.split(text):
+        if not sentence:
+            continue
+        pieces = [sentence] if _utf8_len(sentence) <= max_bytes else _split_oversized(sentence, max_bytes)
+        for piece in pieces:
+            candidate = f"{current} {piece}" if current else piece
+            if _utf8_len(candidate) <= max_bytes:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+    if current:
+        chunks.append(current)
+    return chunks